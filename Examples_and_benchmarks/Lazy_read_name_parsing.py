@@ -0,0 +1,75 @@
+# Benchmark building TwoSequenceReadSet objects with the read names parsed lazily on first access,
+# against the eager constructor that split the names for every read.
+
+import sys
+import time
+from grcScriptsPy import TwoReadIlluminaRun
+from grcScriptsPy import TwoSequenceReadSet
+
+
+class EagerTwoSequenceReadSet:
+    " The TwoSequenceReadSet constructor before names were parsed lazily "
+    def __init__(self, name_1, read_1, qual_1, name_2, read_2, qual_2):
+        split_name = name_1.split(" ")
+        self.name = split_name[0]
+        self.barcode = split_name[1].split(":")[3]
+        self.sample = self.barcode
+        if (len(split_name) == 4):
+            self.primer_string1 = split_name[3]
+            self.primer_string2 = name_2.split(" ")[3]
+            self.primer = split_name[1].split(":")[4]
+            self.barcode_string = split_name[2]
+        elif (len(split_name) == 3):
+            self.primer_string1 = None
+            self.primer_string2 = None
+            self.primer = None
+            self.barcode_string = split_name[2]
+        else:
+            self.primer_string1 = None
+            self.primer_string2 = None
+            self.primer = None
+            self.barcode_string = None
+        self.read_1 = read_1
+        self.qual_1 = qual_1
+        self.read_2 = read_2
+        self.qual_2 = qual_2
+        self.goodRead = False
+
+
+if len(sys.argv) == 3:
+    read1, read2 = sys.argv[1:3]
+else:
+    read1, read2 = 'L5I3_CAGATC_L001_R1_001.fastq.gz', 'L5I3_CAGATC_L001_R2_001.fastq.gz'
+
+run = TwoReadIlluminaRun([read1], [read2])
+run.open()
+names_1, reads_1, quals_1 = run.R1.read(1000000)
+names_2, reads_2, quals_2 = run.R2.read(len(names_1))
+run.close()
+records = zip(names_1, reads_1, quals_1, names_2, reads_2, quals_2)
+
+
+def build(cls):
+    return [cls(*record) for record in records]
+
+for label, cls in [("eager", EagerTwoSequenceReadSet), ("lazy", TwoSequenceReadSet)]:
+    ############### construct only (count only workloads) ##############
+    t = time.time()
+    reads = build(cls)
+    print "%s constructor, names never used:" % label
+    print "\ttotal records: %s" % len(reads)
+    print "\trecords per second: %s" % (len(reads) / (time.time() - t))
+
+    ############### construct and filter on one name field ##############
+    t = time.time()
+    reads = [read for read in build(cls) if read.primer == "16S"]
+    print "%s constructor, filter on primer:" % label
+    print "\trecords per second: %s" % (len(records) / (time.time() - t))
+
+    ############### construct and use all name fields ##############
+    t = time.time()
+    for read in build(cls):
+        read.name, read.sample, read.primer, read.barcode_string, read.primer_string1
+    print "%s constructor, all names used:" % label
+    print "\trecords per second: %s" % (len(records) / (time.time() - t))
+    print "-" * 100
@@ -0,0 +1,55 @@
+# Benchmark the output codecs of the Illumina output classes on a fastq file: write time,
+# compressed size and read back time for raw, gzip at levels 1, 6 and 9, BGZF and xz,
+# to choose a codec and level for each kind of output (scratch or archived).
+
+import os
+import sys
+import time
+import tempfile
+import shutil
+from grcScriptsPy import OneReadIlluminaRun
+from grcScriptsPy import IlluminaOneReadOutput
+from grcScriptsPy import open_read
+
+# codec settings benchmarked, see misc.parse_codec
+CODECS = ['raw', 'fast', 'gzip:6', 'gzip:9', 'bgzf:1', 'bgzf:6', 'xz:0', 'xz:6']
+
+
+if len(sys.argv) >= 2:
+    filename = sys.argv[1]
+else:
+    filename = 'L5I3_CAGATC_L001_R1_001.fastq.gz'
+if len(sys.argv) >= 3:
+    threads = int(sys.argv[2])
+else:
+    threads = 1
+
+run = OneReadIlluminaRun([filename])
+batch = run.next(1000000)
+run.close()
+reads = [read.getFastq() for read in batch]
+nbytes = sum(len(read[0]) + 1 for read in reads)
+
+print "total reads: %s, MB: %.1f, threads: %s" % (len(reads), nbytes / 1e6, threads)
+print "%-8s %10s %10s %8s %10s" % ("codec", "write MB/s", "size MB", "ratio", "read MB/s")
+tmp = tempfile.mkdtemp()
+try:
+    for codec in CODECS:
+        out = IlluminaOneReadOutput(os.path.join(tmp, codec.replace(':', '_')), False, threads, codec=codec)
+        t = time.time()
+        out.addReads(batch)
+        out.writeReads()
+        out.close()
+        write = time.time() - t
+        outfile = [os.path.join(tmp, f) for f in os.listdir(tmp) if f.startswith(codec.replace(':', '_') + '.')][0]
+        size = os.path.getsize(outfile)
+        t = time.time()
+        handle = open_read(outfile)
+        while handle.read(1024 * 1024):
+            pass
+        handle.close()
+        read = time.time() - t
+        print "%-8s %10.1f %10.1f %8.2f %10.1f" % (codec, nbytes / write / 1e6, size / 1e6, float(nbytes) / size,
+                                                  nbytes / read / 1e6)
+finally:
+    shutil.rmtree(tmp)
@@ -0,0 +1,58 @@
+# Benchmark reverse complementing the reads of a fastq file: the original dictionary based
+# reverseComplement, the translate table misc.reverseComplement and the C reverse_complement_batch
+# on a list of reads and on a newline separated buffer of reads (ReadBatch.buffer).
+
+import sys
+import time
+from grcScriptsPy import OneReadIlluminaRun
+from grcScriptsPy import reverseComplement
+from grcScriptsPy import reverse_complement_batch
+
+
+def dictReverseComplement(s):
+    " The reverseComplement before the translate table "
+    basecomplement = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A', 'N': 'N'}
+    letters = list(s)
+    letters = [basecomplement[base] for base in letters]
+    return ''.join(letters[::-1])
+
+
+if len(sys.argv) == 2:
+    filename = sys.argv[1]
+else:
+    filename = 'L5I3_CAGATC_L001_R2_001.fastq.gz'
+
+run = OneReadIlluminaRun([filename])
+batch = run.next(1000000)
+run.close()
+reads = batch.field('read_1')
+buffer = batch.buffer('read_1')[0]
+bases = len(buffer) - len(reads) + 1
+
+
+def report(label, t):
+    t = time.time() - t
+    print "%s:" % label
+    print "\treads per second: %s" % (len(reads) / t)
+    print "\tMB of bases per second: %s" % (bases / t / 1e6)
+
+print "total reads: %s" % len(reads)
+############### dictionary lookup per base ##############
+t = time.time()
+result = [dictReverseComplement(read) for read in reads]
+report("dictionary reverseComplement", t)
+
+############### translate table ##############
+t = time.time()
+result = [reverseComplement(read) for read in reads]
+report("translate table reverseComplement", t)
+
+############### C, list of reads ##############
+t = time.time()
+result = reverse_complement_batch(reads)
+report("reverse_complement_batch(list)", t)
+
+############### C, newline separated buffer ##############
+t = time.time()
+result = reverse_complement_batch(buffer)
+report("reverse_complement_batch(buffer)", t)
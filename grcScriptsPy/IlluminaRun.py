@@ -20,22 +20,50 @@ is in 2 and 1 reads setss
 
 import os
 import glob
-import gzip
 from grcScriptsPy import TwoSequenceReadSet
 from grcScriptsPy import OneSequenceReadSet
+from grcScriptsPy import ReadBatch
+from grcScriptsPy import write_fastq_batch
 from grcScriptsPy import misc
+from grcScriptsPy import fastqReader
+from grcScriptsPy import fastqIndex
+from grcScriptsPy import bgzf
+from itertools import izip
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+# reads per batch when iterating over a run
+DEFAULT_ITER_BATCH = 10000
+# bytes queued by the output classes before addRead writes them
+DEFAULT_FLUSH_BYTES = 8 * 1024 * 1024
+# DemuxOutputPool limits: open output files, buffered bytes per output and in total
+DEFAULT_DEMUX_MAXOPEN = 64
+DEFAULT_DEMUX_BUFFER = 1024 * 1024
+DEFAULT_DEMUX_TOTAL_BUFFER = 256 * 1024 * 1024
+# file name part of reads with no sample
+UNIDENTIFIED = 'Unidentified'
+
 
 class TwoReadIlluminaRun:
     """
     Class to open/close and read a two read illumina sequencing run. Data is expected to be in
     fastq format (possibly gzipped) first processed with dbcAmplicons preprocess subroutine
     """
-    def __init__(self,read1,read2):
+    def __init__(self,read1,read2,blocksize=fastqReader.DEFAULT_BLOCKSIZE,prefetch=0,start=0,stop=None):
         """
         Initialize a TwoReadIlluminaRun object with expandible paths (with glob) to the two
         sequencing read files. A vector of multiple files per read is allowed.
+        Files are read in blocks of [blocksize] bytes. With prefetch > 0 each read file is read
+        by a background thread keeping up to [prefetch] batches ready.
+        Only reads numbered [start] (0 based) up to [stop] across the run are returned, files
+        are opened at start using their fastqIndex.
         """
         self.isOpen = False
+        self.blocksize = blocksize
+        self.prefetch = prefetch
+        self.start = start
+        self.stop = stop
+        self.position = 0
         self.mcount = 0
         self.fread1 = []
         self.fread2 = []
@@ -63,22 +91,28 @@ class TwoReadIlluminaRun:
         self.numberoffiles = len(self.fread1)
     def open(self):
         """
-        Open a OneReadIlluminaRun file set, if file ends in .gz, open will use gzip
+        Open a TwoReadIlluminaRun file set, uncompressed files are memory mapped and gzip files decompressed by misc.open_read
         """
         if self.isOpen:
             self.close()
         if self.numberoffiles > 0:
             try:
                 read1 = self.fread1.pop()
-                if read1.split(".")[-1] == "gz":
-                    self.R1 = misc.sp_gzip_read(read1)
-                else:
-                    self.R1 = open(read1, 'r')
                 read2 = self.fread2.pop()
-                if read2.split(".")[-1] == "gz":
-                    self.R2 = misc.sp_gzip_read(read2)
+                if self.start > self.position:
+                    # seek to the first read of the range, or past the end of the files
+                    index1 = fastqIndex.get_index(read1)
+                    index2 = fastqIndex.get_index(read2)
+                    skip = min(self.start - self.position, index1.nrecords)
+                    self.R1 = index1.open_at(skip, self.blocksize)
+                    self.R2 = index2.open_at(skip, self.blocksize)
+                    self.position += skip
                 else:
-                    self.R2 = open(read2, 'r')
+                    self.R1 = fastqReader.open_fastq(read1, self.blocksize)
+                    self.R2 = fastqReader.open_fastq(read2, self.blocksize)
+                if self.prefetch > 0:
+                    self.R1 = fastqReader.PrefetchReader(self.R1, self.prefetch)
+                    self.R2 = fastqReader.PrefetchReader(self.R2, self.prefetch)
             except:
                 print 'ERROR:[TwoReadIlluminaRun] cannot open input files'
                 raise
@@ -101,7 +135,7 @@ class TwoReadIlluminaRun:
         return self.mcount
     def next(self, ncount=1):
         """
-        Extract and store the next [count] reads into a TwoSequenceReadSet object.
+        Extract and store the next [count] reads as TwoSequenceReadSet objects in a ReadBatch.
         If the file object is not open, or if 'next' reaches the end of a file, it will
         attempt to open the file in the list, or gracefully exit
         """
@@ -112,27 +146,32 @@ class TwoReadIlluminaRun:
                     raise
             except:
                 raise
-        reads = []
-        i = 0
-        while i < ncount:
+        columns = [[], [], [], [], [], []]
+        while len(columns[0]) < ncount:
+            nrequest = ncount - len(columns[0])
+            if self.stop is not None:
+                nrequest = min(nrequest, self.stop - self.position)
+                if nrequest <= 0:
+                    break
             try:
-                #process read_1 (Read1)
-                name_1 = self.R1.next().rstrip() # name
-                read_1 = self.R1.next().rstrip() # read
-                self.R1.next()  # '+'
-                qual_1 = self.R1.next().rstrip() # qual
-                #process read _2 (Read2)
-                name_2 = self.R2.next().rstrip() # name
-                read_2 = self.R2.next().rstrip() # read 
-                self.R2.next() # '+'
-                qual_2 = self.R2.next().rstrip() # qual
-                #add it to the stack
-                if name_1.split(" ")[0] != name_2.split(" ")[0]: # check name
-                    print('ERROR:[TwoReadIlluminaRun] Read names do not match each other')
-                    raise
-                reads.append(TwoSequenceReadSet(name_1=name_1,read_1=read_1,qual_1=qual_1,name_2=name_2,read_2=read_2,qual_2=qual_2))
-                self.mcount += 1
-            except StopIteration:
+                names_1, reads_1, quals_1 = self.R1.read(nrequest)
+                names_2, reads_2, quals_2 = self.R2.read(len(names_1))
+                if len(names_1) != len(names_2) or (len(names_1) < nrequest and len(self.R2.read(1)[0]) != 0):
+                    print('ERROR:[TwoReadIlluminaRun] Read files do not contain the same number of reads')
+                    raise Exception("Read files do not contain the same number of reads")
+                for name_1, name_2 in izip(names_1, names_2):
+                    if name_1.split(" ", 1)[0] != name_2.split(" ", 1)[0]: # check name
+                        print('ERROR:[TwoReadIlluminaRun] Read names do not match each other')
+                        raise Exception("Read names do not match each other")
+                for column, values in izip(columns, (names_1, reads_1, quals_1, names_2, reads_2, quals_2)):
+                    column.extend(values)
+                self.mcount += len(names_1)
+                self.position += len(names_1)
+            except:
+                print('ERROR:[TwoReadIlluminaRun] Error reading next read')
+                raise
+            if len(names_1) < nrequest:
+                # end of the current files, move on to the next pair in the list if there is one
                 if self.numberoffiles > 0:
                     try:
                         if self.open() == 1:
@@ -142,11 +181,30 @@ class TwoReadIlluminaRun:
                         raise
                     continue
                 break
-            except:
-                print('ERROR:[TwoReadIlluminaRun] Error reading next read')
-                raise
-            i +=1
-        return reads
+        return ReadBatch(TwoSequenceReadSet, columns)
+    def iter_batches(self, size=DEFAULT_ITER_BATCH):
+        """
+        Generator returning the reads of the run as ReadBatch objects of [size] reads. The files are
+        closed when the run is exhausted, or when the generator is closed or discarded early.
+        """
+        if not self.isOpen and self.numberoffiles == 0:
+            return
+        try:
+            while True:
+                reads = self.next(size)
+                if len(reads) == 0:
+                    break
+                yield reads
+        finally:
+            if self.isOpen:
+                self.close()
+    def __iter__(self):
+        """
+        Iterate over the reads of the run one read set at a time, reading DEFAULT_ITER_BATCH reads at once
+        """
+        for reads in self.iter_batches():
+            for read in reads:
+                yield read
 
 class OneReadIlluminaRun:
     """
@@ -154,8 +212,20 @@ class OneReadIlluminaRun:
     fastq format (possibly gzipped), first processed with dbcAmplicons preprocess subroutine and 
     then joined using some method like flash.
     """
-    def __init__(self,read1):
+    def __init__(self,read1,blocksize=fastqReader.DEFAULT_BLOCKSIZE,prefetch=0,start=0,stop=None):
+        """
+        Initialize a OneReadIlluminaRun object with expandible paths (with glob) to the
+        sequencing read files. Files are read in blocks of [blocksize] bytes. With prefetch > 0
+        the read file is read by a background thread keeping up to [prefetch] batches ready.
+        Only reads numbered [start] (0 based) up to [stop] across the run are returned, files
+        are opened at start using their fastqIndex.
+        """
         self.isOpen = False
+        self.blocksize = blocksize
+        self.prefetch = prefetch
+        self.start = start
+        self.stop = stop
+        self.position = 0
         self.mcount = 0
         self.fread1 = []
         try:
@@ -170,17 +240,23 @@ class OneReadIlluminaRun:
         self.numberoffiles = len(self.fread1)
     def open(self):
         """
-        Open a OneReadIlluminaRun file set, if file ends in .gz, open will use gzip
+        Open a OneReadIlluminaRun file set, uncompressed files are memory mapped and gzip files decompressed by misc.open_read
         """
         if self.isOpen:
             self.close()
         if self.numberoffiles > 0:
             try:
                 read1 = self.fread1.pop()
-                if read1.split(".")[-1] == "gz":
-                    self.R1 = misc.sp_gzip_read(read1)
+                if self.start > self.position:
+                    # seek to the first read of the range, or past the end of the file
+                    index1 = fastqIndex.get_index(read1)
+                    skip = min(self.start - self.position, index1.nrecords)
+                    self.R1 = index1.open_at(skip, self.blocksize)
+                    self.position += skip
                 else:
-                    self.R1 = open(read1, 'r')
+                    self.R1 = fastqReader.open_fastq(read1, self.blocksize)
+                if self.prefetch > 0:
+                    self.R1 = fastqReader.PrefetchReader(self.R1, self.prefetch)
             except:
                 print 'ERROR:[OneReadIlluminaRun] cannot open input files'
                 raise
@@ -201,6 +277,11 @@ class OneReadIlluminaRun:
         """
         return self.mcount
     def next(self, ncount=1):
+        """
+        Extract and store the next [count] reads as OneSequenceReadSet objects in a ReadBatch.
+        If the file object is not open, or if 'next' reaches the end of a file, it will
+        attempt to open the file in the list, or gracefully exit
+        """
         if not self.isOpen:
             try:
                 if self.open() == 1:
@@ -208,19 +289,24 @@ class OneReadIlluminaRun:
                     raise
             except:
                 raise
-        reads = []
-        i = 0
-        while i < ncount:
+        columns = [[], [], []]
+        while len(columns[0]) < ncount:
+            nrequest = ncount - len(columns[0])
+            if self.stop is not None:
+                nrequest = min(nrequest, self.stop - self.position)
+                if nrequest <= 0:
+                    break
             try:
-                #process read_1 (Read1)
-                name_1 = self.R1.next().rstrip() # name
-                read_1 = self.R1.next().rstrip()    # read
-                self.R1.next()  # '+'
-                qual_1 = self.R1.next().rstrip() # qual
-                #add it to the stack
-                reads.append(OneSequenceReadSet(name_1=name_1,read_1=read_1,qual_1=qual_1))
-                self.mcount += 1
-            except StopIteration:
+                names_1, reads_1, quals_1 = self.R1.read(nrequest)
+                for column, values in izip(columns, (names_1, reads_1, quals_1)):
+                    column.extend(values)
+                self.mcount += len(names_1)
+                self.position += len(names_1)
+            except:
+                print('ERROR:[OneReadIlluminaRun] Error reading next read')
+                raise
+            if len(names_1) < nrequest:
+                # end of the current file, move on to the next in the list if there is one
                 if self.numberoffiles > 0:
                     try:
                         if self.open() == 1:
@@ -230,42 +316,87 @@ class OneReadIlluminaRun:
                         raise
                     continue
                 break
-            except:
-                print('ERROR:[OneReadIlluminaRun] Error reading next read')
-                raise
-            i +=1
-        return reads
+        return ReadBatch(OneSequenceReadSet, columns)
+    def iter_batches(self, size=DEFAULT_ITER_BATCH):
+        """
+        Generator returning the reads of the run as ReadBatch objects of [size] reads. The files are
+        closed when the run is exhausted, or when the generator is closed or discarded early.
+        """
+        if not self.isOpen and self.numberoffiles == 0:
+            return
+        try:
+            while True:
+                reads = self.next(size)
+                if len(reads) == 0:
+                    break
+                yield reads
+        finally:
+            if self.isOpen:
+                self.close()
+    def __iter__(self):
+        """
+        Iterate over the reads of the run one read set at a time, reading DEFAULT_ITER_BATCH reads at once
+        """
+        for reads in self.iter_batches():
+            for read in reads:
+                yield read
+
+def output_codec(uncompressed, threads=1):
+    """
+    Return the codec of the uncompressed and threads settings of the output classes
+    """
+    if uncompressed is True:
+        return 'raw'
+    if threads > 1:
+        return 'bgzf'
+    return 'gzip'
 
 class IlluminaTwoReadOutput:
     """ 
     Given Paired-end reads, output them to a paired files (possibly gzipped) 
     """
-    def __init__(self,output_prefix, uncompressed):
+    def __init__(self,output_prefix, uncompressed, threads=1, compresslevel=None, writebehind=0,
+                 flush_bytes=DEFAULT_FLUSH_BYTES, codec=None):
         """
         Initialize an IlluminaTwoReadOutput object with output_prefix and whether or not 
-        output should be compressed with gzip [uncompressed True/False]
+        output should be compressed with gzip [uncompressed True/False]. Compressed output uses
+        gzip [compresslevel] (9 by default), with threads > 1 each file is written as blocked gzip (BGZF)
+        deflated on [threads] worker threads. codec (see misc.parse_codec: raw, gzip, bgzf or xz with an
+        optional level as in gzip:4, or fast for level 1 gzip) replaces uncompressed and threads in
+        choosing the compression. With writebehind > 0 writeReads hands batches to a
+        background thread per file (misc.AsyncWriter) queueing up to [writebehind] batches.
+        addRead and addReads write the queued reads once they reach [flush_bytes] (None to leave it to writeReads)
         """
         self.isOpen = False
         self.output_prefix = output_prefix
         self.uncompressed = uncompressed
-        self.R1 = []
-        self.R2 = []
+        self.threads = threads
+        if codec is None:
+            codec = output_codec(uncompressed, threads)
+        self.codec, self.compresslevel = misc.parse_codec(codec, compresslevel)
+        self.writebehind = writebehind
+        self.R1 = bytearray()
+        self.R2 = bytearray()
         self.mcount=0
+        self.flush_bytes = flush_bytes
+        self.buffered = 0
+        self.peak_buffered = 0
+        self.flushes = 0
     def open(self):
         """
-        Open the two read files for writing, appending _R1.fastq and _R2.fastq to the output_prefix.
-        Create directories as needed.
+        Open the two read files for writing, appending _R1.fastq and _R2.fastq and the codec extension
+        (.gz, .xz) to the output_prefix. Create directories as needed.
         """
         if self.isOpen:
             self.close()
         try:
             misc.make_sure_path_exists(os.path.dirname(self.output_prefix))
-            if self.uncompressed is True:
-                self.R1f = open(self.output_prefix + '_R1.fastq', 'w')
-                self.R2f = open(self.output_prefix + '_R2.fastq', 'w')
-            else:
-                self.R1f = gzip.open(self.output_prefix + '_R1.fastq.gz', 'wb')
-                self.R2f = gzip.open(self.output_prefix + '_R2.fastq.gz', 'wb')
+            ext = '.fastq' + misc.CODEC_EXTENSIONS[self.codec]
+            self.R1f = misc.open_write(self.output_prefix + '_R1' + ext, self.codec, self.compresslevel, self.threads)
+            self.R2f = misc.open_write(self.output_prefix + '_R2' + ext, self.codec, self.compresslevel, self.threads)
+            if self.writebehind > 0:
+                self.R1f = misc.AsyncWriter(self.R1f, self.writebehind)
+                self.R2f = misc.AsyncWriter(self.R2f, self.writebehind)
         except:
             print('ERROR:[IlluminaTwoReadOutput] Cannot write reads to file with prefix: %s' % self.output_prefix)
             raise
@@ -273,11 +404,14 @@ class IlluminaTwoReadOutput:
         return 0
     def close(self):
         """
-        Close an IlluminaTwoReadOutput file set
+        Close an IlluminaTwoReadOutput file set, with writebehind the queued batches are written first
+        and a failed write is raised
         """
-        self.R1f.close()
-        self.R2f.close() 
         self.isOpen = False
+        try:
+            self.R1f.close()
+        finally:
+            self.R2f.close()
     def count(self):
         """
         Provide the current read count for the file output
@@ -289,9 +423,32 @@ class IlluminaTwoReadOutput:
         """
         if self.isOpen is False:
             self.open()
-        self.R1.append(read[0])
-        self.R2.append(read[1])
+        self.R1 += read[0]
+        self.R1 += '\n'
+        self.R2 += read[1]
+        self.R2 += '\n'
         self.mcount +=1
+        self._queued()
+    def addReads(self,reads):
+        """
+        Add a batch of read sets (a ReadBatch or a list of TwoSequenceReadSet) to the output queue, formatted
+        as their getFastq by write_fastq_batch
+        """
+        if self.isOpen is False:
+            self.open()
+        nreads = len(reads)
+        write_fastq_batch(reads, self.R1, self.R2)
+        self.mcount += nreads
+        self._queued()
+    def _queued(self):
+        """
+        Update the queued byte count and write the queue once it holds flush_bytes
+        """
+        self.buffered = len(self.R1) + len(self.R2)
+        if self.buffered > self.peak_buffered:
+            self.peak_buffered = self.buffered
+        if self.flush_bytes is not None and self.buffered >= self.flush_bytes:
+            self.writeReads()
     def writeReads(self):
         """
         Write the paired reads in the queue to the output files
@@ -307,28 +464,52 @@ class IlluminaTwoReadOutput:
                 except:
                     raise
             try:
-                self.R1f.write('\n'.join(self.R1) + '\n')
-                self.R2f.write('\n'.join(self.R2) + '\n')
+                self.R1f.write(str(self.R1))
+                self.R2f.write(str(self.R2))
             except:
                 print('ERROR:[IlluminaTwoReadOutput] Cannot write reads to file with prefix: %s' % self.output_prefix)
                 raise
-            self.R1 = []
-            self.R2 = []
+            self.R1 = bytearray()
+            self.R2 = bytearray()
+            self.buffered = 0
+            self.flushes += 1
+    def stats(self):
+        """
+        Return counters as a dictionary (reads, buffered and peak_buffered bytes, flushes)
+        """
+        return {'reads': self.mcount, 'buffered': self.buffered, 'peak_buffered': self.peak_buffered,
+                'flushes': self.flushes}
 
 class IlluminaOneReadOutput:
     """ 
     Given single reads, output them to a file (possibly gzipped) 
     """
-    def __init__(self,output_prefix, uncompressed):
+    def __init__(self,output_prefix, uncompressed, threads=1, compresslevel=None, writebehind=0,
+                 flush_bytes=DEFAULT_FLUSH_BYTES, codec=None):
         """
         Initialize an IlluminaOneReadOutput object with output_prefix and whether or not 
-        output should be compressed with gzip [uncompressed True/False]
+        output should be compressed with gzip [uncompressed True/False]. Compressed output uses
+        gzip [compresslevel] (9 by default), with threads > 1 the file is written as blocked gzip (BGZF)
+        deflated on [threads] worker threads. codec (see misc.parse_codec: raw, gzip, bgzf or xz with an
+        optional level as in gzip:4, or fast for level 1 gzip) replaces uncompressed and threads in
+        choosing the compression. With writebehind > 0 writeReads hands batches to a
+        background thread (misc.AsyncWriter) queueing up to [writebehind] batches.
+        addRead and addReads write the queued reads once they reach [flush_bytes] (None to leave it to writeReads)
         """
         self.isOpen = False
         self.output_prefix = output_prefix
         self.uncompressed = uncompressed
+        self.threads = threads
+        if codec is None:
+            codec = output_codec(uncompressed, threads)
+        self.codec, self.compresslevel = misc.parse_codec(codec, compresslevel)
+        self.writebehind = writebehind
         self.mcount=0
-        self.R1 = []
+        self.R1 = bytearray()
+        self.flush_bytes = flush_bytes
+        self.buffered = 0
+        self.peak_buffered = 0
+        self.flushes = 0
     def open(self):
         """
         Open the read file for writing, appending .fastq to the output_prefix.
@@ -338,10 +519,10 @@ class IlluminaOneReadOutput:
             self.close()
         try:
             misc.make_sure_path_exists(os.path.dirname(self.output_prefix))
-            if self.uncompressed is True:
-                self.R1f = open(self.output_prefix + '.fastq', 'w')
-            else:
-                self.R1f = gzip.open(self.output_prefix + '.fastq.gz', 'wb')
+            ext = '.fastq' + misc.CODEC_EXTENSIONS[self.codec]
+            self.R1f = misc.open_write(self.output_prefix + ext, self.codec, self.compresslevel, self.threads)
+            if self.writebehind > 0:
+                self.R1f = misc.AsyncWriter(self.R1f, self.writebehind)
         except:
             print('ERROR:[IlluminaOneReadOutput] Cannot write reads to file with prefix: %s' % self.output_prefix)
             raise
@@ -349,10 +530,11 @@ class IlluminaOneReadOutput:
         return 0
     def close(self):
         """
-        Close an IlluminaOneReadOutput file set
+        Close an IlluminaOneReadOutput file set, with writebehind the queued batches are written first
+        and a failed write is raised
         """
-        self.R1f.close()
         self.isOpen = False
+        self.R1f.close()
     def count(self):
         """
         Provide the current read count for the file output
@@ -364,8 +546,30 @@ class IlluminaOneReadOutput:
         """
         if self.isOpen is False:
             self.open()
-        self.R1.append(read[0])
+        self.R1 += read[0]
+        self.R1 += '\n'
         self.mcount +=1
+        self._queued()
+    def addReads(self,reads):
+        """
+        Add a batch of read sets (a ReadBatch or a list of OneSequenceReadSet) to the output queue, formatted
+        as their getFastq by write_fastq_batch
+        """
+        if self.isOpen is False:
+            self.open()
+        nreads = len(reads)
+        write_fastq_batch(reads, self.R1)
+        self.mcount += nreads
+        self._queued()
+    def _queued(self):
+        """
+        Update the queued byte count and write the queue once it holds flush_bytes
+        """
+        self.buffered = len(self.R1)
+        if self.buffered > self.peak_buffered:
+            self.peak_buffered = self.buffered
+        if self.flush_bytes is not None and self.buffered >= self.flush_bytes:
+            self.writeReads()
     def writeReads(self):
         """
         Write the reads in the queue to the output files
@@ -381,9 +585,221 @@ class IlluminaOneReadOutput:
                 except:
                     raise
             try:
-                self.R1f.write('\n'.join(self.R1) + '\n')
+                self.R1f.write(str(self.R1))
             except:
                 print('ERROR:[IlluminaOneReadOutput] Cannot write read to file with prefix: %s' % self.output_prefix)
                 raise
-            self.R1 = []
+            self.R1 = bytearray()
+            self.buffered = 0
+            self.flushes += 1
+    def stats(self):
+        """
+        Return counters as a dictionary (reads, buffered and peak_buffered bytes, flushes)
+        """
+        return {'reads': self.mcount, 'buffered': self.buffered, 'peak_buffered': self.peak_buffered,
+                'flushes': self.flushes}
 
+class DemuxOutputPool:
+    """
+    Class to write reads split by sample to one output file set per key (a sample ID, or a tuple such as
+    (projectID, sampleID)), named output_prefix_key_R1.fastq.gz and _R2 like IlluminaTwoReadOutput, or
+    output_prefix_key.fastq.gz for single reads. Reads are buffered per key and written in one large
+    write once the key holds [buffer_bytes], or, largest buffers first, when all keys together hold
+    [total_bytes]. At most [maxopen] file sets are open, the least recently written is closed to open
+    another. Files are created on the first write and appended to on reopening, gzip output as a new
+    gzip member (BGZF blocks with threads > 1, a new stream with xz), so each file still decompresses
+    as a whole. Compression is chosen as for IlluminaTwoReadOutput.
+    """
+    def __init__(self, output_prefix, uncompressed=False, paired=True, threads=1, compresslevel=None,
+                 maxopen=DEFAULT_DEMUX_MAXOPEN, buffer_bytes=DEFAULT_DEMUX_BUFFER, total_bytes=DEFAULT_DEMUX_TOTAL_BUFFER,
+                 codec=None):
+        """
+        Initialize an empty DemuxOutputPool, paired for read pairs (getFastq of a TwoSequenceReadSet)
+        or single reads
+        """
+        if maxopen < 1:
+            print 'ERROR:[DemuxOutputPool] maxopen must be at least 1'
+            raise ValueError('maxopen must be at least 1')
+        self.output_prefix = output_prefix
+        self.uncompressed = uncompressed
+        self.nfiles = 2 if paired else 1
+        self.threads = threads
+        if codec is None:
+            codec = output_codec(uncompressed, threads)
+        self.codec, self.compresslevel = misc.parse_codec(codec, compresslevel)
+        self.maxopen = maxopen
+        # one set of BGZF compression threads shared by every file opened
+        if self.codec == 'bgzf' and threads > 1:
+            self.pool = ThreadPool(threads)
+        else:
+            self.pool = None
+        self.buffer_bytes = buffer_bytes
+        self.total_bytes = total_bytes
+        self.buffers = {}           # key -> per file bytearray of queued reads
+        self.buffered = {}          # key -> bytes queued
+        self.total = 0              # bytes queued over all keys
+        self.peak_buffered = 0
+        self.handles = OrderedDict()    # key -> open files, least recently written first
+        self.created = set()        # keys with files created
+        self.counts = {}            # key -> reads added
+        self.mcount = 0
+        self.opens = 0
+        self.writes = 0
+    def filenames(self, key):
+        """
+        Return the output file names of key
+        """
+        if key is None:
+            key = UNIDENTIFIED
+        elif isinstance(key, tuple):
+            key = '_'.join(UNIDENTIFIED if k is None else str(k) for k in key)
+        prefix = '%s_%s' % (self.output_prefix, key)
+        ext = '.fastq' + misc.CODEC_EXTENSIONS[self.codec]
+        if self.nfiles == 1:
+            return [prefix + ext]
+        return [prefix + '_R1' + ext, prefix + '_R2' + ext]
+    def _open(self, key):
+        """
+        Return the open files of key, opening them (and closing the least recently written files when
+        maxopen are open) if needed
+        """
+        files = self.handles.pop(key, None)
+        if files is None:
+            while len(self.handles) >= self.maxopen:
+                self._close(next(iter(self.handles)))
+            mode = 'ab' if key in self.created else 'wb'
+            files = []
+            try:
+                for filename in self.filenames(key):
+                    misc.make_sure_path_exists(os.path.dirname(filename))
+                    files.append(misc.open_write(filename, self.codec, self.compresslevel, self.threads, mode,
+                                                 finalize=False, pool=self.pool))
+            except:
+                print('ERROR:[DemuxOutputPool] Cannot write reads to file: %s' % filename)
+                for f in files:
+                    f.close()
+                raise
+            self.created.add(key)
+            self.opens += 1
+        # most recently written last
+        self.handles[key] = files
+        return files
+    def _close(self, key):
+        """
+        Close the files of key
+        """
+        files = self.handles.pop(key)
+        try:
+            for f in files[:-1]:
+                f.close()
+        finally:
+            files[-1].close()
+    def _buffers(self, key):
+        """
+        Return the buffers of key, made on the first read of key
+        """
+        buffers = self.buffers.get(key)
+        if buffers is None:
+            buffers = self.buffers[key] = [bytearray() for i in xrange(self.nfiles)]
+            self.buffered[key] = 0
+            self.counts[key] = 0
+        return buffers
+    def addRead(self, key, read):
+        """
+        Add a read (one string per file) to the output of key
+        """
+        buffers = self._buffers(key)
+        for i in xrange(self.nfiles):
+            buffers[i] += read[i]
+            buffers[i] += '\n'
+        self._queued(key, 1)
+    def addReads(self, key, reads):
+        """
+        Add a batch of read sets (a ReadBatch or a list of read sets) to the output of key, formatted as
+        their getFastq by write_fastq_batch
+        """
+        nreads = len(reads)
+        write_fastq_batch(reads, *self._buffers(key))
+        self._queued(key, nreads)
+    def _queued(self, key, nreads):
+        """
+        Count nreads reads added to key, then write the buffers that are due
+        """
+        nbytes = sum(len(buffer) for buffer in self.buffers[key])
+        self.total += nbytes - self.buffered[key]
+        self.buffered[key] = nbytes
+        if self.total > self.peak_buffered:
+            self.peak_buffered = self.total
+        self.counts[key] += nreads
+        self.mcount += nreads
+        if self.buffered[key] >= self.buffer_bytes:
+            self._write(key)
+        elif self.total_bytes is not None and self.total >= self.total_bytes:
+            # write the largest buffers until half the budget is free
+            for k in sorted(self.buffered, key=self.buffered.get, reverse=True):
+                if self.total <= self.total_bytes // 2:
+                    break
+                self._write(k)
+    def _write(self, key):
+        """
+        Write the buffered reads of key
+        """
+        buffers = self.buffers.get(key)
+        if buffers is None or len(buffers[0]) == 0:
+            return
+        files = self._open(key)
+        try:
+            for f, buffer in izip(files, buffers):
+                f.write(str(buffer))
+        except:
+            print('ERROR:[DemuxOutputPool] Cannot write reads to file: %s' % ', '.join(self.filenames(key)))
+            raise
+        self.writes += 1
+        self.buffers[key] = [bytearray() for i in xrange(self.nfiles)]
+        self.total -= self.buffered[key]
+        self.buffered[key] = 0
+    def flush(self):
+        """
+        Write the buffered reads of every key
+        """
+        for key in self.buffers:
+            self._write(key)
+    def writeReads(self):
+        """
+        Write all buffered reads, as IlluminaTwoReadOutput.writeReads
+        """
+        self.flush()
+    def close(self):
+        """
+        Write all buffered reads and close every file. BGZF files are closed without their end of file
+        block while they may be reopened, it is added to each file here
+        """
+        try:
+            self.flush()
+        finally:
+            try:
+                while len(self.handles) > 0:
+                    self._close(next(iter(self.handles)))
+            finally:
+                if self.pool is not None:
+                    self.pool.close()
+                    self.pool.join()
+                    self.pool = None
+        if self.codec == 'bgzf':
+            for key in self.created:
+                for filename in self.filenames(key):
+                    bgzf.finalize_file(filename)
+    def count(self, key=None):
+        """
+        Provide the read count of key, or the total read count
+        """
+        if key is None:
+            return self.mcount
+        return self.counts.get(key, 0)
+    def stats(self):
+        """
+        Return counters as a dictionary (reads, keys, open, opens, writes, buffered and peak_buffered bytes)
+        """
+        return {'reads': self.mcount, 'keys': len(self.counts), 'open': len(self.handles),
+                'opens': self.opens, 'writes': self.writes, 'buffered': self.total,
+                'peak_buffered': self.peak_buffered}
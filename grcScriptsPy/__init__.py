@@ -28,14 +28,37 @@ from misc import make_sure_path_exists
 from misc import expand_path
 
 from misc import sp_gzip_read
+from misc import open_read
+from misc import open_write
+from misc import calibrate_gzip_reader
+from misc import AsyncWriter
 
 from sequenceReads import TwoSequenceReadSet
 from sequenceReads import OneSequenceReadSet
+from sequenceReads import ReadBatch
+from sequenceReads import write_fastq_batch
+from sequenceReads import write_fasta_batch
+from sequenceReads import write_joined_fasta_batch
 
-from illuminaRun import TwoReadIlluminaRun
-from illuminaRun import OneReadIlluminaRun
-from illuminaRun import IlluminaTwoReadOutput
-from illuminaRun import IlluminaOneReadOutput
+from fastqReader import FastqBlockReader
+from fastqReader import MmapFastqReader
+from fastqReader import PrefetchReader
+
+from fastqIndex import FastqIndex
+
+from bgzf import BgzfWriter
+
+from IlluminaRun import TwoReadIlluminaRun
+from IlluminaRun import OneReadIlluminaRun
+from IlluminaRun import IlluminaTwoReadOutput
+from IlluminaRun import IlluminaOneReadOutput
+from IlluminaRun import DemuxOutputPool
+
+from shardedRun import run_sharded
+
+from barcodeIndex import BarcodeIndex
+from primerEngine import PrimerEngine
+from assignmentCache import AssignmentCache
 
 from ._version import get_versions
 __version__ = get_versions()['version']
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+assignmentCache.py remembers the sample assignments of a samples table by barcode and primer, so
+the few thousand distinct barcode strings of a run are resolved once rather than once per read.
+"""
+
+DEFAULT_CACHE_SIZE = 100000
+CACHE_POLICIES = ('lru', 'clear')
+
+
+class AssignmentCache:
+    """
+    Class to cache the (sampleID, projectID) of a samples table (anything with getSampleID and
+    getProjectID, or a lookup method returning both, e.g. a BarcodeIndex) by (barcode, primer). It has
+    the same getSampleID, getProjectID and lookup methods, so it is passed to TwoSequenceReadSet.assignRead
+    in place of the table.
+    At most [maxsize] assignments are kept (None for no limit). With policy 'lru' the cache is held
+    in two generations of maxsize / 2, a hit in the older generation moves the entry to the newer
+    one and a full newer generation replaces the older one, so the least recently used entries are
+    dropped (an exact LRU costs more than a lookup in Python 2). With 'clear' the whole cache is
+    dropped when full.
+    """
+    def __init__(self, table, maxsize=DEFAULT_CACHE_SIZE, policy='lru'):
+        """
+        Initialize an empty AssignmentCache of table
+        """
+        if policy not in CACHE_POLICIES:
+            print 'ERROR:[AssignmentCache] unknown cache policy %s, expected one of %s' % (policy, ', '.join(CACHE_POLICIES))
+            raise ValueError('unknown cache policy %s' % policy)
+        self.table = table
+        self.maxsize = maxsize
+        self.policy = policy
+        if maxsize is None:
+            self.limit = None
+        elif policy == 'lru':
+            self.limit = max(1, maxsize // 2)
+        else:
+            self.limit = max(1, maxsize)
+        self.clear()
+    def clear(self):
+        """
+        Drop every cached assignment and reset the counters
+        """
+        self.recent = {}
+        self.older = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    def lookup(self, barcode, primer=None):
+        """
+        Return (sampleID, projectID) of barcode and primer, from the cache or the table, (None, None)
+        when they are not assigned
+        """
+        key = barcode if primer is None else (barcode, primer)
+        value = self.recent.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+        value = self.older.get(key)
+        if value is not None:
+            self.hits += 1
+            del self.older[key]
+        else:
+            self.misses += 1
+            if hasattr(self.table, 'lookup'):
+                value = self.table.lookup(barcode, primer)
+                if value is None:
+                    value = (None, None)
+            else:
+                value = (self.table.getSampleID(barcode, primer), self.table.getProjectID(barcode, primer))
+        recent = self.recent
+        if self.limit is not None and len(recent) >= self.limit:
+            if self.policy == 'lru':
+                self.evictions += len(self.older)
+                self.older = recent
+            else:
+                self.evictions += len(recent)
+            recent = self.recent = {}
+        recent[key] = value
+        return value
+    def getSampleID(self, barcode, primer=None):
+        """
+        Return the sample ID of barcode and primer
+        """
+        return self.lookup(barcode, primer)[0]
+    def getProjectID(self, barcode, primer=None):
+        """
+        Return the project ID of barcode and primer
+        """
+        return self.lookup(barcode, primer)[1]
+    def __len__(self):
+        """
+        Number of cached assignments
+        """
+        return len(self.recent) + len(self.older)
+    def stats(self):
+        """
+        Return the cache counters as a dictionary (hits, misses, evictions, size, hit_rate)
+        """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'size': len(self),
+                'hit_rate': float(self.hits) / lookups if lookups > 0 else 0.0}
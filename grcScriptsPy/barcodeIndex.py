@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+barcodeIndex.py assigns reads to samples by their barcode (index) sequence. Every sequence within
+a Hamming distance of an expected barcode is precomputed from the run's SampleSheet.csv, so a
+read's barcode is resolved with dictionary lookups instead of a scan of all barcodes.
+"""
+
+import csv
+from itertools import combinations
+from itertools import product
+
+# bases substituted into the barcodes, N as sequencers report uncalled bases
+BARCODE_BASES = 'ACGTN'
+# separators of the two indexes of a dual index barcode, as written in sample sheets and read names
+DUAL_INDEX_SEPARATORS = ('-', '+')
+
+
+def hamming_neighborhood(seq, mismatches, bases=BARCODE_BASES):
+    """
+    Generate (sequence, distance) for every sequence of the same length as seq within [mismatches]
+    substitutions of it, seq itself first
+    """
+    yield seq, 0
+    for d in xrange(1, min(mismatches, len(seq)) + 1):
+        for positions in combinations(xrange(len(seq)), d):
+            choices = [[b for b in bases if b != seq[p]] for p in positions]
+            for subs in product(*choices):
+                neighbor = list(seq)
+                for p, b in zip(positions, subs):
+                    neighbor[p] = b
+                yield ''.join(neighbor), d
+
+
+class BarcodeIndex:
+    """
+    Class to hold the barcode to sample assignment of one run, read from a CASAVA style SampleSheet.csv
+    (SampleID, Index and SampleProject columns, a dual index written as "i7-i5" or in index and index2
+    columns). Each index of a barcode matches with up to [mismatches] substitutions, a sequence is
+    corrected to its closest expected index. A sequence at the same distance from two expected indexes
+    is a collision, recorded in collisions, and is not assigned.
+    getSampleID and getProjectID match the samples table interface used by TwoSequenceReadSet.assignRead.
+    """
+    def __init__(self, samplesheet, mismatches=1, lane=None):
+        """
+        Initialize a BarcodeIndex from samplesheet, using only the rows of [lane] when given
+        """
+        self.samplesheet = samplesheet
+        self.mismatches = mismatches
+        self.lane = lane
+        self.samples = {}       # expected barcode -> (sampleID, projectID)
+        self.nindexes = None    # number of indexes in each barcode
+        self.index = {}         # barcode -> (sampleID, projectID), all single index neighbors, exact dual barcodes
+        self.corrections = []   # per index, sequence -> expected index, None for collisions
+        self.collisions = []    # per index, sequence -> expected indexes it collides between
+        self.load()
+        self.build()
+    def load(self):
+        """
+        Read the samples of the sample sheet
+        """
+        try:
+            f = open(self.samplesheet, 'rU')
+        except IOError:
+            print 'ERROR:[BarcodeIndex] cannot open sample sheet: %s' % self.samplesheet
+            raise
+        try:
+            rows = list(csv.reader(f))
+        finally:
+            f.close()
+        # the sample table starts at its header row, CASAVA sheets have no other sections
+        header = None
+        for i, row in enumerate(rows):
+            lower = [field.strip().lower() for field in row]
+            if 'sampleid' in lower or 'sample_id' in lower:
+                header = lower
+                rows = rows[i + 1:]
+                break
+        if header is None:
+            print 'ERROR:[BarcodeIndex] sample sheet has no SampleID column: %s' % self.samplesheet
+            raise ValueError('sample sheet has no SampleID column: %s' % self.samplesheet)
+        column = dict((name, i) for i, name in reversed(list(enumerate(header))))
+        sample_col = column.get('sampleid', column.get('sample_id'))
+        index_col = column.get('index')
+        index2_col = column.get('index2')
+        project_col = column.get('sampleproject', column.get('sample_project'))
+        lane_col = column.get('lane')
+        if index_col is None:
+            print 'ERROR:[BarcodeIndex] sample sheet has no Index column: %s' % self.samplesheet
+            raise ValueError('sample sheet has no Index column: %s' % self.samplesheet)
+        for row in rows:
+            if not row or not ''.join(row).strip():
+                continue
+            row = [field.strip() for field in row] + [''] * (len(header) - len(row))
+            if self.lane is not None and lane_col is not None and row[lane_col] != str(self.lane):
+                continue
+            indexes = row[index_col].upper()
+            for sep in DUAL_INDEX_SEPARATORS[1:]:
+                indexes = indexes.replace(sep, DUAL_INDEX_SEPARATORS[0])
+            indexes = [i for i in indexes.split(DUAL_INDEX_SEPARATORS[0]) if i]
+            if index2_col is not None and row[index2_col]:
+                indexes.append(row[index2_col].upper())
+            barcode = DUAL_INDEX_SEPARATORS[0].join(indexes)
+            if self.nindexes is None:
+                self.nindexes = len(indexes)
+            elif len(indexes) != self.nindexes:
+                print 'ERROR:[BarcodeIndex] samples have different numbers of indexes: %s' % barcode
+                raise ValueError('samples have different numbers of indexes: %s' % barcode)
+            sample = (row[sample_col], row[project_col] if project_col is not None else None)
+            if self.samples.setdefault(barcode, sample) != sample:
+                print 'ERROR:[BarcodeIndex] barcode %s is used by samples %s and %s' % \
+                    (barcode, self.samples[barcode][0], sample[0])
+                raise ValueError('barcode %s is used by more than one sample' % barcode)
+        if not self.samples:
+            print 'ERROR:[BarcodeIndex] no samples found in sample sheet: %s' % self.samplesheet
+            raise ValueError('no samples found in sample sheet: %s' % self.samplesheet)
+    def build(self):
+        """
+        Precompute the corrections of each index within [mismatches] of the expected indexes
+        """
+        self.corrections = []
+        self.collisions = []
+        for i in xrange(self.nindexes):
+            expected = set(barcode.split(DUAL_INDEX_SEPARATORS[0])[i] for barcode in self.samples)
+            nearest = {}
+            collisions = {}
+            for exp in expected:
+                for seq, d in hamming_neighborhood(exp, self.mismatches):
+                    found = nearest.get(seq)
+                    if found is None or d < found[1]:
+                        nearest[seq] = (exp, d)
+                        collisions.pop(seq, None)
+                    elif d == found[1]:
+                        collisions.setdefault(seq, set([found[0]])).add(exp)
+            corrections = dict((seq, exp) for seq, (exp, d) in nearest.iteritems())
+            for seq in collisions:
+                corrections[seq] = None
+            self.corrections.append(corrections)
+            self.collisions.append(collisions)
+        if self.nindexes == 1:
+            self.index = dict((seq, self.samples[exp]) for seq, exp in self.corrections[0].iteritems()
+                              if exp is not None)
+        else:
+            self.index = dict(self.samples)
+        if any(self.collisions):
+            print 'WARNING:[BarcodeIndex] %s sequences are within %s mismatches of more than one barcode and are not assigned' % \
+                (sum(len(c) for c in self.collisions), self.mismatches)
+    def lookup(self, barcode, primer=None):
+        """
+        Return (sampleID, projectID) of the sample barcode is assigned to, or None. primer is not used
+        """
+        sample = self.index.get(barcode)
+        if sample is not None or self.nindexes == 1 or barcode is None:
+            return sample
+        # a dual index barcode with mismatches, correct each index
+        for sep in DUAL_INDEX_SEPARATORS:
+            parts = barcode.split(sep)
+            if len(parts) == self.nindexes:
+                break
+        else:
+            return None
+        corrected = []
+        for part, corrections in zip(parts, self.corrections):
+            exp = corrections.get(part)
+            if exp is None:
+                return None
+            corrected.append(exp)
+        return self.samples.get(DUAL_INDEX_SEPARATORS[0].join(corrected))
+    def getSampleID(self, barcode, primer=None):
+        """
+        Return the sample ID of barcode, None when it is not assigned. primer is not used
+        """
+        sample = self.lookup(barcode)
+        return sample[0] if sample is not None else None
+    def getProjectID(self, barcode, primer=None):
+        """
+        Return the project ID of barcode, None when it is not assigned. primer is not used
+        """
+        sample = self.lookup(barcode)
+        return sample[1] if sample is not None else None
+    def __len__(self):
+        """
+        Number of samples
+        """
+        return len(self.samples)
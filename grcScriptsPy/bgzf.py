@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+bgzf.py writes blocked gzip (BGZF) files. The output stream is cut into independent blocks, each one
+a complete gzip member, so blocks can be deflated in parallel and the file still reads with gzip -d.
+"""
+
+import zlib
+import struct
+from collections import deque
+from multiprocessing.pool import ThreadPool
+
+# largest amount of uncompressed data per block, so a compressed block always fits in 64KB
+BGZF_BLOCKSIZE = 65280
+# gzip header with the BGZF extra field, the block size follows
+BGZF_HEADER = '\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00'
+# empty block marking the end of a BGZF file
+BGZF_EOF = '\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00\x1b\x00\x03\x00\x00\x00\x00\x00\x00\x00\x00\x00'
+
+
+def compress_block(data, level):
+    """
+    Deflate up to BGZF_BLOCKSIZE bytes of data into one BGZF block
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    cdata = compressor.compress(data) + compressor.flush()
+    return ''.join([BGZF_HEADER,
+                    struct.pack('<H', len(BGZF_HEADER) + len(cdata) + 8 + 2 - 1),
+                    cdata,
+                    struct.pack('<II', zlib.crc32(data) & 0xffffffff, len(data))])
+
+
+class BgzfWriter:
+    """
+    Class to write a BGZF file, deflating blocks on a pool of [threads] worker threads.
+    Blocks are written to the file in order as they finish.
+    """
+    def __init__(self, filename, mode='wb', threads=1, level=6, finalize=True, pool=None):
+        """
+        Initialize a BgzfWriter for filename, mode 'ab' appends blocks to an existing file. With finalize
+        False close does not write the end of file block, for a file that is appended to again (BGZF
+        readers stop at the first empty block), the block is then written by finalize_file. A ThreadPool
+        given as pool is shared with other writers, it is used instead of a new one and left open on close
+        """
+        self.handle = open(filename, mode)
+        self.level = level
+        self.finalize = finalize
+        self.buffer = []
+        self.buffered = 0
+        self.pending = deque()
+        self.maxpending = 4 * threads
+        self.ownpool = pool is None and threads > 1
+        if self.ownpool:
+            self.pool = ThreadPool(threads)
+        else:
+            self.pool = pool
+    def _dispatch(self, final):
+        """
+        Cut the buffered data into blocks and hand them to the workers, keeping any partial
+        block back unless this is the final dispatch
+        """
+        data = ''.join(self.buffer)
+        if final:
+            end = len(data)
+        else:
+            end = len(data) - len(data) % BGZF_BLOCKSIZE
+        for start in xrange(0, end, BGZF_BLOCKSIZE):
+            block = data[start:start + BGZF_BLOCKSIZE]
+            if self.pool is None:
+                self.handle.write(compress_block(block, self.level))
+            else:
+                self.pending.append(self.pool.apply_async(compress_block, (block, self.level)))
+                while len(self.pending) > self.maxpending:
+                    self.handle.write(self.pending.popleft().get())
+        if end < len(data):
+            self.buffer = [data[end:]]
+        else:
+            self.buffer = []
+        self.buffered = len(data) - end
+    def write(self, data):
+        """
+        Write data to the file
+        """
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= BGZF_BLOCKSIZE:
+            self._dispatch(False)
+    def flush(self):
+        """
+        Compress and write all buffered data, the data written so far forms complete gzip members
+        """
+        self._dispatch(True)
+        while len(self.pending) > 0:
+            self.handle.write(self.pending.popleft().get())
+        self.handle.flush()
+    def close(self):
+        """
+        Flush the remaining data, write the BGZF end of file block unless finalize is False and close the file
+        """
+        try:
+            self.flush()
+            if self.finalize:
+                self.handle.write(BGZF_EOF)
+        finally:
+            self.handle.close()
+            if self.ownpool:
+                self.pool.close()
+                self.pool.join()
+
+
+def finalize_file(filename):
+    """
+    Append the BGZF end of file block to a file written by BgzfWriters with finalize False
+    """
+    with open(filename, 'ab') as f:
+        f.write(BGZF_EOF)
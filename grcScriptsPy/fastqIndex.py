@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+fastqIndex.py builds and reads record indexes of fastq files (plain or gzipped) so a file can be opened
+at any record number without reading it from the start.
+"""
+
+import os
+import io
+import zlib
+import hashlib
+import multiprocessing
+from bisect import bisect_right
+from grcScriptsPy import misc
+from grcScriptsPy import fastqReader
+
+DEFAULT_INDEX_INTERVAL = 10000
+INDEX_SUFFIX = '.fqi'
+INDEX_HEADER = '#grcScriptsPy fastq index'
+# directory get_index saves indexes in, the input directories are left untouched
+INDEX_CACHE = os.path.join(os.path.expanduser('~'), '.grcScriptsPy_index')
+
+# indexes already used by this process (and inherited by forked workers)
+_indexes = {}
+
+
+class FastqIndex:
+    """
+    Class to hold the checkpoints of a fastq file, one every [interval] records. Each checkpoint is
+    (record, uoffset, coffset, moffset): the record number, its uncompressed byte offset, the compressed
+    offset of the gzip member holding it and the uncompressed offset that member starts at.
+    For plain files coffset and moffset equal uoffset.
+
+    Python's zlib cannot restart a deflate stream from a saved window, so gzip checkpoints are
+    gzip member starts. Blocked gzip (BGZF, as written by bcl2fastq and bgzf.BgzfWriter) has a
+    member every 64KB, a single member gzip file is decompressed from its start but not parsed.
+    """
+    def __init__(self, filename, interval, compressed, nrecords, checkpoints):
+        """
+        Initialize a FastqIndex, normally done with build or load
+        """
+        self.filename = filename
+        self.interval = interval
+        self.compressed = compressed
+        self.nrecords = nrecords
+        self.checkpoints = checkpoints
+        self.records = [checkpoint[0] for checkpoint in checkpoints]
+    @staticmethod
+    def build(filename, interval=DEFAULT_INDEX_INTERVAL):
+        """
+        Read through filename once and return its FastqIndex
+        """
+        if misc.is_xz(filename):
+            print('ERROR:[FastqIndex] xz compressed files cannot be indexed: %s' % filename)
+            raise ValueError('xz compressed files cannot be indexed: %s' % filename)
+        compressed = misc.is_gzip(filename)
+        checkpoints = []
+        nlines = 0          # newlines seen so far
+        target = 0          # newlines before the next checkpointed record
+        uoffset = 0         # uncompressed offset of the current data
+        coffset = 0         # compressed offset of the current member
+        moffset = 0         # uncompressed offset of the current member
+        last = '\n'
+        f = open(filename, 'rb')
+        try:
+            if compressed:
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            base = 0
+            while True:
+                chunk = f.read(misc.ZLIB_BUFSIZE)
+                if not chunk:
+                    break
+                while True:
+                    if compressed:
+                        data = decompressor.decompress(chunk)
+                    else:
+                        data = chunk
+                    n = data.count('\n')
+                    while target < nlines + n or (target == nlines and len(data) > 0):
+                        pos = -1
+                        for i in xrange(target - nlines):
+                            pos = data.find('\n', pos + 1)
+                        offset = uoffset + pos + 1
+                        if compressed:
+                            checkpoints.append((target / 4, offset, coffset, moffset))
+                        else:
+                            checkpoints.append((target / 4, offset, offset, offset))
+                        target += 4 * interval
+                    nlines += n
+                    uoffset += len(data)
+                    if len(data) > 0:
+                        last = data[-1]
+                    if not compressed or decompressor.unused_data == '':
+                        break
+                    # the member ended within this chunk, start the next one
+                    unused = decompressor.unused_data
+                    coffset = base + len(chunk) - len(unused)
+                    moffset = uoffset
+                    base = coffset
+                    chunk = unused
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                base += len(chunk)
+        finally:
+            f.close()
+        if last != '\n':
+            nlines += 1
+        nrecords = nlines / 4
+        # the record after the last one is the end of the file
+        if len(checkpoints) > 0 and checkpoints[-1][0] >= nrecords:
+            checkpoints.pop()
+        if len(checkpoints) == 0:
+            checkpoints.append((0, 0, 0, 0))
+        return FastqIndex(filename, interval, compressed, nrecords, checkpoints)
+    def save(self, indexfile):
+        """
+        Write the index to indexfile, recording the size and modification time of the fastq file
+        """
+        stat = os.stat(self.filename)
+        with open(indexfile, 'w') as f:
+            f.write(INDEX_HEADER + '\n')
+            f.write('#size\t%d\tmtime\t%d\tinterval\t%d\tcompressed\t%d\trecords\t%d\n' % (stat.st_size, int(stat.st_mtime), self.interval, self.compressed, self.nrecords))
+            for checkpoint in self.checkpoints:
+                f.write('%d\t%d\t%d\t%d\n' % checkpoint)
+    @staticmethod
+    def load(filename, indexfile):
+        """
+        Read the index of filename from indexfile, returns None if indexfile is not an index
+        or the fastq file has changed since it was written
+        """
+        with open(indexfile, 'r') as f:
+            if f.readline().rstrip() != INDEX_HEADER:
+                return None
+            fields = f.readline().rstrip().split('\t')
+            info = dict(zip(fields[0::2], fields[1::2]))
+            stat = os.stat(filename)
+            if info['#size'] != str(stat.st_size) or info['mtime'] != str(int(stat.st_mtime)):
+                return None
+            checkpoints = [tuple(int(x) for x in line.split('\t')) for line in f]
+        return FastqIndex(filename, int(info['interval']), info['compressed'] == '1', int(info['records']), checkpoints)
+    def open_at(self, record, blocksize=fastqReader.DEFAULT_BLOCKSIZE):
+        """
+        Open the fastq file positioned at record (0 based), returning a FastqBlockReader
+        """
+        if record < 0 or record > self.nrecords:
+            print('ERROR:[FastqIndex] record %d is outside of the file %s' % (record, self.filename))
+            raise Exception("record is outside of the file")
+        first, uoffset, coffset, moffset = self.checkpoints[bisect_right(self.records, record) - 1]
+        if self.compressed:
+            handle = io.BufferedReader(misc.ZlibGzipReader(self.filename, offset=coffset), misc.ZLIB_BUFSIZE)
+            skip = uoffset - moffset
+            while skip > 0:
+                data = handle.read(min(skip, misc.ZLIB_BUFSIZE))
+                if not data:
+                    break
+                skip -= len(data)
+            reader = fastqReader.FastqBlockReader(handle, blocksize)
+        else:
+            reader = fastqReader.MmapFastqReader(self.filename, blocksize, offset=uoffset)
+        skip = record - first
+        while skip > 0:
+            nread = len(reader.read(min(skip, fastqReader.DEFAULT_PREFETCH_BATCH))[0])
+            if nread == 0:
+                break
+            skip -= nread
+        return reader
+
+
+def index_file(filename, cachedir=INDEX_CACHE):
+    """
+    Return the file the index of filename is saved to in cachedir, named by the md5 of its real path
+    """
+    return os.path.join(cachedir, hashlib.md5(os.path.realpath(filename)).hexdigest() + INDEX_SUFFIX)
+
+def _index_key(filename):
+    """
+    Return the key of filename in _indexes, its real path, size and modification time
+    """
+    stat = os.stat(filename)
+    return (os.path.realpath(filename), stat.st_size, stat.st_mtime)
+
+def get_index(filename, interval=DEFAULT_INDEX_INTERVAL, cachedir=INDEX_CACHE):
+    """
+    Return the index of filename, loaded from cachedir when it is up to date, otherwise built and
+    saved there. The index is kept in memory only when cachedir is None or cannot be written
+    """
+    key = _index_key(filename)
+    if key in _indexes:
+        return _indexes[key]
+    index = None
+    if cachedir is not None:
+        indexfile = index_file(filename, cachedir)
+        try:
+            index = FastqIndex.load(filename, indexfile)
+        except (IOError, ValueError, KeyError):
+            index = None
+    if index is None:
+        index = FastqIndex.build(filename, interval)
+        if cachedir is not None:
+            # written aside and renamed, so concurrent runs never load a partial index
+            tmpfile = '%s.%d' % (indexfile, os.getpid())
+            try:
+                misc.make_sure_path_exists(cachedir)
+                index.save(tmpfile)
+                os.rename(tmpfile, indexfile)
+            except (IOError, OSError):
+                try:
+                    os.remove(tmpfile)
+                except OSError:
+                    pass
+    _indexes[key] = index
+    return index
+
+def _get_index(args):
+    """
+    Process pool worker, return the index of a file
+    """
+    filename, interval, cachedir = args
+    return get_index(filename, interval, cachedir)
+
+def get_indexes(filenames, processes=None, interval=DEFAULT_INDEX_INTERVAL, cachedir=INDEX_CACHE):
+    """
+    Return the indexes of a list of files as get_index does. The indexes not used by this process yet are
+    loaded or built on [processes] processes (default the number of cpus), one file per process
+    """
+    missing = {}
+    for filename in filenames:
+        key = _index_key(filename)
+        if key not in _indexes:
+            missing[key] = filename
+    if len(missing) > 1 and processes != 1:
+        keys = sorted(missing)
+        pool = multiprocessing.Pool(min(processes or multiprocessing.cpu_count(), len(keys)))
+        try:
+            indexes = pool.map(_get_index, [(missing[key], interval, cachedir) for key in keys], chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+        _indexes.update(zip(keys, indexes))
+    return [get_index(filename, interval, cachedir) for filename in filenames]
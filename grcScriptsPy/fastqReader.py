@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+fastqReader.py reads fastq records from a file object (plain file or gzip pipe) in large blocks,
+splitting each block into records in bulk (with _grcScripts.fastq_tokenize) rather than pulling
+the file one line at a time.
+"""
+
+import os
+import sys
+import mmap
+import threading
+import Queue
+from grcScriptsPy import misc
+from _grcScripts import fastq_tokenize
+
+DEFAULT_BLOCKSIZE = 256 * 1024
+DEFAULT_PREFETCH_BATCH = 10000
+
+
+class FastqBlockReader:
+    """
+    Class to read fastq records from an open file object in blocks of [blocksize] bytes. Complete
+    records are split out of each block at once by the C tokenizer, which checks the four line
+    structure, any partial record is carried over to the next block.
+    """
+    def __init__(self, handle, blocksize=DEFAULT_BLOCKSIZE):
+        """
+        Initialize a FastqBlockReader with an open file object (anything with read/close)
+        """
+        self.handle = handle
+        self.blocksize = blocksize
+        self.names = []
+        self.seqs = []
+        self.quals = []
+        self.pos = 0
+        self.tail = ''
+        self.eof = False
+    def _split(self, block, final=False):
+        """
+        Split a new block into records, joining it with the partial record carried over from the last block.
+        With final the block ends the file.
+        """
+        if len(self.tail) > 0:
+            block = self.tail + block
+        try:
+            self.names, self.seqs, self.quals, end = fastq_tokenize(block, final=final)
+        except ValueError as e:
+            print('ERROR:[FastqBlockReader] %s' % e)
+            raise
+        self.tail = block[end:]
+        self.pos = 0
+    def _fill(self):
+        """
+        Read blocks until at least one complete record is available, returns False at end of file
+        """
+        while not self.eof:
+            block = self.handle.read(self.blocksize)
+            if not block:
+                self.eof = True
+                # a final line without a newline, then blank lines at the end of the file
+                self._split('', final=True)
+            else:
+                self._split(block)
+            if len(self.names) > 0:
+                return True
+        return False
+    def read(self, nrecords):
+        """
+        Return the next [nrecords] records as three lists (names, sequences, qualities).
+        Fewer records are returned only when the end of the file has been reached.
+        """
+        names = []
+        seqs = []
+        quals = []
+        while len(names) < nrecords:
+            if self.pos >= len(self.names):
+                if not self._fill():
+                    break
+            end = self.pos + nrecords - len(names)
+            names.extend(self.names[self.pos:end])
+            seqs.extend(self.seqs[self.pos:end])
+            quals.extend(self.quals[self.pos:end])
+            self.pos = min(end, len(self.names))
+        return names, seqs, quals
+    def close(self):
+        """
+        Close the underlying file object
+        """
+        self.handle.close()
+
+
+class MmapFastqReader(FastqBlockReader):
+    """
+    Class to read an uncompressed fastq file through a read only memory map. Records are tokenized
+    straight out of the mapped file [blocksize] bytes at a time, no read system call or block copy
+    is made. The map is available as [buffer] for callers working on offsets.
+    """
+    def __init__(self, filename, blocksize=DEFAULT_BLOCKSIZE, offset=0):
+        """
+        Initialize a MmapFastqReader by mapping filename, reading starts at byte [offset]
+        which must be the start of a record
+        """
+        self.file = open(filename, 'rb')
+        self.offset = offset
+        if os.fstat(self.file.fileno()).st_size > 0:
+            self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            FastqBlockReader.__init__(self, self.buffer, blocksize)
+        else:
+            # an empty file cannot be mapped
+            self.buffer = None
+            FastqBlockReader.__init__(self, self.file, blocksize)
+            self.eof = True
+    def _fill(self):
+        """
+        Tokenize the records of the next block of the map, returns False at end of file
+        """
+        size = len(self.buffer) if self.buffer is not None else 0
+        blocksize = self.blocksize
+        while not self.eof:
+            end = min(self.offset + blocksize, size)
+            final = end == size
+            try:
+                self.names, self.seqs, self.quals, offset = fastq_tokenize(self.buffer, self.offset, end, final)
+            except ValueError as e:
+                print('ERROR:[MmapFastqReader] %s' % e)
+                raise
+            self.pos = 0
+            self.offset = offset
+            self.eof = final
+            if len(self.names) > 0:
+                return True
+            # a record longer than the block
+            blocksize *= 2
+        return False
+    def close(self):
+        """
+        Unmap and close the file
+        """
+        if self.buffer is not None:
+            self.buffer.close()
+        self.file.close()
+
+
+def open_fastq(filename, blocksize=DEFAULT_BLOCKSIZE):
+    """
+    Open a fastq file for block reading, memory mapping regular uncompressed files and reading
+    anything else (gzip, xz, pipes) through misc.open_read
+    """
+    if os.path.isfile(filename) and not misc.is_compressed(filename):
+        try:
+            return MmapFastqReader(filename, blocksize)
+        except (EnvironmentError, mmap.error):
+            pass
+    return FastqBlockReader(misc.open_read(filename), blocksize)
+
+
+class PrefetchReader:
+    """
+    Class to read fastq records ahead of the caller. A background thread pulls batches of [batchsize]
+    records from a FastqBlockReader into a bounded queue holding at most [depth] batches, so that
+    reading and splitting the next batches overlaps with processing of the current one.
+    """
+    def __init__(self, reader, depth=2, batchsize=DEFAULT_PREFETCH_BATCH):
+        """
+        Initialize a PrefetchReader around a FastqBlockReader and start the background thread
+        """
+        self.reader = reader
+        self.batchsize = batchsize
+        self.queue = Queue.Queue(maxsize=depth)
+        self.stopped = threading.Event()
+        self.names = []
+        self.seqs = []
+        self.quals = []
+        self.pos = 0
+        self.eof = False
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+    def _put(self, item):
+        """
+        Queue an item, waiting for space unless the reader is being closed
+        """
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except Queue.Full:
+                pass
+        return False
+    def _run(self):
+        """
+        Background thread, queue batches until end of file, close() or an error. Errors are queued
+        and raised again in the calling thread.
+        """
+        try:
+            while not self.stopped.is_set():
+                batch = self.reader.read(self.batchsize)
+                if not self._put((batch, None)) or len(batch[0]) < self.batchsize:
+                    break
+        except:
+            self._put((None, sys.exc_info()))
+    def _fill(self):
+        """
+        Take the next batch from the queue, returns False at end of file
+        """
+        if self.eof:
+            return False
+        batch, error = self.queue.get()
+        if error is not None:
+            self.eof = True
+            raise error[0], error[1], error[2]
+        self.names, self.seqs, self.quals = batch
+        self.pos = 0
+        if len(self.names) < self.batchsize:
+            self.eof = True
+        return len(self.names) > 0
+    def read(self, nrecords):
+        """
+        Return the next [nrecords] records as three lists (names, sequences, qualities).
+        Fewer records are returned only when the end of the file has been reached.
+        """
+        names = []
+        seqs = []
+        quals = []
+        while len(names) < nrecords:
+            if self.pos >= len(self.names):
+                if not self._fill():
+                    break
+            end = self.pos + nrecords - len(names)
+            names.extend(self.names[self.pos:end])
+            seqs.extend(self.seqs[self.pos:end])
+            quals.extend(self.quals[self.pos:end])
+            self.pos = min(end, len(self.names))
+        return names, seqs, quals
+    def close(self):
+        """
+        Stop the background thread and close the underlying reader
+        """
+        self.stopped.set()
+        while self.thread.is_alive():
+            try:
+                self.queue.get_nowait()
+            except Queue.Empty:
+                pass
+            self.thread.join(0.1)
+        self.reader.close()
@@ -28,21 +28,432 @@ import sys, os, errno
 from subprocess import Popen, PIPE
 import glob
 import shlex
+import io
+import gzip
+import time
+import zlib
+import threading
+import Queue
+from itertools import product
+from distutils.spawn import find_executable
+from grcScriptsPy import bgzf
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
 
 '''
 Gzip utilities, run gzip in a subprocess
 '''
 
-### Add try Popen except try gzip.open except
-def sp_gzip_read(file):
-    p = Popen(shlex.split('gzip --decompress --to-stdout') + [file], stdout = PIPE, stderr = PIPE, bufsize=-1)
-## gzip.open(read2, 'rb')
-    return p.stdout
+GZIP_MAGIC = '\x1f\x8b'
+XZ_MAGIC = '\xfd7zXZ\x00'
+# gzip readers in order of preference when no calibration has been run, zlib in process reads faster
+# than a gzip subprocess
+GZIP_READERS = ['igzip', 'pigz', 'zlib', 'gzip']
+# file recording the reader chosen by calibrate_gzip_reader
+GZIP_READER_CACHE = os.path.join(os.path.expanduser('~'), '.grcScriptsPy_gzip_reader')
+ZLIB_BUFSIZE = 1024 * 1024
+
+_gzip_reader = None
+
+class ProcessReader:
+    """
+    Class to read the stdout of a decompressing subprocess. Once the output is read to its end the
+    exit status of the process is checked, and a failure (a truncated or corrupt input) raised as an
+    IOError with the process' error message. close reaps the process, raising the failure of a process
+    that exited on its own before the output was read.
+    """
+    def __init__(self, process, file):
+        self.process = process
+        self.file = file
+        self.handle = process.stdout
+        self.eof = False
+    def _check(self):
+        """
+        Wait for the process at the end of its output and raise its failure
+        """
+        self.eof = True
+        status = self.process.wait()
+        if status != 0:
+            message = self.process.stderr.read().strip() if self.process.stderr is not None else ''
+            print('ERROR:[ProcessReader] Decompressing %s failed (exit status %d): %s' % (self.file, status, message))
+            raise IOError('decompressing %s failed (exit status %d): %s' % (self.file, status, message))
+    def read(self, size=-1):
+        data = self.handle.read(size)
+        if size < 0 or (not data and size != 0):
+            self._check()
+        return data
+    def readline(self, size=-1):
+        line = self.handle.readline(size)
+        if not line and size != 0:
+            self._check()
+        return line
+    def __iter__(self):
+        for line in self.handle:
+            yield line
+        self._check()
+    def close(self):
+        """
+        Close the output and reap the process, a process stopped early by the closed pipe is not an error
+        """
+        if self.handle.closed:
+            return
+        status = self.process.poll()
+        self.handle.close()
+        self.process.wait()
+        if not self.eof and status is not None and status != 0:
+            self._check()
+
+def sp_gzip_read(file, program='gzip'):
+    """
+    Decompress a gzip file with [program] (gzip, pigz or igzip) in a subprocess, returning a ProcessReader
+    of its stdout
+    """
+    p = Popen(shlex.split(program + ' --decompress --stdout') + [file], stdout = PIPE, stderr = PIPE, bufsize=-1)
+    return ProcessReader(p, file)
+
+class ZlibGzipReader(io.RawIOBase):
+    """
+    Class to decompress a (possibly multi-member) gzip file in process with zlib, reading the
+    compressed file in blocks of [bufsize] bytes starting from the gzip member at [offset].
+    A file ending within a gzip member raises an IOError rather than reading as a shorter file
+    """
+    def __init__(self, file, bufsize=ZLIB_BUFSIZE, offset=0):
+        io.RawIOBase.__init__(self)
+        self.file = file
+        self.handle = open(file, 'rb')
+        self.handle.seek(offset)
+        self.bufsize = bufsize
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.started = False    # data given to the current member
+        self.data = ''
+        self.pos = 0
+    def readable(self):
+        return True
+    def _complete(self):
+        """
+        Return whether the current member is complete: its decompressor leaves any further data unused
+        """
+        if not self.started:
+            return True
+        try:
+            probe = self.decompressor.copy()
+            probe.decompress('\x00')
+        except zlib.error:
+            return False
+        return probe.unused_data != ''
+    def readinto(self, b):
+        while self.pos >= len(self.data):
+            cdata = self.handle.read(self.bufsize)
+            if not cdata:
+                if not self._complete():
+                    print('ERROR:[ZlibGzipReader] gzip file ends within a member, it is truncated: %s' % self.file)
+                    raise IOError('gzip file is truncated: %s' % self.file)
+                return 0
+            self.started = True
+            parts = [self.decompressor.decompress(cdata)]
+            while self.decompressor.unused_data != '':
+                # start of the next gzip member, BGZF input has one every 64KB
+                cdata = self.decompressor.unused_data
+                self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                parts.append(self.decompressor.decompress(cdata))
+            self.data = ''.join(parts)
+            self.pos = 0
+        n = min(len(b), len(self.data) - self.pos)
+        b[:n] = self.data[self.pos:self.pos + n]
+        self.pos += n
+        return n
+    def close(self):
+        self.handle.close()
+        io.RawIOBase.close(self)
+
+def available_gzip_readers():
+    """
+    Return the gzip readers available on this host, in order of preference
+    """
+    return [reader for reader in GZIP_READERS if reader == 'zlib' or find_executable(reader) is not None]
+
+def gzip_reader(file, reader):
+    """
+    Open a gzip file for reading with the named reader (igzip, pigz, zlib or gzip), falling back to
+    zlib in process if the program cannot be run
+    """
+    if reader != 'zlib':
+        try:
+            return sp_gzip_read(file, reader)
+        except OSError:
+            pass
+    return io.BufferedReader(ZlibGzipReader(file), ZLIB_BUFSIZE)
+
+def select_gzip_reader():
+    """
+    Return the name of the gzip reader to use, the one cached by calibrate_gzip_reader when
+    still available, otherwise the first available in order of preference
+    """
+    global _gzip_reader
+    if _gzip_reader is None:
+        available = available_gzip_readers()
+        try:
+            cached = open(GZIP_READER_CACHE).read().strip()
+        except IOError:
+            cached = None
+        if cached in available:
+            _gzip_reader = cached
+        else:
+            _gzip_reader = available[0]
+    return _gzip_reader
+
+def calibrate_gzip_reader(sample, cachefile=GZIP_READER_CACHE):
+    """
+    Time every available gzip reader on the gzip file sample, use the fastest from now on and record
+    it in cachefile (None to skip) for later runs. Returns the fastest reader and a dictionary of MB/s
+    """
+    global _gzip_reader
+    results = {}
+    for reader in available_gzip_readers():
+        t = time.time()
+        handle = gzip_reader(sample, reader)
+        nbytes = 0
+        while True:
+            data = handle.read(ZLIB_BUFSIZE)
+            if not data:
+                break
+            nbytes += len(data)
+        handle.close()
+        results[reader] = nbytes / 1e6 / max(time.time() - t, 1e-6)
+    _gzip_reader = max(results, key=results.get)
+    if cachefile is not None:
+        try:
+            with open(cachefile, 'w') as f:
+                f.write(_gzip_reader + '\n')
+        except IOError:
+            print('WARNING:[calibrate_gzip_reader] Cannot record the gzip reader in: %s' % cachefile)
+    return _gzip_reader, results
+
+def is_gzip(file):
+    """
+    Check the magic bytes at the start of file for gzip compression
+    """
+    with open(file, 'rb') as f:
+        return f.read(2) == GZIP_MAGIC
+
+def is_xz(file):
+    """
+    Check the magic bytes at the start of file for xz compression
+    """
+    with open(file, 'rb') as f:
+        return f.read(len(XZ_MAGIC)) == XZ_MAGIC
+
+def is_compressed(file):
+    """
+    Check the magic bytes at the start of file for gzip or xz compression
+    """
+    with open(file, 'rb') as f:
+        magic = f.read(len(XZ_MAGIC))
+    return magic.startswith(GZIP_MAGIC) or magic == XZ_MAGIC
+
+def open_read(file):
+    """
+    Open a file for reading, gzip files (recognized by their magic bytes rather than the file
+    extension) are decompressed by the selected gzip reader, xz files by lzma or an xz subprocess
+    """
+    if is_gzip(file):
+        return gzip_reader(file, select_gzip_reader())
+    if is_xz(file):
+        if lzma is not None:
+            return io.BufferedReader(lzma.open(file, 'rb'), ZLIB_BUFSIZE)
+        p = Popen(['xz', '--decompress', '--stdout', file], stdout = PIPE, stderr = PIPE, bufsize=-1)
+        return ProcessReader(p, file)
+    return open(file, 'rb')
 
 def sp_gzip_write(file):
     p = Popen('gzip > ' + file,stdin=PIPE,shell=True)
     return p.stdin
 
+'''
+Output codecs, the compression of files written by the output classes
+'''
+
+# codecs and the file extension of each
+OUTPUT_CODECS = ('raw', 'gzip', 'bgzf', 'xz')
+CODEC_EXTENSIONS = {'raw': '', 'gzip': '.gz', 'bgzf': '.gz', 'xz': '.xz'}
+# compression level of each codec when none is given
+CODEC_LEVELS = {'raw': None, 'gzip': 9, 'bgzf': 9, 'xz': 6}
+# named codec settings, fast for scratch files deleted after the next step
+CODEC_PRESETS = {'fast': ('gzip', 1), 'uncompressed': ('raw', None)}
+
+class XzWriter:
+    """
+    Class to write an xz file through an xz subprocess (Python 2 has no lzma module), compressing
+    on [threads] xz threads. Errors of xz are raised by close.
+    """
+    def __init__(self, file, mode='wb', level=6, threads=1):
+        """
+        Initialize an XzWriter for file, mode 'ab' appends an xz stream to an existing file
+        """
+        self.file = file
+        self.handle = open(file, mode)
+        try:
+            self.process = Popen(['xz', '--compress', '--stdout', '-%d' % level, '--threads=%d' % threads],
+                                 stdin=PIPE, stdout=self.handle, bufsize=-1)
+        except OSError:
+            self.handle.close()
+            print('ERROR:[XzWriter] Cannot run xz to write: %s' % file)
+            raise
+    def write(self, data):
+        """
+        Write data to the file
+        """
+        self.process.stdin.write(data)
+    def flush(self):
+        """
+        Flush data to the xz process
+        """
+        self.process.stdin.flush()
+    def close(self):
+        """
+        Finish compression and close the file
+        """
+        try:
+            self.process.stdin.close()
+            returncode = self.process.wait()
+        finally:
+            self.handle.close()
+        if returncode != 0:
+            print('ERROR:[XzWriter] xz failed writing: %s' % self.file)
+            raise IOError('xz exited with status %d writing %s' % (returncode, self.file))
+
+def parse_codec(codec, level=None):
+    """
+    Return (codec, level) of a codec setting: a codec name, optionally with a level as in gzip:4,
+    or a preset name. A level in the setting replaces [level], the codec default is used without either
+    """
+    name, sep, codec_level = codec.lower().partition(':')
+    if name in CODEC_PRESETS:
+        name, preset_level = CODEC_PRESETS[name]
+        if level is None:
+            level = preset_level
+    if name not in OUTPUT_CODECS:
+        print('ERROR:[parse_codec] unknown codec %s, expected one of %s' % (codec, ', '.join(OUTPUT_CODECS + tuple(sorted(CODEC_PRESETS)))))
+        raise ValueError('unknown codec %s' % codec)
+    if sep:
+        try:
+            level = int(codec_level)
+        except ValueError:
+            print('ERROR:[parse_codec] codec level is not a number: %s' % codec)
+            raise
+    if name == 'raw':
+        level = None
+    elif level is None:
+        level = CODEC_LEVELS[name]
+    return name, level
+
+def open_write(file, codec='gzip', level=None, threads=1, mode='wb', finalize=True, pool=None):
+    """
+    Open file for writing with codec (see parse_codec) at level. BGZF is deflated on [threads]
+    worker threads, xz uses [threads] xz threads. Mode 'ab' appends, compressed output as a new gzip
+    member or xz stream, so the file still decompresses as a whole. With finalize False a BGZF file
+    is closed without its end of file block, a ThreadPool given as pool deflates its blocks (see
+    bgzf.BgzfWriter). Extensions are not added to file
+    """
+    codec, level = parse_codec(codec, level)
+    if codec == 'raw':
+        return open(file, mode)
+    if codec == 'gzip':
+        return gzip.open(file, mode, level)
+    if codec == 'bgzf':
+        return bgzf.BgzfWriter(file, mode, threads, level, finalize, pool)
+    if lzma is not None and threads <= 1:
+        return lzma.open(file, mode, preset=level)
+    return XzWriter(file, mode, level, threads)
+
+# writes queued by AsyncWriter when no depth is given
+DEFAULT_ASYNC_DEPTH = 4
+# queued in place of data to flush the file, and to stop the background thread
+_ASYNC_FLUSH = object()
+_ASYNC_STOP = object()
+
+class AsyncWriter:
+    """
+    Class to write to a file object (plain, gzip or BGZF) from a background thread. Each write is
+    queued, at most [depth] at a time, and written in order, so compression and disk writes overlap
+    with the caller, which waits while the queue is full. An error in the background thread stops
+    all further writing and is raised by every later write, flush or close.
+    """
+    def __init__(self, handle, depth=DEFAULT_ASYNC_DEPTH):
+        """
+        Initialize an AsyncWriter around an open file object and start the background thread
+        """
+        self.handle = handle
+        self.queue = Queue.Queue(maxsize=depth)
+        self.error = None
+        self.closed = False
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+    def _run(self):
+        """
+        Background thread, write queued data until stopped. After an error queued data is discarded
+        so the caller never waits on a full queue.
+        """
+        while True:
+            data = self.queue.get()
+            try:
+                if data is _ASYNC_STOP:
+                    return
+                if self.error is None:
+                    if data is _ASYNC_FLUSH:
+                        self.handle.flush()
+                    else:
+                        self.handle.write(data)
+            except:
+                self.error = sys.exc_info()
+            finally:
+                self.queue.task_done()
+    def _check(self):
+        """
+        Raise the error of the background thread, it is kept so the file is not written to again
+        """
+        if self.error is not None:
+            error = self.error
+            print('ERROR:[AsyncWriter] Background write failed: %s' % error[1])
+            raise error[0], error[1], error[2]
+    def write(self, data):
+        """
+        Queue data to be written, waiting while the queue is full
+        """
+        self._check()
+        if self.closed:
+            raise ValueError('write to a closed AsyncWriter')
+        self.queue.put(data)
+    def flush(self):
+        """
+        Wait until all queued data is written and flush the file
+        """
+        self._check()
+        if not self.closed:
+            self.queue.put(_ASYNC_FLUSH)
+            self.queue.join()
+        self._check()
+    def close(self):
+        """
+        Write the queued data, stop the background thread and close the file
+        """
+        if self.closed:
+            self._check()
+            return
+        self.closed = True
+        self.queue.put(_ASYNC_STOP)
+        self.thread.join()
+        try:
+            self.handle.close()
+        finally:
+            self._check()
+
 
 def infer_read_file_name(baseread, seakread):
     ''' Find other read filenames (ex. R1, R2, R3, R4) in the directory based on Read 1 filename '''
@@ -89,17 +500,26 @@ def expand_path(list):
         newlist.append(os.path.realpath(file))
     return newlist
 
+# complement of each IUPAC code, upper and lower case (U as T), anything else maps to '\x00'
+IUPAC_CODES = 'ACGTURYSWKMBDHVNX'
+IUPAC_COMPLEMENTS = 'TGCAAYRSWMKVHDBNX'
+IUPAC_COMPLEMENT = dict(zip(IUPAC_CODES + IUPAC_CODES.lower(), IUPAC_COMPLEMENTS + IUPAC_COMPLEMENTS.lower()))
+IUPAC_COMPLEMENT_TABLE = ''.join(IUPAC_COMPLEMENT.get(chr(i), '\x00') for i in xrange(256))
+
 def reverseComplement(s):
     """
-    given a seqeucne with 'A', 'C', 'T', and 'G' return the reverse complement
+    given a sequence of IUPAC codes (upper or lower case) return the reverse complement,
+    see _grcScripts.reverse_complement_batch for many sequences at once
     """
-    basecomplement = {'A': 'T', 'C': 'G', 'G': 'C', 'T': 'A', 'N': 'N'}
-    letters = list(s)
-    try:
-        letters = [basecomplement[base] for base in letters]
-    except:
-        raise
-    return ''.join(letters[::-1])
+    if isinstance(s, unicode):
+        try:
+            s = s.encode('ascii')
+        except UnicodeEncodeError:
+            raise KeyError("sequence contains a base that is not an IUPAC code: %s" % s.encode('ascii', 'replace'))
+    rc = s.translate(IUPAC_COMPLEMENT_TABLE)[::-1]
+    if '\x00' in rc:
+        raise KeyError("sequence contains a base that is not an IUPAC code: %s" % s)
+    return rc
 
 iupacdict = {
     'A':['A'],
@@ -121,14 +541,13 @@ iupacdict = {
 
 
 def expand_iupac(seq):
-    res = ['']
-    for m in seq:
-        newres = []
-        for i in res:
-            for j in iupacdict.get(m):
-                newres.append(i + j)
-        res = newres
-    return res
+    """
+    Generate each sequence of A, C, G and T matched by the IUPAC codes of seq, one at a time.
+    To match a degenerate primer against reads use the iupac option of the _grcScripts
+    distance functions instead
+    """
+    for bases in product(*[iupacdict[m] for m in seq]):
+        yield ''.join(bases)
 
 
 #! /usr/bin/env python
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+primerEngine.py identifies and trims the amplicon primers at the start of paired reads. Candidate
+primers for a read are picked from a k-mer seed index of the primer table and only those are
+verified with the bounded edit distance, instead of every primer of the panel.
+"""
+
+from grcScriptsPy import misc
+import _grcScripts
+
+# primer table read names of the forward (read 1) and reverse (read 2) primers
+FORWARD_READS = ('P5', 'R1', 'F', 'FORWARD')
+REVERSE_READS = ('P7', 'R2', 'R', 'REVERSE')
+# degenerate seeds expanding to more sequences than this are not indexed
+MAX_SEED_EXPANSIONS = 16
+
+
+class PrimerSide:
+    """
+    Class to hold the primers of one read (forward or reverse) and their seed index
+    """
+    def __init__(self, seed):
+        """
+        Initialize an empty PrimerSide with seeds of length [seed]
+        """
+        self.seed = seed
+        self.ids = []           # primer IDs
+        self.seqs = []          # primer sequences, upper case IUPAC
+        self.index = {}         # seed sequence -> list of (primer, offset of the seed in the primer)
+        self.unseeded = []      # primers without an indexed seed, verified against every read
+        self.maxlen = 0
+    def add(self, primer_id, seq):
+        """
+        Add a primer, a primer ID already present is not added again
+        """
+        if primer_id in self.ids:
+            if self.seqs[self.ids.index(primer_id)] != seq:
+                print 'ERROR:[PrimerEngine] primer %s has more than one sequence' % primer_id
+                raise ValueError('primer %s has more than one sequence' % primer_id)
+            return
+        self.ids.append(primer_id)
+        self.seqs.append(seq)
+        self.maxlen = max(self.maxlen, len(seq))
+    def build(self):
+        """
+        Index every seed of every primer, degenerate seeds by their expansions
+        """
+        self.index = {}
+        self.unseeded = []
+        for p, seq in enumerate(self.seqs):
+            seeded = False
+            for offset in xrange(len(seq) - self.seed + 1):
+                kmer = seq[offset:offset + self.seed]
+                nexpand = 1
+                for code in kmer:
+                    nexpand *= len(misc.iupacdict[code])
+                if nexpand > MAX_SEED_EXPANSIONS:
+                    continue
+                for expanded in misc.expand_iupac(kmer):
+                    self.index.setdefault(expanded, []).append((p, offset))
+                seeded = True
+            if not seeded:
+                self.unseeded.append(p)
+    def candidates(self, read, max_diff):
+        """
+        Return the primers sharing a seed with the start of read, on a diagonal within max_diff
+        """
+        found = set(self.unseeded)
+        window = read[:self.maxlen + max_diff]
+        index = self.index
+        seed = self.seed
+        for pos in xrange(len(window) - seed + 1):
+            hits = index.get(window[pos:pos + seed])
+            if hits is not None:
+                for p, offset in hits:
+                    if abs(pos - offset) <= max_diff:
+                        found.add(p)
+        return found
+
+
+class PrimerEngine:
+    """
+    Class to identify the primer pair of two read sets from a primer table (tab separated Read, Pair_ID,
+    Primer_ID and Sequence columns, Read P5 for the forward primer at the start of read 1 and P7 for the
+    reverse primer at the start of read 2, sequences may use IUPAC codes). A primer matches the start of
+    a read within [max_diff] edits with its last [end_match] bases exact (see bounded_distance).
+    Primers sharing no [seed] long k-mer with the start of the read on a close diagonal are not
+    verified, a primer with max_diff edits keeps an exact seed when it is at least
+    (max_diff + 1) * seed long. One engine is used by one thread.
+    """
+    def __init__(self, primerfile=None, primers=None, max_diff=4, end_match=4, seed=6, trim=True):
+        """
+        Initialize a PrimerEngine from primerfile, or primers, a list of (read, pair_id, primer_id, sequence)
+        """
+        self.primerfile = primerfile
+        self.max_diff = max_diff
+        self.end_match = end_match
+        self.seed = seed
+        self.trim = trim
+        self.forward = PrimerSide(seed)
+        self.reverse = PrimerSide(seed)
+        self.pairs = {}         # (forward primer ID, reverse primer ID) -> pair ID
+        self.workspace = _grcScripts.Workspace()
+        if primerfile is not None:
+            primers = self.load(primerfile)
+        if not primers:
+            print 'ERROR:[PrimerEngine] no primers given'
+            raise ValueError('no primers given')
+        self.add(primers)
+    @staticmethod
+    def load(primerfile):
+        """
+        Read a primer table, returning its (read, pair_id, primer_id, sequence) rows
+        """
+        primers = []
+        try:
+            f = open(primerfile, 'rU')
+        except IOError:
+            print 'ERROR:[PrimerEngine] cannot open primer file: %s' % primerfile
+            raise
+        try:
+            for line in f:
+                if line.startswith('#') or not line.strip():
+                    continue
+                row = line.rstrip('\r\n').split('\t')
+                if len(row) < 4:
+                    print 'ERROR:[PrimerEngine] primer file lines need 4 tab separated columns: %s' % line.strip()
+                    raise ValueError('primer file lines need 4 tab separated columns')
+                primers.append(tuple(field.strip() for field in row[:4]))
+        finally:
+            f.close()
+        return primers
+    def add(self, primers):
+        """
+        Add (read, pair_id, primer_id, sequence) rows and rebuild the seed indexes
+        """
+        pair_primers = {}
+        for read, pair_id, primer_id, seq in primers:
+            seq = seq.upper()
+            if any(code not in misc.iupacdict for code in seq):
+                print 'ERROR:[PrimerEngine] primer %s is not an IUPAC sequence: %s' % (primer_id, seq)
+                raise ValueError('primer %s is not an IUPAC sequence' % primer_id)
+            if read.upper() in FORWARD_READS:
+                self.forward.add(primer_id, seq)
+                pair_primers.setdefault(pair_id, ([], []))[0].append(primer_id)
+            elif read.upper() in REVERSE_READS:
+                self.reverse.add(primer_id, seq)
+                pair_primers.setdefault(pair_id, ([], []))[1].append(primer_id)
+            else:
+                print 'ERROR:[PrimerEngine] unknown primer read %s, expected P5 or P7' % read
+                raise ValueError('unknown primer read %s' % read)
+        for pair_id, (forward, reverse) in pair_primers.iteritems():
+            for f in forward:
+                for r in reverse:
+                    self.pairs.setdefault((f, r), pair_id)
+        self.forward.build()
+        self.reverse.build()
+    def match(self, read, side):
+        """
+        Return (primer, dist, end) of the best primer of side (a PrimerSide) at the start of read, the
+        first primer of the table for ties, or None
+        """
+        best = None
+        bounded_distance = _grcScripts.bounded_distance
+        for p in sorted(side.candidates(read, self.max_diff)):
+            seq = side.seqs[p]
+            if len(seq) < self.end_match:
+                continue
+            dist, end = bounded_distance(seq, read, self.max_diff, self.end_match, 1, self.workspace)
+            if dist <= self.max_diff and (best is None or dist < best[1]):
+                best = (p, dist, end)
+        return best
+    def assignPrimers(self, read):
+        """
+        Identify the primers of a TwoSequenceReadSet, setting primer (the pair ID when both primers
+        belong to a pair, otherwise None), primer_string1 and primer_string2 ("primerID|dist|end" or
+        None) and trimming the matched primers from the reads. Returns the pair ID
+        """
+        if not read.parsed:
+            # parse the names first so they do not overwrite the primer fields later
+            read.parseNames()
+        forward = self.match(read.read_1, self.forward)
+        reverse = self.match(read.read_2, self.reverse)
+        read.primer_string1 = None
+        read.primer_string2 = None
+        read.primer = None
+        if forward is not None:
+            p, dist, end = forward
+            read.primer_string1 = '%s|%s|%s' % (self.forward.ids[p], dist, end)
+            if self.trim:
+                read.read_1 = read.read_1[end:]
+                read.qual_1 = read.qual_1[end:]
+        if reverse is not None:
+            p, dist, end = reverse
+            read.primer_string2 = '%s|%s|%s' % (self.reverse.ids[p], dist, end)
+            if self.trim:
+                read.read_2 = read.read_2[end:]
+                read.qual_2 = read.qual_2[end:]
+        if forward is not None and reverse is not None:
+            read.primer = self.pairs.get((self.forward.ids[forward[0]], self.reverse.ids[reverse[0]]))
+        return read.primer
@@ -17,29 +17,98 @@
 sequenceReads.py stores and processes individual DNA sequence reads.
 """
 
+import gc
+from array import array
+from itertools import izip
+from operator import add
+from operator import attrgetter
 from grcScriptsPy import misc
+from _grcScripts import fastq_format
+from _grcScripts import reverse_complement_batch
+
+
+def _assignedFields(read, fields):
+    """
+    Return the fields of read already assigned, as a dictionary of their values. A read holding only the
+    slots its constructor sets has none, which is checked from the count of its gc referents (its set slots
+    and its class) rather than with an AttributeError per unset field
+    """
+    if len(gc.get_referents(read)) == read.initReferents:
+        return {}
+    assigned = {}
+    for field in fields:
+        try:
+            assigned[field] = object.__getattribute__(read, field)
+        except AttributeError:
+            pass
+    return assigned
 
 
 # ---------------- Class for 2 read sequence data processed with dbcAmplicons preprocess ----------------
-class TwoSequenceReadSet:
+class TwoSequenceReadSet(object):
     """ 
     Class to hold one Illumina two read set, assumed to have already been preprocessed with Barcodes and Primers already
     identified. Class processes a read by defining sample and project ids. Finally class returns a paired read set for output.
     """
+    __slots__ = ('name_1', 'name_2', 'read_1', 'qual_1', 'read_2', 'qual_2', 'goodRead', 'parsed', 'project',
+                 'name', 'barcode', 'sample', 'primer', 'primer_string1', 'primer_string2', 'barcode_string')
+    # constructor arguments, in order, as stored by ReadBatch
+    readFields = ('name_1', 'read_1', 'qual_1', 'name_2', 'read_2', 'qual_2')
+    # fields parsed from the read names
+    nameFields = frozenset(['name', 'barcode', 'sample', 'primer', 'primer_string1', 'primer_string2', 'barcode_string'])
     def __init__(self,name_1,read_1,qual_1,name_2,read_2,qual_2):
         """
         Initialize a TwoSequenceReadSet with names, two read sequences and cooresponding quality sequence.
-        Barcode and primer sequence is inferred by their placement in the read names.
+        Barcode and primer sequence is inferred by their placement in the read names, the names are
+        parsed on first access to any of the name fields.
         A read is initially defined as 'not' a good read and requires processing before being labeled as a good read.
         """
+        self.name_1 = name_1
+        self.name_2 = name_2
+        self.read_1 = read_1
+        self.qual_1 = qual_1
+        self.read_2 = read_2
+        self.qual_2 = qual_2
+        self.goodRead = False
+        self.parsed = False
+    def __getattr__(self, attr):
+        """
+        Parse the read names the first time one of the name fields is needed
+        """
+        if attr not in TwoSequenceReadSet.nameFields or self.parsed:
+            raise AttributeError(attr)
+        self.parseNames()
+        return getattr(self, attr)
+    def __getstate__(self):
+        """
+        Return the fields set on the read, for pickle and copy
+        """
+        state = {}
+        for field in TwoSequenceReadSet.__slots__:
+            try:
+                state[field] = object.__getattribute__(self, field)
+            except AttributeError:
+                pass
+        return state
+    def __setstate__(self, state):
+        """
+        Restore the fields saved by __getstate__
+        """
+        for field, value in state.iteritems():
+            setattr(self, field, value)
+    def parseNames(self):
+        """
+        Parse name, barcode, sample, primer and barcode_string from the read names. Name fields already
+        assigned to the read (e.g. sample, or the primer fields) are kept, the others are set from the names.
+        """
+        assigned = _assignedFields(self, TwoSequenceReadSet.nameFields)
         try:
-            split_name = name_1.split(" ")
+            split_name = self.name_1.split(" ")
             self.name = split_name[0]
             self.barcode = split_name[1].split(":")[3]
-            self.sample = self.barcode
             if (len(split_name) == 4):
                 self.primer_string1 = split_name[3]
-                self.primer_string2 = name_2.split(" ")[3]
+                self.primer_string2 = self.name_2.split(" ")[3]
                 self.primer = split_name[1].split(":")[4]
                 self.barcode_string = split_name[2]
             elif (len(split_name) == 3):
@@ -51,24 +120,28 @@ class TwoSequenceReadSet:
                 self.primer_string1 = None
                 self.primer_string2 = None
                 self.primer = None
-                self.barcode_string = None                
-            self.read_1 = read_1
-            self.qual_1 = qual_1
-            self.read_2 = read_2
-            self.qual_2 = qual_2
-            self.goodRead = False
+                self.barcode_string = None
         except IndexError:
             print 'ERROR:[TwoSequenceReadSet] Read names are not formatted in the expected manner'
             raise
         except:
             print 'ERROR:[TwoSequenceReadSet] Unknown error occured initiating read'
             raise
+        self.sample = self.barcode
+        for field, value in assigned.iteritems():
+            setattr(self, field, value)
+        self.parsed = True
     def assignRead(self, sTable):
         """
-        Given a samplesTable object, assign a sample ID and project ID using the reads barcode and primer designation
+        Given a samplesTable object, assign a sample ID and project ID using the reads barcode and primer designation.
+        Tables with a lookup method (AssignmentCache, BarcodeIndex) return both IDs from one lookup
         """
-        self.project = sTable.getProjectID(self.barcode,self.primer)
-        self.sample = sTable.getSampleID(self.barcode,self.primer)
+        if hasattr(sTable, 'lookup'):
+            assignment = sTable.lookup(self.barcode, self.primer)
+            self.sample, self.project = assignment if assignment is not None else (None, None)
+        else:
+            self.project = sTable.getProjectID(self.barcode,self.primer)
+            self.sample = sTable.getSampleID(self.barcode,self.primer)
         self.goodRead = False
         if self.project != None:
             self.goodRead = True
@@ -135,25 +208,92 @@ class TwoSequenceReadSet:
             read1_name = "%s:%s" % (name, self.sample)
         r1 = '\n'.join([read1_name, self.read_1 + misc.reverseComplement(self.read_2)])
         return [r1]
+    @staticmethod
+    def fastqNameLists(reads):
+        """
+        Return the name lines getFastq writes for a list of read sets, as one list per read
+        """
+        return [["%s 1:N:0:%s:%s %s %s" % (r.name, r.sample, r.primer, r.barcode_string, r.primer_string1) if r.primer != None
+                 else "%s 1:N:0:%s %s" % (r.name, r.sample, r.barcode_string) for r in reads],
+                ["%s 2:N:0:%s:%s %s %s" % (r.name, r.sample, r.primer, r.barcode_string, r.primer_string2) if r.primer != None
+                 else "%s 2:N:0:%s %s" % (r.name, r.sample, r.barcode_string) for r in reads]]
+    @staticmethod
+    def fastaNameLists(reads):
+        """
+        Return the name lines getFasta writes for a list of read sets, as one list per read
+        """
+        return [[">%s 1:N:0:%s:%s" % (r.name[1:], r.sample, r.primer) if r.primer != None
+                 else ">%s 1:N:0:%s" % (r.name[1:], r.sample) for r in reads],
+                [">%s 2:N:0:%s:%s" % (r.name[1:], r.sample, r.primer) if r.primer != None
+                 else ">%s 1:N:0:%s" % (r.name[1:], r.sample) for r in reads]]
+    @staticmethod
+    def joinedFastaNameLists(reads):
+        """
+        Return the name lines getJoinedFasta writes for a list of read sets, as a list of one list
+        """
+        return [[">%s|%s:%s" % (r.name[1:], r.sample, r.primer) if r.primer != None
+                 else ">%s:%s" % (r.name[1:], r.sample) for r in reads]]
     
+# gc referents of a read fresh from the constructor, see _assignedFields
+TwoSequenceReadSet.initReferents = len(gc.get_referents(TwoSequenceReadSet('', '', '', '', '', '')))
+
 
 # ---------------- Class for 2 read sequence data processed with dbcAmplicons preprocess ----------------
-class OneSequenceReadSet:
+class OneSequenceReadSet(object):
     """ 
     Class to hold a one Illumina read set, assumes the paired reads produced by dbcAmplicons preprocess have been merged
     """
+    __slots__ = ('name_1', 'read_1', 'qual_1', 'goodRead', 'parsed', 'name', 'sample', 'primer')
+    # constructor arguments, in order, as stored by ReadBatch
+    readFields = ('name_1', 'read_1', 'qual_1')
+    # fields parsed from the read name
+    nameFields = frozenset(['name', 'sample', 'primer'])
     def __init__(self,name_1,read_1,qual_1):
         """
         Initialize a OneSequenceReadSet with name, one read sequences and cooresponding quality sequence.
+        The name is parsed for the sample and primer ids on first access to any of the name fields.
         A read is initially defined as 'not' a good read and requires processing before being labeled as a good read.
         """
         self.goodRead = False
-        self.primer = None
-        ## parse the read name for the sample and primer ids
+        self.name_1 = name_1
+        self.read_1 = read_1
+        self.qual_1 = qual_1
+        self.parsed = False
+    def __getattr__(self, attr):
+        """
+        Parse the read name the first time one of the name fields is needed
+        """
+        if attr not in OneSequenceReadSet.nameFields or self.parsed:
+            raise AttributeError(attr)
+        self.parseNames()
+        return getattr(self, attr)
+    def __getstate__(self):
+        """
+        Return the fields set on the read, for pickle and copy
+        """
+        state = {}
+        for field in OneSequenceReadSet.__slots__:
+            try:
+                state[field] = object.__getattribute__(self, field)
+            except AttributeError:
+                pass
+        return state
+    def __setstate__(self, state):
+        """
+        Restore the fields saved by __getstate__
+        """
+        for field, value in state.iteritems():
+            setattr(self, field, value)
+    def parseNames(self):
+        """
+        Parse the read name for the sample and primer ids, name fields already assigned to the read are kept
+        """
+        assigned = _assignedFields(self, OneSequenceReadSet.nameFields)
         try:
-            split_name = name_1.split(" ")
+            split_name = self.name_1.split(" ")
             self.name = split_name[0]
             self.sample = split_name[1].split(":")[3]
+            self.primer = None
             if (len(split_name) == 4):
                 self.primer = split_name[1].split(":")[4]
         except IndexError:
@@ -162,8 +302,9 @@ class OneSequenceReadSet:
         except:
             print 'ERROR:[OneSequenceReadSet] Unknown error occured initiating read'
             raise            
-        self.read_1 = read_1
-        self.qual_1 = qual_1
+        for field, value in assigned.iteritems():
+            setattr(self, field, value)
+        self.parsed = True
     def getFastq(self):
         """ 
         Create four line string ('\n' separator included) for the read, returning a length 1 vector (one read)
@@ -185,6 +326,178 @@ class OneSequenceReadSet:
             read1_name = "%s|%s" % (name, self.sample)
         r1 = '\n'.join([read1_name, self.read_1])
         return [r1]
+    @staticmethod
+    def fastqNameLists(reads):
+        """
+        Return the name lines getFastq writes for a list of read sets, as a list of one list
+        """
+        return [["%s 1:N:0:%s:%s" % (r.name, r.sample, r.primer) if r.primer != None
+                 else "%s 1:N:0:%s" % (r.name, r.sample) for r in reads]]
+    @staticmethod
+    def fastaNameLists(reads):
+        """
+        Return the name lines getFasta writes for a list of read sets, as a list of one list
+        """
+        return [[">%s|%s:%s" % (r.name[1:], r.sample, r.primer) if r.primer != None
+                 else ">%s|%s" % (r.name[1:], r.sample) for r in reads]]
+
+# gc referents of a read fresh from the constructor, see _assignedFields
+OneSequenceReadSet.initReferents = len(gc.get_referents(OneSequenceReadSet('', '', '')))
+
+
+# ---------------- Batch of read sets, as returned by the IlluminaRun next methods ----------------
+class ReadBatch(object):
+    """
+    Class to hold a batch of read sets compactly. Each read field of the record class (recordClass.readFields,
+    the names, reads and qualities) is stored as one newline joined string, rather than as one object per read.
+    The batch is a sequence of read sets: a record object is made on first access to it and kept, so changes
+    to it (assignRead) persist. Once every record object exists the field buffers are freed, the records
+    hold the reads. field and buffer give the fields of all records at once.
+    """
+    __slots__ = ('recordClass', 'nrecords', 'buffers', 'offsets', 'records')
+    def __init__(self, recordClass, columns):
+        """
+        Initialize a ReadBatch of recordClass read sets with one list of strings per field of recordClass.readFields
+        """
+        self.recordClass = recordClass
+        self.nrecords = len(columns[0])
+        self.buffers = ['\n'.join(column) for column in columns]
+        self.offsets = None
+        self.records = {}
+    def __len__(self):
+        return self.nrecords
+    def __getitem__(self, index):
+        """
+        Return the read set at index, or a list of read sets for a slice
+        """
+        if isinstance(index, slice):
+            return [self[i] for i in xrange(*index.indices(self.nrecords))]
+        if index < 0:
+            index += self.nrecords
+        if index < 0 or index >= self.nrecords:
+            raise IndexError("ReadBatch index out of range")
+        record = self.records.get(index)
+        if record is None:
+            if self.offsets is None:
+                self.offsets = [self._offsets(buffer) for buffer in self.buffers]
+            record = self.recordClass(*[buffer[offsets[index]:offsets[index + 1] - 1] for buffer, offsets in izip(self.buffers, self.offsets)])
+            self.records[index] = record
+            if len(self.records) == self.nrecords:
+                self._release()
+        return record
+    def __iter__(self):
+        """
+        Iterate over the read sets, splitting each field once for the whole batch
+        """
+        records = self.records
+        if len(records) == self.nrecords:
+            # every record object exists, no need to split the fields
+            for index in xrange(self.nrecords):
+                yield records[index]
+            return
+        for index, fields in enumerate(izip(*[self._split(buffer) for buffer in self.buffers])):
+            record = records.get(index)
+            if record is None:
+                record = self.recordClass(*fields)
+                records[index] = record
+            yield record
+        self._release()
+    def _release(self):
+        """
+        Free the field buffers and offsets, once every record object holds its reads
+        """
+        self.buffers = None
+        self.offsets = None
+    def _split(self, buffer):
+        """
+        Split a field buffer back into one string per record
+        """
+        if self.nrecords == 0:
+            return []
+        return buffer.split('\n')
+    def _offsets(self, buffer):
+        """
+        Return the start offsets of the records in a field buffer, plus the end of the buffer + 1
+        """
+        offsets = array('L', [0])
+        pos = 0
+        for value in self._split(buffer):
+            pos += len(value) + 1
+            offsets.append(pos)
+        return offsets
+    def field(self, name):
+        """
+        Return one read field (e.g. 'read_1') of all records as a list of strings, from the field buffer,
+        or from the record objects once the buffers are freed
+        """
+        i = self.recordClass.readFields.index(name)
+        if self.buffers is None:
+            return [getattr(self.records[index], name) for index in xrange(self.nrecords)]
+        return self._split(self.buffers[i])
+    def buffer(self, name):
+        """
+        Return one read field of all records as (buffer, offsets), record i of the field is
+        buffer[offsets[i]:offsets[i + 1] - 1], records are separated by newlines. Once the buffers
+        are freed the field is joined again from the record objects on each call
+        """
+        i = self.recordClass.readFields.index(name)
+        if self.buffers is None:
+            buffer = '\n'.join(self.field(name))
+            return buffer, self._offsets(buffer)
+        if self.offsets is None:
+            self.offsets = [self._offsets(buffer) for buffer in self.buffers]
+        return self.buffers[i], self.offsets[i]
+
+
+# ---------------- Batch serialization of read sets ----------------
+def _write_batch(reads, outputs, names, quals):
+    """
+    Append the records of reads, one output per read of the read sets, with the name lines returned by the
+    record class method [names], formatting the records of each output at once with _grcScripts.fastq_format
+    """
+    # iterate a ReadBatch once
+    reads = list(reads)
+    if len(reads) == 0:
+        return
+    fields = reads[0].readFields
+    lines = getattr(reads[0], names)(reads)
+    if len(outputs) != len(lines):
+        raise ValueError('expected %d outputs, got %d' % (len(lines), len(outputs)))
+    for i, out in enumerate(outputs):
+        seqs = map(attrgetter(fields[3 * i + 1]), reads)
+        if quals:
+            qual = map(attrgetter(fields[3 * i + 2]), reads)
+        else:
+            qual = None
+        if isinstance(out, bytearray):
+            fastq_format(lines[i], seqs, qual, out)
+        else:
+            out.write(fastq_format(lines[i], seqs, qual))
 
+def write_fastq_batch(reads, *outputs):
+    """
+    Append a batch of read sets (a ReadBatch or a list) as newline terminated fastq records, as getFastq,
+    to one output per read (out1, out2 for TwoSequenceReadSet), bytearrays or file like objects
+    """
+    _write_batch(reads, outputs, 'fastqNameLists', True)
 
+def write_fasta_batch(reads, *outputs):
+    """
+    Append a batch of read sets as newline terminated fasta records, as getFasta, to one output per read
+    """
+    _write_batch(reads, outputs, 'fastaNameLists', False)
 
+def write_joined_fasta_batch(reads, out):
+    """
+    Append a batch of TwoSequenceReadSet as newline terminated joined fasta records, as getJoinedFasta,
+    read 1 followed by the reverse complement of read 2, to one output
+    """
+    reads = list(reads)
+    if len(reads) == 0:
+        return
+    lines = TwoSequenceReadSet.joinedFastaNameLists(reads)[0]
+    seqs = map(add, map(attrgetter('read_1'), reads), reverse_complement_batch(map(attrgetter('read_2'), reads)))
+    if isinstance(out, bytearray):
+        fastq_format(lines, seqs, None, out)
+    else:
+        out.write(fastq_format(lines, seqs, None))
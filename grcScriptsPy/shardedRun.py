@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+shardedRun.py processes one Illumina run on several processes. The run is split into read ranges
+(shards), each shard is opened at its first read through the file indexes and handed to a user
+function in a process pool, and the per shard results are merged.
+"""
+
+import os
+import shutil
+import multiprocessing
+from grcScriptsPy import fastqIndex
+from grcScriptsPy import TwoReadIlluminaRun
+from grcScriptsPy import OneReadIlluminaRun
+
+
+def shard_ranges(nreads, nshards):
+    """
+    Split nreads reads into nshards (start, stop) ranges of near equal size
+    """
+    nshards = max(1, min(nshards, nreads))
+    return [(nreads * i / nshards, nreads * (i + 1) / nshards) for i in xrange(nshards)]
+
+def count_reads(files):
+    """
+    Count the reads in a list of fastq files using (and building when needed) their indexes
+    """
+    return sum(fastqIndex.get_index(f).nrecords for f in files)
+
+def single_member_ranges(files):
+    """
+    Return the (start, stop, file) read ranges of the single member gzip files in a list of fastq files
+    holding more than one index interval, such files can only be decompressed from their start so a
+    shard starting within one reads all of it
+    """
+    ranges = []
+    start = 0
+    for f in files:
+        index = fastqIndex.get_index(f)
+        stop = start + index.nrecords
+        if index.compressed and len(index.checkpoints) > 1 and all(checkpoint[2] == 0 for checkpoint in index.checkpoints):
+            ranges.append((start, stop, f))
+        start = stop
+    return ranges
+
+def join_shards(shards, ranges):
+    """
+    Join the shards split within one of the (start, stop, file) ranges, so each of those files is read
+    by one shard, with a warning for each file concerned
+    """
+    joined = [shards[0]]
+    warned = set()
+    for start, stop in shards[1:]:
+        inside = [r for r in ranges if r[0] < start < r[1]]
+        if len(inside) > 0:
+            joined[-1] = (joined[-1][0], stop)
+            for r in inside:
+                if r[2] not in warned:
+                    print('WARNING:[run_sharded] %s is a single gzip member, it is processed in one shard '
+                          '(compress it with BGZF to split it)' % r[2])
+                    warned.add(r[2])
+        else:
+            joined.append((start, stop))
+    return joined
+
+def _run_shard(args):
+    """
+    Process pool worker, open the shard's part of the run and call the user function on it
+    """
+    func, read1, read2, single, shard, start, stop, blocksize = args
+    if single:
+        run = OneReadIlluminaRun(read1, blocksize=blocksize, start=start, stop=stop)
+    else:
+        run = TwoReadIlluminaRun(read1, read2, blocksize=blocksize, start=start, stop=stop)
+    try:
+        return func(run, shard)
+    finally:
+        if run.isOpen:
+            run.close()
+
+def run_sharded(func, read1, read2=None, single=False, nshards=None, processes=None, merge=None, blocksize=None):
+    """
+    Process an Illumina run in [nshards] read ranges on [processes] processes (both default to the
+    number of cpus). func(run, shard) is called once per shard with a TwoReadIlluminaRun (or a
+    OneReadIlluminaRun when single is True) returning only that shard's reads, and must be defined
+    at module level so it can be sent to the workers. R1 and R2 are opened at the same read numbers
+    so pairs stay together. A single member gzip file is not split, it is read by one shard.
+    The file indexes missing from the index cache are built first, one file per process: each one reads
+    (and decompresses) its whole file, so on a cold cache the shards start after about the time it takes
+    to read the largest file once.
+    Returns the list of func results in shard order, or merge(results).
+    """
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if nshards is None:
+        nshards = processes
+    if single:
+        run = OneReadIlluminaRun(read1)
+    else:
+        run = TwoReadIlluminaRun(read1, read2)
+        read2 = run.fread2
+    read1 = run.fread1
+    # index every file now, in parallel, the workers forked below inherit the indexes
+    fastqIndex.get_indexes(read1 + (read2 if not single else []), processes)
+    if blocksize is None:
+        blocksize = run.blocksize
+    # the runs read their files last first
+    ranges = single_member_ranges(read1[::-1])
+    if not single:
+        ranges += single_member_ranges(read2[::-1])
+    shards = join_shards(shard_ranges(count_reads(read1), nshards), ranges)
+    jobs = [(func, read1, read2, single, i, start, stop, blocksize) for i, (start, stop) in enumerate(shards)]
+    pool = multiprocessing.Pool(processes)
+    try:
+        results = pool.map(_run_shard, jobs, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+    if merge is not None:
+        return merge(results)
+    return results
+
+def concatenate_files(parts, output, remove=True):
+    """
+    Merge per shard output files into output in order. Concatenated gzip (and BGZF) files are
+    themselves valid gzip files, so compressed parts are copied as is.
+    """
+    with open(output, 'wb') as outf:
+        for part in parts:
+            with open(part, 'rb') as inf:
+                shutil.copyfileobj(inf, outf, 1024 * 1024)
+    if remove:
+        for part in parts:
+            os.remove(part)
+    return output
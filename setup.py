@@ -54,9 +54,10 @@ SOURCES = []
 #   "editdist"])
 #    ])
 SOURCES.extend(path_join("src", bn + ".cc") for bn in [
-   "_grcScriptsPymodule", "editdist"])
+   "_grcScriptsPymodule", "editdist", "revcomp", "candidates", "fastqtok"])
 
-EXTRA_COMPILE_ARGS = ['-O3']
+EXTRA_COMPILE_ARGS = ['-O3', '-pthread']
+EXTRA_LINK_ARGS = ['-pthread']
 
 #if sys.platform == 'darwin':
 #    EXTRA_COMPILE_ARGS.extend(['-arch', 'x86_64'])  # force 64bit only builds
@@ -66,6 +67,7 @@ EXTENSION_MOD_DICT = \
         "sources": SOURCES,
         "depends": BUILD_DEPENDS,
         "extra_compile_args": EXTRA_COMPILE_ARGS,
+        "extra_link_args": EXTRA_LINK_ARGS,
         "language": "c++",
         "define_macros": [("VERSION", versioneer.get_version()), ],
     }
@@ -23,6 +23,9 @@ Python C/C++ interface functions
 #include <Python.h>
 
 #include "editdist.hh"
+#include "revcomp.hh"
+#include "candidates.hh"
+#include "fastqtok.hh"
 
 
 static PyObject *
@@ -37,23 +40,161 @@ PyDoc_STRVAR(hello_world_doc,
     Displays hello world on the screen\n");
 
 
+/*
+Functions releasing the GIL read their string arguments through str objects: a str argument itself,
+or a private copy of anything else "s#" accepts, as a buffer such as a bytearray can change while the
+GIL is released. Returns a new reference, or NULL with the error set.
+*/
+static PyObject *
+private_string(PyObject *obj)
+{
+    char *s;
+    int len;
+
+    if (PyString_Check(obj)) {
+        Py_INCREF(obj);
+        return obj;
+    }
+    if (!PyArg_Parse(obj, "s#", &s, &len))
+        return NULL;
+    return PyString_FromStringAndSize(s, len);
+}
+
+/*
+Private str copies of two string arguments, returns 0 with the error set on failure
+*/
+static int
+private_strings(PyObject *aobj, PyObject *bobj, PyObject **a, PyObject **b)
+{
+    *a = private_string(aobj);
+    *b = *a != NULL ? private_string(bobj) : NULL;
+    if (*b == NULL) {
+        Py_XDECREF(*a);
+        return 0;
+    }
+    return 1;
+}
+
 // Python C interface functions for C functions in editdist
 // Calculate Hamming distance, Levenshtein's edit distance, and a edge bounded Levenshtein's edit distance.
 
+typedef struct {
+    PyObject_HEAD
+    Workspace *workspace;
+    int busy;           // in use by a call running without the GIL
+} WorkspaceObject;
+
+static PyObject *
+Workspace_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    WorkspaceObject *self;
+
+    if (!PyArg_ParseTuple(args, ":Workspace"))
+        return NULL;
+    self = (WorkspaceObject *)type->tp_alloc(type, 0);
+    if (self == NULL)
+        return NULL;
+    if ((self->workspace = workspace_new()) == NULL) {
+        Py_DECREF(self);
+        return PyErr_NoMemory();
+    }
+    return (PyObject *)self;
+}
+
+static void
+Workspace_dealloc(WorkspaceObject *self)
+{
+    workspace_free(self->workspace);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+PyDoc_STRVAR(Workspace_doc,
+"Workspace()\n\
+    Reusable memory for bounded_distance, create one per thread and pass it as workspace. It keeps the\n\
+    match table of the last primer, so calls with the same primer do not rebuild it\n");
+
+static PyTypeObject WorkspaceType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_grcScripts.Workspace",            /* tp_name */
+    sizeof(WorkspaceObject),            /* tp_basicsize */
+    0,                                  /* tp_itemsize */
+    (destructor)Workspace_dealloc,      /* tp_dealloc */
+    0,                                  /* tp_print */
+    0,                                  /* tp_getattr */
+    0,                                  /* tp_setattr */
+    0,                                  /* tp_compare */
+    0,                                  /* tp_repr */
+    0,                                  /* tp_as_number */
+    0,                                  /* tp_as_sequence */
+    0,                                  /* tp_as_mapping */
+    0,                                  /* tp_hash */
+    0,                                  /* tp_call */
+    0,                                  /* tp_str */
+    0,                                  /* tp_getattro */
+    0,                                  /* tp_setattro */
+    0,                                  /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                 /* tp_flags */
+    Workspace_doc,                      /* tp_doc */
+    0,                                  /* tp_traverse */
+    0,                                  /* tp_clear */
+    0,                                  /* tp_richcompare */
+    0,                                  /* tp_weaklistoffset */
+    0,                                  /* tp_iter */
+    0,                                  /* tp_iternext */
+    0,                                  /* tp_methods */
+    0,                                  /* tp_members */
+    0,                                  /* tp_getset */
+    0,                                  /* tp_base */
+    0,                                  /* tp_dict */
+    0,                                  /* tp_descr_get */
+    0,                                  /* tp_descr_set */
+    0,                                  /* tp_dictoffset */
+    0,                                  /* tp_init */
+    0,                                  /* tp_alloc */
+    Workspace_new,                      /* tp_new */
+};
+
 PyDoc_STRVAR(bounded_editdist_distance_doc,
-"bounded_edit_distance(a, b, k, m) -> int, int\n\
-    Calculates the bounded Levenshtein's edit distance between strings \"a\" and \"b\" with bound \"k\" and \"m\" matching bases at end\n");
+"bounded_edit_distance(a, b, k, m, iupac=False, workspace=None) -> int, int\n\
+    Calculates the bounded Levenshtein's edit distance between strings \"a\" and \"b\" with bound \"k\" and \"m\" matching bases at end\n\
+    With iupac \"a\" is a pattern of IUPAC codes, each matching any of its bases in \"b\"\n\
+    workspace is a Workspace reused between calls\n");
 
 static PyObject *
-bounded_editdist_distance(PyObject *self, PyObject *args)
+bounded_editdist_distance(PyObject *self, PyObject *args, PyObject *kwds)
 {
     Tuple r;
-    char *a, *b;
-    int alen, blen, k, m;
+    PyObject *aobj, *bobj, *a, *b;
+    int k, m, iupac = 0;
+    PyObject *wsobj = Py_None;
+    WorkspaceObject *wso = NULL;
+    static char *kwlist[] = {(char *)"a", (char *)"b", (char *)"k", (char *)"m", (char *)"iupac",
+                             (char *)"workspace", NULL};
 
-    if (!PyArg_ParseTuple(args, "s#s#ii", &a, &alen, &b, &blen, &k, &m))
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOii|iO", kwlist, &aobj, &bobj, &k, &m, &iupac, &wsobj))
                 return NULL;
-    r = bounded_editdist(a, alen, b, blen, k, m);
+    if (wsobj != Py_None && !PyObject_TypeCheck(wsobj, &WorkspaceType)) {
+        PyErr_SetString(PyExc_TypeError, "workspace must be a Workspace");
+        return NULL;
+    }
+    if (!private_strings(aobj, bobj, &a, &b))
+        return NULL;
+    if (wsobj != Py_None) {
+        // a workspace shared between threads is only used by one call at a time
+        wso = (WorkspaceObject *)wsobj;
+        if (wso->busy)
+            wso = NULL;
+        else
+            wso->busy = 1;
+    }
+    Py_BEGIN_ALLOW_THREADS
+    r = bounded_editdist(PyString_AS_STRING(a), (int)PyString_GET_SIZE(a), PyString_AS_STRING(b),
+                         (int)PyString_GET_SIZE(b), k, m, iupac, wso ? wso->workspace : NULL);
+    Py_END_ALLOW_THREADS
+    if (wso != NULL)
+        wso->busy = 0;
+    Py_DECREF(a);
+    Py_DECREF(b);
     if (r.dist== -1) {
         PyErr_SetString(PyExc_MemoryError, "Out of memory");
         return NULL;
@@ -66,18 +207,27 @@ bounded_editdist_distance(PyObject *self, PyObject *args)
 }
 
 PyDoc_STRVAR(editdist_distance_doc,
-"distance(a, b) -> int\n\
-    Calculates Levenshtein's edit distance between strings \"a\" and \"b\"\n");
+"distance(a, b, iupac=False) -> int\n\
+    Calculates Levenshtein's edit distance between strings \"a\" and \"b\"\n\
+    With iupac \"a\" is a pattern of IUPAC codes, each matching any of its bases in \"b\"\n");
 
 static PyObject *
-editdist_distance(PyObject *self, PyObject *args)
+editdist_distance(PyObject *self, PyObject *args, PyObject *kwds)
 {
-    char *a, *b;
-    int alen, blen, r;
+    PyObject *aobj, *bobj, *a, *b;
+    int r, iupac = 0;
+    static char *kwlist[] = {(char *)"a", (char *)"b", (char *)"iupac", NULL};
 
-    if (!PyArg_ParseTuple(args, "s#s#", &a, &alen, &b, &blen))
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|i", kwlist, &aobj, &bobj, &iupac))
                 return NULL;
-    r = edit_distance(a, alen, b, blen);
+    if (!private_strings(aobj, bobj, &a, &b))
+        return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    r = edit_distance(PyString_AS_STRING(a), (int)PyString_GET_SIZE(a), PyString_AS_STRING(b),
+                      (int)PyString_GET_SIZE(b), iupac);
+    Py_END_ALLOW_THREADS
+    Py_DECREF(a);
+    Py_DECREF(b);
     if (r == -1) {
         PyErr_SetString(PyExc_MemoryError, "Out of memory");
         return NULL;
@@ -86,18 +236,27 @@ editdist_distance(PyObject *self, PyObject *args)
 }
 
 PyDoc_STRVAR(hammingdist_distance_doc,
-"distance(a, b) -> int\n\
-    Calculates hamming distance between two equal length strings \"a\" and \"b\"\n");
+"distance(a, b, iupac=False) -> int\n\
+    Calculates hamming distance between two equal length strings \"a\" and \"b\"\n\
+    With iupac \"a\" is a pattern of IUPAC codes, each matching any of its bases in \"b\"\n");
 
 static PyObject *
-hammingdist_distance(PyObject *self, PyObject *args)
+hammingdist_distance(PyObject *self, PyObject *args, PyObject *kwds)
 {
-    char *a, *b;
-    int alen, blen, r;
+    PyObject *aobj, *bobj, *a, *b;
+    int r, iupac = 0;
+    static char *kwlist[] = {(char *)"a", (char *)"b", (char *)"iupac", NULL};
 
-    if (!PyArg_ParseTuple(args, "s#s#", &a, &alen, &b, &blen))
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|i", kwlist, &aobj, &bobj, &iupac))
                 return NULL;
-    r = hammingdist(a, alen, b, blen);
+    if (!private_strings(aobj, bobj, &a, &b))
+        return NULL;
+    Py_BEGIN_ALLOW_THREADS
+    r = hammingdist(PyString_AS_STRING(a), (int)PyString_GET_SIZE(a), PyString_AS_STRING(b),
+                    (int)PyString_GET_SIZE(b), iupac);
+    Py_END_ALLOW_THREADS
+    Py_DECREF(a);
+    Py_DECREF(b);
     if (r == -2) {
         PyErr_SetString(PyExc_SystemError, "Bad Arguments");
         return NULL;
@@ -106,6 +265,575 @@ hammingdist_distance(PyObject *self, PyObject *args)
 }
 // END interface functions for editdist
 
+// Python C interface functions for C functions in revcomp
+
+PyDoc_STRVAR(reverse_complement_batch_doc,
+"reverse_complement_batch(seqs) -> list or string\n\
+    Reverse complements a list of sequences, returning a list, or each line of a newline separated string\n\
+    of sequences, returning a string with the same layout. IUPAC codes and lower case are complemented\n");
+
+static PyObject *
+reverse_complement_batch(PyObject *self, PyObject *args)
+{
+    PyObject *seqs, *fast, *item, *rc, *result;
+    Py_ssize_t i, n;
+    int r;
+
+    if (!PyArg_ParseTuple(args, "O", &seqs))
+                return NULL;
+    if (PyString_Check(seqs)) {
+        result = PyString_FromStringAndSize(NULL, PyString_GET_SIZE(seqs));
+        if (result == NULL)
+            return NULL;
+        Py_BEGIN_ALLOW_THREADS
+        r = reverse_complement_lines(PyString_AS_STRING(seqs), PyString_GET_SIZE(seqs), PyString_AS_STRING(result));
+        Py_END_ALLOW_THREADS
+        if (r == -2) {
+            Py_DECREF(result);
+            PyErr_SetString(PyExc_ValueError, "Sequence contains a base that is not an IUPAC code");
+            return NULL;
+        }
+        return result;
+    }
+    // a private copy of the list, so the strings are kept while the GIL is released
+    fast = PySequence_List(seqs);
+    if (fast == NULL) {
+        if (PyErr_ExceptionMatches(PyExc_TypeError))
+            PyErr_SetString(PyExc_TypeError, "reverse_complement_batch expects a string or a sequence of strings");
+        return NULL;
+    }
+    n = PyList_GET_SIZE(fast);
+    result = PyList_New(n);
+    if (result == NULL) {
+        Py_DECREF(fast);
+        return NULL;
+    }
+    for (i = 0; i < n; i++) {
+        item = PyList_GET_ITEM(fast, i);
+        if (!PyString_Check(item)) {
+            PyErr_SetString(PyExc_TypeError, "reverse_complement_batch expects a string or a sequence of strings");
+            goto error;
+        }
+        rc = PyString_FromStringAndSize(NULL, PyString_GET_SIZE(item));
+        if (rc == NULL)
+            goto error;
+        PyList_SET_ITEM(result, i, rc);
+    }
+    // all strings are allocated, complement them without the GIL
+    r = 0;
+    Py_BEGIN_ALLOW_THREADS
+    for (i = 0; i < n && r != -2; i++) {
+        item = PyList_GET_ITEM(fast, i);
+        r = reverse_complement(PyString_AS_STRING(item), PyString_GET_SIZE(item),
+                               PyString_AS_STRING(PyList_GET_ITEM(result, i)));
+    }
+    Py_END_ALLOW_THREADS
+    if (r == -2) {
+        PyErr_SetString(PyExc_ValueError, "Sequence contains a base that is not an IUPAC code");
+        goto error;
+    }
+    Py_DECREF(fast);
+    return result;
+error:
+    Py_DECREF(fast);
+    Py_DECREF(result);
+    return NULL;
+}
+// END interface functions for revcomp
+
+// Python C interface functions for C functions in fastqtok
+
+PyDoc_STRVAR(fastq_tokenize_doc,
+"fastq_tokenize(buf, start=0, end=-1, final=False) -> names, seqs, quals, next\n\
+    Splits the complete fastq records of buf[start:end] (a string or buffer, e.g. an mmap) into lists of names,\n\
+    sequences and qualities, next is the offset of the first byte not used. With final buf ends the file, its\n\
+    last line needs no newline and anything left other than blank lines raises ValueError.\n\
+    Raises ValueError for a name line not starting with '@', a missing '+' line, or a quality of a different\n\
+    length than its sequence\n");
+
+static PyObject *
+fastq_tokenize(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    Py_buffer view;
+    Py_ssize_t start = 0, end = -1;
+    long pos, next;
+    int final = 0, r = FASTQ_RECORD;
+    const char *buf, *error = NULL;
+    FastqRecord rec;
+    PyObject *names = NULL, *seqs = NULL, *quals = NULL, *item, *result = NULL;
+    static char *kwlist[] = {(char *)"buf", (char *)"start", (char *)"end", (char *)"final", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "s*|nni", kwlist, &view, &start, &end, &final))
+                return NULL;
+    if (end < 0 || end > view.len)
+        end = view.len;
+    if (start < 0 || start > end) {
+        PyErr_SetString(PyExc_ValueError, "start is outside of the buffer");
+        goto done;
+    }
+    buf = (const char *)view.buf;
+    if ((names = PyList_New(0)) == NULL || (seqs = PyList_New(0)) == NULL || (quals = PyList_New(0)) == NULL)
+        goto done;
+    pos = start;
+    while ((r = fastq_next(buf, pos, end, final, &rec, &next)) == FASTQ_RECORD) {
+        if ((item = PyString_FromStringAndSize(buf + rec.name, rec.name_len)) == NULL ||
+            PyList_Append(names, item) < 0)
+            goto item_error;
+        Py_DECREF(item);
+        if ((item = PyString_FromStringAndSize(buf + rec.seq, rec.seq_len)) == NULL ||
+            PyList_Append(seqs, item) < 0)
+            goto item_error;
+        Py_DECREF(item);
+        if ((item = PyString_FromStringAndSize(buf + rec.qual, rec.qual_len)) == NULL ||
+            PyList_Append(quals, item) < 0)
+            goto item_error;
+        Py_DECREF(item);
+        pos = next;
+    }
+    if (r == FASTQ_BAD_NAME)
+        error = "Fastq record name does not start with '@'";
+    else if (r == FASTQ_BAD_PLUS)
+        error = "Fastq record is missing its '+' line";
+    else if (r == FASTQ_BAD_LENGTH)
+        error = "Fastq record sequence and quality lengths differ";
+    else if (final && !fastq_blank(buf, pos, end))
+        error = "Incomplete fastq record at the end of the file";
+    else if (final)
+        pos = end;
+    if (error != NULL) {
+        PyErr_Format(PyExc_ValueError, "%s at byte %ld", error, r == FASTQ_INCOMPLETE ? pos : next);
+        goto done;
+    }
+    result = Py_BuildValue("OOOl", names, seqs, quals, pos);
+    goto done;
+item_error:
+    Py_XDECREF(item);
+done:
+    Py_XDECREF(names);
+    Py_XDECREF(seqs);
+    Py_XDECREF(quals);
+    PyBuffer_Release(&view);
+    return result;
+}
+
+PyDoc_STRVAR(fastq_format_doc,
+"fastq_format(names, seqs, quals=None, out=None) -> string or None\n\
+    Formats lists of names (header lines including '@' or '>'), sequences and qualities as newline terminated\n\
+    fastq records in one string, or fasta records when quals is None. With out, a bytearray, the records are\n\
+    appended to it and None is returned. Raises ValueError for a quality of a different length than its sequence\n");
+
+static PyObject *
+fastq_format_records(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    PyObject *names, *seqs, *quals = Py_None, *out = Py_None;
+    PyObject *fnames = NULL, *fseqs = NULL, *fquals = NULL, *result = NULL;
+    PyObject *name, *seq, *qual;
+    Py_ssize_t i, n, size, total = 0;
+    char *p;
+    int fasta;
+    static char *kwlist[] = {(char *)"names", (char *)"seqs", (char *)"quals", (char *)"out", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "OO|OO", kwlist, &names, &seqs, &quals, &out))
+                return NULL;
+    if (out != Py_None && !PyByteArray_Check(out)) {
+        PyErr_SetString(PyExc_TypeError, "out must be a bytearray");
+        return NULL;
+    }
+    fasta = quals == Py_None;
+    if ((fnames = PySequence_Fast(names, "names must be a sequence of strings")) == NULL ||
+        (fseqs = PySequence_Fast(seqs, "seqs must be a sequence of strings")) == NULL ||
+        (!fasta && (fquals = PySequence_Fast(quals, "quals must be a sequence of strings")) == NULL))
+        goto done;
+    n = PySequence_Fast_GET_SIZE(fnames);
+    if (PySequence_Fast_GET_SIZE(fseqs) != n || (!fasta && PySequence_Fast_GET_SIZE(fquals) != n)) {
+        PyErr_SetString(PyExc_ValueError, "names, seqs and quals differ in length");
+        goto done;
+    }
+    // check the records and size the output first, then copy them in one pass
+    for (i = 0; i < n; i++) {
+        name = PySequence_Fast_GET_ITEM(fnames, i);
+        seq = PySequence_Fast_GET_ITEM(fseqs, i);
+        qual = fasta ? NULL : PySequence_Fast_GET_ITEM(fquals, i);
+        if (!PyString_Check(name) || !PyString_Check(seq) || (!fasta && !PyString_Check(qual))) {
+            PyErr_SetString(PyExc_TypeError, "names, seqs and quals must be sequences of strings");
+            goto done;
+        }
+        if (!fasta && PyString_GET_SIZE(qual) != PyString_GET_SIZE(seq)) {
+            PyErr_Format(PyExc_ValueError, "Fastq record sequence and quality lengths differ in record %ld", (long)i);
+            goto done;
+        }
+        total += fastq_record_len(PyString_GET_SIZE(name), PyString_GET_SIZE(seq),
+                                  fasta ? 0 : PyString_GET_SIZE(qual), fasta);
+    }
+    if (out == Py_None) {
+        if ((result = PyString_FromStringAndSize(NULL, total)) == NULL)
+            goto done;
+        p = PyString_AS_STRING(result);
+    } else {
+        size = PyByteArray_GET_SIZE(out);
+        if (PyByteArray_Resize(out, size + total) < 0)
+            goto done;
+        p = PyByteArray_AS_STRING(out) + size;
+        Py_INCREF(Py_None);
+        result = Py_None;
+    }
+    for (i = 0; i < n; i++) {
+        name = PySequence_Fast_GET_ITEM(fnames, i);
+        seq = PySequence_Fast_GET_ITEM(fseqs, i);
+        qual = fasta ? NULL : PySequence_Fast_GET_ITEM(fquals, i);
+        p += fastq_format(p, PyString_AS_STRING(name), PyString_GET_SIZE(name),
+                          PyString_AS_STRING(seq), PyString_GET_SIZE(seq),
+                          fasta ? NULL : PyString_AS_STRING(qual), fasta ? 0 : PyString_GET_SIZE(qual));
+    }
+done:
+    Py_XDECREF(fnames);
+    Py_XDECREF(fseqs);
+    Py_XDECREF(fquals);
+    return result;
+}
+// END interface functions for fastqtok
+
+// Python C interface for the candidates set type and the best match functions
+
+typedef struct {
+    PyObject_HEAD
+    Candidates *candidates;
+} CandidateSetObject;
+
+static void
+CandidateSet_dealloc(CandidateSetObject *self)
+{
+    candidates_free(self->candidates);
+    Py_TYPE(self)->tp_free((PyObject *)self);
+}
+
+/*
+Pack a sequence of strings, returns NULL with the Python error set on failure
+*/
+static Candidates *
+pack_candidates(PyObject *seqs, int iupac)
+{
+    PyObject *fast, *item;
+    Py_ssize_t i, n;
+    const char **strings;
+    int *lengths;
+    Candidates *c = NULL;
+
+    fast = PySequence_Fast(seqs, "candidates must be a sequence of strings");
+    if (fast == NULL)
+        return NULL;
+    n = PySequence_Fast_GET_SIZE(fast);
+    strings = (const char **)malloc((n + 1) * sizeof(char *));
+    lengths = (int *)malloc((n + 1) * sizeof(int));
+    if (strings == NULL || lengths == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    for (i = 0; i < n; i++) {
+        item = PySequence_Fast_GET_ITEM(fast, i);
+        if (!PyString_Check(item)) {
+            PyErr_SetString(PyExc_TypeError, "candidates must be a sequence of strings");
+            goto done;
+        }
+        strings[i] = PyString_AS_STRING(item);
+        lengths[i] = (int)PyString_GET_SIZE(item);
+    }
+    c = candidates_new((int)n, strings, lengths, iupac);
+    if (c == NULL)
+        PyErr_NoMemory();
+done:
+    free(strings);
+    free(lengths);
+    Py_DECREF(fast);
+    return c;
+}
+
+/*
+Candidates are packed in tp_new and never changed, so they can be read with the GIL released
+*/
+static PyObject *
+CandidateSet_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
+{
+    PyObject *seqs;
+    int iupac = 0;
+    CandidateSetObject *self;
+    static char *kwlist[] = {(char *)"candidates", (char *)"iupac", NULL};
+
+    if (!PyArg_ParseTupleAndKeywords(args, kwds, "O|i", kwlist, &seqs, &iupac))
+        return NULL;
+    self = (CandidateSetObject *)type->tp_alloc(type, 0);
+    if (self == NULL)
+        return NULL;
+    if ((self->candidates = pack_candidates(seqs, iupac)) == NULL) {
+        Py_DECREF(self);
+        return NULL;
+    }
+    return (PyObject *)self;
+}
+
+static Py_ssize_t
+CandidateSet_length(CandidateSetObject *self)
+{
+    return self->candidates == NULL ? 0 : self->candidates->n;
+}
+
+static PySequenceMethods CandidateSet_as_sequence = {
+    (lenfunc)CandidateSet_length,   /* sq_length */
+};
+
+PyDoc_STRVAR(CandidateSet_doc,
+"CandidateSet(candidates, iupac=False)\n\
+    Packs a list of candidate sequences (e.g. barcodes) once, for matching queries against all of them\n\
+    with hamming_best, edit_best, bounded_best and their batch versions. With iupac the candidates are patterns of IUPAC codes\n");
+
+static PyTypeObject CandidateSetType = {
+    PyVarObject_HEAD_INIT(NULL, 0)
+    "_grcScripts.CandidateSet",         /* tp_name */
+    sizeof(CandidateSetObject),         /* tp_basicsize */
+    0,                                  /* tp_itemsize */
+    (destructor)CandidateSet_dealloc,   /* tp_dealloc */
+    0,                                  /* tp_print */
+    0,                                  /* tp_getattr */
+    0,                                  /* tp_setattr */
+    0,                                  /* tp_compare */
+    0,                                  /* tp_repr */
+    0,                                  /* tp_as_number */
+    &CandidateSet_as_sequence,          /* tp_as_sequence */
+    0,                                  /* tp_as_mapping */
+    0,                                  /* tp_hash */
+    0,                                  /* tp_call */
+    0,                                  /* tp_str */
+    0,                                  /* tp_getattro */
+    0,                                  /* tp_setattro */
+    0,                                  /* tp_as_buffer */
+    Py_TPFLAGS_DEFAULT,                 /* tp_flags */
+    CandidateSet_doc,                   /* tp_doc */
+    0,                                  /* tp_traverse */
+    0,                                  /* tp_clear */
+    0,                                  /* tp_richcompare */
+    0,                                  /* tp_weaklistoffset */
+    0,                                  /* tp_iter */
+    0,                                  /* tp_iternext */
+    0,                                  /* tp_methods */
+    0,                                  /* tp_members */
+    0,                                  /* tp_getset */
+    0,                                  /* tp_base */
+    0,                                  /* tp_dict */
+    0,                                  /* tp_descr_get */
+    0,                                  /* tp_descr_set */
+    0,                                  /* tp_dictoffset */
+    0,                                  /* tp_init */
+    0,                                  /* tp_alloc */
+    CandidateSet_new,                   /* tp_new */
+};
+
+/*
+The packed candidates of a CandidateSet, or of a sequence of strings packed into *tmp for this
+call only (free with candidates_free). Returns NULL with the Python error set on failure
+*/
+static Candidates *
+get_candidates(PyObject *candidates, Candidates **tmp)
+{
+    *tmp = NULL;
+    if (PyObject_TypeCheck(candidates, &CandidateSetType))
+        return ((CandidateSetObject *)candidates)->candidates;
+    return (*tmp = pack_candidates(candidates, 0));
+}
+
+/*
+Python result of a best match, NULL with the Python error set for the failures
+*/
+static PyObject *
+best_match_value(BestMatch r, int method)
+{
+    if (r.dist == -3) {
+        PyErr_SetString(PyExc_MemoryError, "Out of memory");
+        return NULL;
+    }
+    if (r.dist == -2) {
+        PyErr_SetString(PyExc_SystemError, "Bad Arguments");
+        return NULL;
+    }
+    if (method == BEST_BOUNDED)
+        return Py_BuildValue("iiiO", r.index, r.dist, r.pos, r.ambiguous ? Py_True : Py_False);
+    return Py_BuildValue("iiO", r.index, r.dist, r.ambiguous ? Py_True : Py_False);
+}
+
+/*
+Shared argument handling of hamming_best, edit_best and bounded_best, candidates is a
+CandidateSet or a sequence of strings
+*/
+static PyObject *
+best_match(PyObject *args, int method)
+{
+    PyObject *candidates, *qobj, *query;
+    const char *q;
+    int qlen, maxdist, m = 0;
+    Candidates *c, *tmp;
+    BestMatch r;
+
+    if (method == BEST_BOUNDED) {
+        if (!PyArg_ParseTuple(args, "OOii", &qobj, &candidates, &maxdist, &m))
+                return NULL;
+    } else if (!PyArg_ParseTuple(args, "OOi", &qobj, &candidates, &maxdist))
+                return NULL;
+    if ((query = private_string(qobj)) == NULL)
+        return NULL;
+    if ((c = get_candidates(candidates, &tmp)) == NULL) {
+        Py_DECREF(query);
+        return NULL;
+    }
+    q = PyString_AS_STRING(query);
+    qlen = (int)PyString_GET_SIZE(query);
+    Py_BEGIN_ALLOW_THREADS
+    if (method == BEST_HAMMING)
+        r = hamming_best(c, q, qlen, maxdist);
+    else if (method == BEST_EDIT)
+        r = edit_best(c, q, qlen, maxdist);
+    else
+        r = bounded_best(c, q, qlen, maxdist, m);
+    Py_END_ALLOW_THREADS
+    candidates_free(tmp);
+    Py_DECREF(query);
+    return best_match_value(r, method);
+}
+
+/*
+Shared argument handling of the batch functions, matches a sequence of query strings on
+[threads] threads with the GIL released
+*/
+static PyObject *
+best_match_batch(PyObject *args, PyObject *kwds, int method)
+{
+    PyObject *queries, *candidates, *list, *item, *result = NULL;
+    Py_ssize_t i, n;
+    int maxdist, m = 0, threads = 1;
+    const char **qs = NULL;
+    int *qlens = NULL;
+    Candidates *c, *tmp;
+    BestMatch *results = NULL;
+    static char *kwlist[] = {(char *)"queries", (char *)"candidates", (char *)"max_dist", (char *)"threads", NULL};
+    static char *bounded_kwlist[] = {(char *)"queries", (char *)"candidates", (char *)"k", (char *)"m",
+                                     (char *)"threads", NULL};
+
+    if (method == BEST_BOUNDED) {
+        if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOii|i", bounded_kwlist, &queries, &candidates,
+                                         &maxdist, &m, &threads))
+                return NULL;
+    } else if (!PyArg_ParseTupleAndKeywords(args, kwds, "OOi|i", kwlist, &queries, &candidates, &maxdist, &threads))
+                return NULL;
+    // a private copy of the list, so the strings are kept while the GIL is released
+    if ((list = PySequence_List(queries)) == NULL)
+        return NULL;
+    if ((c = get_candidates(candidates, &tmp)) == NULL) {
+        Py_DECREF(list);
+        return NULL;
+    }
+    n = PyList_GET_SIZE(list);
+    qs = (const char **)malloc((n + 1) * sizeof(char *));
+    qlens = (int *)malloc((n + 1) * sizeof(int));
+    results = (BestMatch *)malloc((n + 1) * sizeof(BestMatch));
+    if (qs == NULL || qlens == NULL || results == NULL) {
+        PyErr_NoMemory();
+        goto done;
+    }
+    for (i = 0; i < n; i++) {
+        item = PyList_GET_ITEM(list, i);
+        if (!PyString_Check(item)) {
+            PyErr_SetString(PyExc_TypeError, "queries must be a sequence of strings");
+            goto done;
+        }
+        qs[i] = PyString_AS_STRING(item);
+        qlens[i] = (int)PyString_GET_SIZE(item);
+    }
+    Py_BEGIN_ALLOW_THREADS
+    best_batch(c, method, (int)n, qs, qlens, maxdist, m, results, threads);
+    Py_END_ALLOW_THREADS
+    if ((result = PyList_New(n)) == NULL)
+        goto done;
+    for (i = 0; i < n; i++) {
+        if ((item = best_match_value(results[i], method)) == NULL) {
+            Py_CLEAR(result);
+            goto done;
+        }
+        PyList_SET_ITEM(result, i, item);
+    }
+done:
+    free(qs);
+    free(qlens);
+    free(results);
+    candidates_free(tmp);
+    Py_DECREF(list);
+    return result;
+}
+
+PyDoc_STRVAR(hamming_best_doc,
+"hamming_best(query, candidates, max_dist) -> index, dist, ambiguous\n\
+    Finds the candidate (a CandidateSet, or a list of strings) of the same length as \"query\" with the lowest\n\
+    Hamming distance, if that is at most \"max_dist\". ambiguous is True when another candidate has the same\n\
+    distance. index and dist are -1 when no candidate is within \"max_dist\"\n");
+
+static PyObject *
+hamming_best_distance(PyObject *self, PyObject *args)
+{
+    return best_match(args, BEST_HAMMING);
+}
+
+PyDoc_STRVAR(edit_best_doc,
+"edit_best(query, candidates, max_dist) -> index, dist, ambiguous\n\
+    Finds the candidate (a CandidateSet, or a list of strings) with the lowest Levenshtein's edit distance to\n\
+    \"query\", if that is at most \"max_dist\". ambiguous is True when another candidate has the same distance.\n\
+    index and dist are -1 when no candidate is within \"max_dist\"\n");
+
+static PyObject *
+edit_best_distance(PyObject *self, PyObject *args)
+{
+    return best_match(args, BEST_EDIT);
+}
+
+PyDoc_STRVAR(bounded_best_doc,
+"bounded_best(query, candidates, k, m) -> index, dist, pos, ambiguous\n\
+    Finds the candidate (a CandidateSet, or a list of strings, e.g. primers) with the lowest bounded edit\n\
+    distance (see bounded_distance) at the start of \"query\", if that is at most \"k\". pos is the end of the\n\
+    match in \"query\". index, dist and pos are -1 when no candidate is within \"k\"\n");
+
+static PyObject *
+bounded_best_distance(PyObject *self, PyObject *args)
+{
+    return best_match(args, BEST_BOUNDED);
+}
+
+PyDoc_STRVAR(hamming_best_batch_doc,
+"hamming_best_batch(queries, candidates, max_dist, threads=1) -> list of (index, dist, ambiguous)\n\
+    hamming_best of each string in \"queries\", run on \"threads\" threads (0 for one per cpu) without the GIL\n");
+
+static PyObject *
+hamming_best_batch_distance(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    return best_match_batch(args, kwds, BEST_HAMMING);
+}
+
+PyDoc_STRVAR(edit_best_batch_doc,
+"edit_best_batch(queries, candidates, max_dist, threads=1) -> list of (index, dist, ambiguous)\n\
+    edit_best of each string in \"queries\", run on \"threads\" threads (0 for one per cpu) without the GIL\n");
+
+static PyObject *
+edit_best_batch_distance(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    return best_match_batch(args, kwds, BEST_EDIT);
+}
+
+PyDoc_STRVAR(bounded_best_batch_doc,
+"bounded_best_batch(queries, candidates, k, m, threads=1) -> list of (index, dist, pos, ambiguous)\n\
+    bounded_best of each string in \"queries\", run on \"threads\" threads (0 for one per cpu) without the GIL\n");
+
+static PyObject *
+bounded_best_batch_distance(PyObject *self, PyObject *args, PyObject *kwds)
+{
+    return best_match_batch(args, kwds, BEST_BOUNDED);
+}
+// END interface for the candidates set
+
 // grcScripts_methods
 // Module declarations
 
@@ -115,13 +843,40 @@ static PyMethodDef grcScripts_methods[] = {
         METH_NOARGS,    hello_world_doc       
     },
     {   "edit_distance", (PyCFunction)editdist_distance,
-        METH_VARARGS,   editdist_distance_doc
+        METH_VARARGS | METH_KEYWORDS,   editdist_distance_doc
     },
     {   "bounded_distance", (PyCFunction)bounded_editdist_distance,
-        METH_VARARGS,   bounded_editdist_distance_doc
+        METH_VARARGS | METH_KEYWORDS,   bounded_editdist_distance_doc
     },
     {   "hamming_distance", (PyCFunction)hammingdist_distance,
-        METH_VARARGS,    hammingdist_distance_doc
+        METH_VARARGS | METH_KEYWORDS,    hammingdist_distance_doc
+    },
+    {   "reverse_complement_batch", (PyCFunction)reverse_complement_batch,
+        METH_VARARGS,    reverse_complement_batch_doc
+    },
+    {   "fastq_tokenize", (PyCFunction)fastq_tokenize,
+        METH_VARARGS | METH_KEYWORDS,    fastq_tokenize_doc
+    },
+    {   "fastq_format", (PyCFunction)fastq_format_records,
+        METH_VARARGS | METH_KEYWORDS,    fastq_format_doc
+    },
+    {   "hamming_best", (PyCFunction)hamming_best_distance,
+        METH_VARARGS,    hamming_best_doc
+    },
+    {   "edit_best", (PyCFunction)edit_best_distance,
+        METH_VARARGS,    edit_best_doc
+    },
+    {   "bounded_best", (PyCFunction)bounded_best_distance,
+        METH_VARARGS,    bounded_best_doc
+    },
+    {   "hamming_best_batch", (PyCFunction)hamming_best_batch_distance,
+        METH_VARARGS | METH_KEYWORDS,    hamming_best_batch_doc
+    },
+    {   "edit_best_batch", (PyCFunction)edit_best_batch_distance,
+        METH_VARARGS | METH_KEYWORDS,    edit_best_batch_doc
+    },
+    {   "bounded_best_batch", (PyCFunction)bounded_best_batch_distance,
+        METH_VARARGS | METH_KEYWORDS,    bounded_best_batch_doc
     },
     { NULL, NULL, 0, NULL }  /* sentinel */
 };
@@ -135,8 +890,16 @@ init_grcScripts(void)
 {
     PyObject *m;
 
+    if (PyType_Ready(&CandidateSetType) < 0 || PyType_Ready(&WorkspaceType) < 0)
+        return;
+
     m = Py_InitModule3("_grcScripts", grcScripts_methods, module_doc);
     if (m == NULL)
         return;
+
+    Py_INCREF(&CandidateSetType);
+    PyModule_AddObject(m, "CandidateSet", (PyObject *)&CandidateSetType);
+    Py_INCREF(&WorkspaceType);
+    PyModule_AddObject(m, "Workspace", (PyObject *)&WorkspaceType);
 }
 
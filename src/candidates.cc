@@ -0,0 +1,266 @@
+/*
+# This file is part of grcScriptsPy, http://github.com/ibest/grcScriptsPy/
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License; see LICENSE.txt.
+# Contact: msettles@uidaho.edu
+*/
+
+#include "candidates.hh"
+
+#include <stdlib.h>
+#include <string.h>
+#include <unistd.h>
+#include <pthread.h>
+
+/*
+Pack n candidate sequences, returns NULL when out of memory
+*/
+Candidates *
+candidates_new(int n, const char **seqs, const int *lengths, int iupac)
+{
+    Candidates *c;
+    int i, total, npeq;
+
+    if ((c = (Candidates *)calloc(1, sizeof(Candidates))) == NULL)
+        return (NULL);
+    c->n = n;
+    c->iupac = iupac;
+    total = 0;
+    npeq = 0;
+    for (i = 0; i < n; i++) {
+        total += lengths[i];
+        npeq += IUPAC_PEQ_ROWS * PEQ_BLOCKS(lengths[i]);
+    }
+    c->seqs = (char *)malloc(total + 1);
+    c->offsets = (int *)malloc((n + 1) * sizeof(int));
+    c->lengths = (int *)malloc((n + 1) * sizeof(int));
+    if (c->seqs == NULL || c->offsets == NULL || c->lengths == NULL) {
+        candidates_free(c);
+        return (NULL);
+    }
+    total = 0;
+    for (i = 0; i < n; i++) {
+        memcpy(c->seqs + total, seqs[i], lengths[i]);
+        c->offsets[i] = total;
+        c->lengths[i] = lengths[i];
+        total += lengths[i];
+        c->maxblocks = MAX(c->maxblocks, PEQ_BLOCKS(lengths[i]));
+    }
+    if (iupac) {
+        c->peqs = (word_t *)malloc((npeq + 1) * sizeof(word_t));
+        c->peq_offsets = (int *)malloc((n + 1) * sizeof(int));
+        if (c->peqs == NULL || c->peq_offsets == NULL) {
+            candidates_free(c);
+            return (NULL);
+        }
+        npeq = 0;
+        for (i = 0; i < n; i++) {
+            c->peq_offsets[i] = npeq;
+            build_peq(c->seqs + c->offsets[i], lengths[i], 1, c->peqs + npeq, PEQ_BLOCKS(lengths[i]));
+            npeq += IUPAC_PEQ_ROWS * PEQ_BLOCKS(lengths[i]);
+        }
+    }
+    return (c);
+}
+
+void
+candidates_free(Candidates *c)
+{
+    if (c == NULL)
+        return;
+    free(c->seqs);
+    free(c->offsets);
+    free(c->lengths);
+    free(c->peqs);
+    free(c->peq_offsets);
+    free(c);
+}
+
+/*
+Keep candidate i with distance d if it is the best so far, or mark a tie with the best
+*/
+static inline void
+update_best(BestMatch *best, int i, int d, int pos)
+{
+    if (d < best->dist) {
+        best->index = i;
+        best->dist = d;
+        best->ambiguous = 0;
+        best->pos = pos;
+    } else if (d == best->dist && best->index >= 0) {
+        best->ambiguous = 1;
+    }
+}
+
+/*
+Find the candidate of the same length as q with the lowest Hamming distance to q, at most maxdist
+*/
+BestMatch
+hamming_best(const Candidates *c, const char *q, int qlen, int maxdist)
+{
+    BestMatch best = { -1, maxdist + 1, 0, -1 };
+    const char *a;
+    int i, j, diff;
+
+    for (i = 0; i < c->n; i++) {
+        if (c->lengths[i] != qlen)
+            continue;
+        a = c->seqs + c->offsets[i];
+        diff = 0;
+        for (j = 0; j < qlen; j++) {
+            if (BASES_DIFFER(c->iupac, a[j], q[j]) && ++diff > best.dist)
+                break;
+        }
+        update_best(&best, i, diff, -1);
+    }
+    if (best.index < 0)
+        best.dist = -1;
+    return (best);
+}
+
+/*
+Find the candidate with the lowest edit distance to q, at most maxdist. Candidates whose length
+differs from q by more than the best distance so far are skipped, and an alignment stops once it
+cannot end within the best distance.
+*/
+BestMatch
+edit_best(const Candidates *c, const char *q, int qlen, int maxdist)
+{
+    BestMatch best = { -1, maxdist + 1, 0, -1 };
+    word_t peq1[256];
+    word_t *peq, *scratch;
+    int i, d, nblocks;
+
+    // with iupac each candidate is the pattern (its table is prebuilt), otherwise q is the pattern
+    nblocks = c->iupac ? c->maxblocks : PEQ_BLOCKS(qlen);
+    scratch = NULL;
+    peq = peq1;
+    if (nblocks > 1) {
+        if ((scratch = (word_t *)malloc((256 + 2) * nblocks * sizeof(word_t))) == NULL) {
+            best.dist = -3;
+            return (best);
+        }
+        peq = scratch + 2 * nblocks;
+    }
+    if (!c->iupac)
+        build_peq(q, qlen, 0, peq, PEQ_BLOCKS(qlen));
+    for (i = 0; i < c->n; i++) {
+        if (abs(c->lengths[i] - qlen) > best.dist)
+            continue;
+        if (c->iupac)
+            d = myers_run(c->peqs + c->peq_offsets[i], PEQ_BLOCKS(c->lengths[i]), c->lengths[i], q, qlen,
+                          iupac_read_row, scratch, scratch + nblocks, NULL, best.dist);
+        else
+            d = myers_run(peq, PEQ_BLOCKS(qlen), qlen, c->seqs + c->offsets[i], c->lengths[i],
+                          NULL, scratch, scratch + nblocks, NULL, best.dist);
+        update_best(&best, i, d, -1);
+    }
+    free(scratch);
+    if (best.index < 0)
+        best.dist = -1;
+    return (best);
+}
+
+/*
+Find the candidate (primer) with the lowest bounded edit distance (see bounded_editdist) at the
+start of q, at most k
+*/
+BestMatch
+bounded_best(const Candidates *c, const char *q, int qlen, int k, int m)
+{
+    BestMatch best = { -1, k + 1, 0, -1 };
+    Tuple r;
+    int i;
+
+    for (i = 0; i < c->n; i++) {
+        r = bounded_editdist(c->seqs + c->offsets[i], c->lengths[i], q, qlen, k, m, c->iupac, NULL);
+        if (r.dist == -1 || r.dist == -2) {
+            best.dist = (r.dist == -1) ? -3 : -2;
+            return (best);
+        }
+        update_best(&best, i, r.dist, r.pos);
+    }
+    if (best.index < 0) {
+        best.dist = -1;
+        best.pos = -1;
+    }
+    return (best);
+}
+
+typedef struct _BatchJob {
+    const Candidates *c;
+    int method, start, end, maxdist, m;
+    const char **qs;
+    const int *qlens;
+    BestMatch *results;
+} BatchJob;
+
+static void *
+run_batch_job(void *arg)
+{
+    BatchJob *job = (BatchJob *)arg;
+    int i;
+
+    for (i = job->start; i < job->end; i++) {
+        if (job->method == BEST_HAMMING)
+            job->results[i] = hamming_best(job->c, job->qs[i], job->qlens[i], job->maxdist);
+        else if (job->method == BEST_EDIT)
+            job->results[i] = edit_best(job->c, job->qs[i], job->qlens[i], job->maxdist);
+        else
+            job->results[i] = bounded_best(job->c, job->qs[i], job->qlens[i], job->maxdist, job->m);
+    }
+    return (NULL);
+}
+
+/*
+Match n queries against the candidates with method, splitting them over [threads] threads
+(0 for one per cpu). The results of failed queries have dist -2 or -3. Does not use Python,
+so can run with the GIL released. Returns the number of threads used.
+*/
+int
+best_batch(const Candidates *c, int method, int n, const char **qs, const int *qlens, int maxdist, int m,
+           BestMatch *results, int threads)
+{
+    BatchJob jobs[MAX_BATCH_THREADS];
+    pthread_t ids[MAX_BATCH_THREADS];
+    int i, started;
+
+    if (threads <= 0)
+        threads = (int)sysconf(_SC_NPROCESSORS_ONLN);
+    threads = MAX(1, MIN(MIN(threads, MAX_BATCH_THREADS), n));
+    for (i = 0; i < threads; i++) {
+        jobs[i].c = c;
+        jobs[i].method = method;
+        jobs[i].maxdist = maxdist;
+        jobs[i].m = m;
+        jobs[i].qs = qs;
+        jobs[i].qlens = qlens;
+        jobs[i].results = results;
+        jobs[i].start = (int)((long)n * i / threads);
+        jobs[i].end = (int)((long)n * (i + 1) / threads);
+    }
+    // the calling thread takes the first share, a share whose thread fails to start is run here too
+    started = 0;
+    for (i = 1; i < threads; i++) {
+        if (pthread_create(&ids[i], NULL, run_batch_job, &jobs[i]) != 0)
+            break;
+        started++;
+    }
+    run_batch_job(&jobs[0]);
+    for (i = started + 1; i < threads; i++)
+        run_batch_job(&jobs[i]);
+    for (i = 1; i <= started; i++)
+        pthread_join(ids[i], NULL);
+    return (started + 1);
+}
@@ -0,0 +1,67 @@
+/*
+# This file is part of grcScriptsPy, http://github.com/ibest/grcScriptsPy/
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License; see LICENSE.txt.
+# Contact: msettles@uidaho.edu
+*/
+
+#ifndef CANDIDATES_H
+#define CANDIDATES_H
+
+#include "editdist.hh"
+
+/*
+A set of candidate sequences (barcodes, primers) packed back to back, matched against one
+query at a time. With iupac the candidates are patterns of IUPAC codes and their bit-parallel
+match tables are built once here.
+*/
+typedef struct _Candidates {
+    int n;
+    int iupac;
+    char *seqs;         // the candidates back to back
+    int *offsets;       // start of each candidate in seqs
+    int *lengths;
+    word_t *peqs;       // with iupac, the match table of each candidate
+    int *peq_offsets;   // start of each match table in peqs
+    int maxblocks;      // most blocks of any match table
+} Candidates;
+
+typedef struct _BestMatch {
+    int index;      // best candidate, -1 if none is within the distance limit
+    int dist;       // its distance, -1 if none, -2 bad arguments, -3 out of memory
+    int ambiguous;  // another candidate has the same distance
+    int pos;        // bounded_best only, end of the match in the query
+} BestMatch;
+
+// most threads of a batch
+#define MAX_BATCH_THREADS 64
+
+// the distance of a batch
+enum { BEST_HAMMING, BEST_EDIT, BEST_BOUNDED };
+
+Candidates *candidates_new(int n, const char **seqs, const int *lengths, int iupac);
+
+void candidates_free(Candidates *c);
+
+BestMatch hamming_best(const Candidates *c, const char *q, int qlen, int maxdist);
+
+BestMatch edit_best(const Candidates *c, const char *q, int qlen, int maxdist);
+
+BestMatch bounded_best(const Candidates *c, const char *q, int qlen, int k, int m);
+
+int best_batch(const Candidates *c, int method, int n, const char **qs, const int *qlens, int maxdist, int m,
+               BestMatch *results, int threads);
+
+//CANDIDATES_H
+#endif
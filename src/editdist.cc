@@ -36,93 +36,435 @@
 /* $Id: editdist.c,v 0.4 2013/12/31 mls $ */
 /* $Id: editdist.c,v 0.4 2014/4/17 mls added hamming distance */
 /* $Id: editdist.c,v 0.5 2014/7/14 mls  moved editdist over to grcScriptsPy*/
+/* $Id: editdist.c,v 0.6 IUPAC pattern matching */
+/* $Id: editdist.c,v 0.7 bit-parallel (Myers) edit distance */
 
 #include "editdist.hh"
 
 #include <stdlib.h>
 #include <string.h>
+
+/*
+Bases (A=1, C=2, G=4, T=8) matched by each IUPAC code of a pattern, upper or lower case
+*/
+const unsigned char iupac_pattern_mask[256] = {
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  1, 14,  2, 13,  0,  0,  4, 11,  0,  0, 12,  0,  3, 15,  0,
+     0,  0,  5,  6,  8,  8,  7,  9, 15, 10,  0,  0,  0,  0,  0,  0,
+     0,  1, 14,  2, 13,  0,  0,  4, 11,  0,  0, 12,  0,  3, 15,  0,
+     0,  0,  5,  6,  8,  8,  7,  9, 15, 10,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0
+};
+
+/*
+Base of a read character, only A, C, G, T (U) are bases, anything else (N) matches no pattern code
+*/
+const unsigned char iupac_read_mask[256] = {
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  1,  0,  2,  0,  0,  0,  4,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  8,  8,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  1,  0,  2,  0,  0,  0,  4,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  8,  8,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0
+};
+
+/*
+Bit-parallel edit distance (Myers 1999, in the formulation of Hyyro 2001). Each column of the DP
+matrix of pattern a against text b is held as vertical +1/-1 delta bit vectors, one bit per
+pattern base, and a whole column is computed with a few word operations. The first row and
+column are 0..n (global alignment), so a 1 is shifted into the horizontal +1 vector every column.
+Patterns longer than a word are split over several words with the carries passed between them.
+*/
+
+/*
+Row of the match table for each read character with an IUPAC pattern: A, C, G, T (U) and
+everything else, which matches no pattern code
+*/
+const unsigned char iupac_read_row[256] = {
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  0,  4,  1,  4,  4,  4,  2,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  3,  3,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  0,  4,  1,  4,  4,  4,  2,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  3,  3,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,
+     4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4,  4
+};
+
+/*
+Build the match table of pattern a: bit i of peq[row * nblocks + i / WORD_BITS] is set when a[i]
+matches the text characters of row. The rows are the 256 characters, or with iupac the
+IUPAC_PEQ_ROWS rows of iupac_read_row.
+*/
+void
+build_peq(const char *a, int alen, int iupac, word_t *peq, int nblocks)
+{
+    word_t bit;
+    int i, c;
+
+    memset(peq, 0, PEQ_ROWS(iupac) * nblocks * sizeof(word_t));
+    for (i = 0; i < alen; i++) {
+        bit = (word_t)1 << (i % WORD_BITS);
+        if (iupac) {
+            for (c = 0; c < 4; c++) {
+                if (iupac_pattern_mask[(unsigned char)a[i]] & (1 << c))
+                    peq[c * nblocks + i / WORD_BITS] |= bit;
+            }
+        } else {
+            peq[(unsigned char)a[i] * nblocks + i / WORD_BITS] |= bit;
+        }
+    }
+}
+
+/*
+Sum of the vertical deltas of four rows, index (vp nibble << 4) | vn nibble, the highest row the top bit
+*/
+static const signed char nibble_sum[256] = {
+     0, -1, -1, -2, -1, -2, -2, -3, -1, -2, -2, -3, -2, -3, -3, -4,
+     1,  0,  0, -1,  0, -1, -1, -2,  0, -1, -1, -2, -1, -2, -2, -3,
+     1,  0,  0, -1,  0, -1, -1, -2,  0, -1, -1, -2, -1, -2, -2, -3,
+     2,  1,  1,  0,  1,  0,  0, -1,  1,  0,  0, -1,  0, -1, -1, -2,
+     1,  0,  0, -1,  0, -1, -1, -2,  0, -1, -1, -2, -1, -2, -2, -3,
+     2,  1,  1,  0,  1,  0,  0, -1,  1,  0,  0, -1,  0, -1, -1, -2,
+     2,  1,  1,  0,  1,  0,  0, -1,  1,  0,  0, -1,  0, -1, -1, -2,
+     3,  2,  2,  1,  2,  1,  1,  0,  2,  1,  1,  0,  1,  0,  0, -1,
+     1,  0,  0, -1,  0, -1, -1, -2,  0, -1, -1, -2, -1, -2, -2, -3,
+     2,  1,  1,  0,  1,  0,  0, -1,  1,  0,  0, -1,  0, -1, -1, -2,
+     2,  1,  1,  0,  1,  0,  0, -1,  1,  0,  0, -1,  0, -1, -1, -2,
+     3,  2,  2,  1,  2,  1,  1,  0,  2,  1,  1,  0,  1,  0,  0, -1,
+     2,  1,  1,  0,  1,  0,  0, -1,  1,  0,  0, -1,  0, -1, -1, -2,
+     3,  2,  2,  1,  2,  1,  1,  0,  2,  1,  1,  0,  1,  0,  0, -1,
+     3,  2,  2,  1,  2,  1,  1,  0,  2,  1,  1,  0,  1,  0,  0, -1,
+     4,  3,  3,  2,  3,  2,  2,  1,  3,  2,  2,  1,  2,  1,  1,  0
+};
+
+/*
+Largest partial sum of the same deltas taken from the highest row down, at least 0
+*/
+static const signed char nibble_max[256] = {
+     0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     1,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     1,  1,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     2,  1,  1,  0,  1,  0,  0,  0,  1,  0,  0,  0,  0,  0,  0,  0,
+     1,  1,  1,  1,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,  0,
+     2,  1,  1,  1,  1,  0,  0,  0,  1,  0,  0,  0,  0,  0,  0,  0,
+     2,  2,  1,  1,  1,  1,  0,  0,  1,  1,  0,  0,  0,  0,  0,  0,
+     3,  2,  2,  1,  2,  1,  1,  0,  2,  1,  1,  0,  1,  0,  0,  0,
+     1,  1,  1,  1,  1,  1,  1,  1,  0,  0,  0,  0,  0,  0,  0,  0,
+     2,  1,  1,  1,  1,  1,  1,  1,  1,  0,  0,  0,  0,  0,  0,  0,
+     2,  2,  1,  1,  1,  1,  1,  1,  1,  1,  0,  0,  0,  0,  0,  0,
+     3,  2,  2,  1,  2,  1,  1,  1,  2,  1,  1,  0,  1,  0,  0,  0,
+     2,  2,  2,  2,  1,  1,  1,  1,  1,  1,  1,  1,  0,  0,  0,  0,
+     3,  2,  2,  2,  2,  1,  1,  1,  2,  1,  1,  1,  1,  0,  0,  0,
+     3,  3,  2,  2,  2,  2,  1,  1,  2,  2,  1,  1,  1,  1,  0,  0,
+     4,  3,  3,  2,  3,  2,  2,  1,  3,  2,  2,  1,  2,  1,  1,  0
+};
+
+/*
+Whether every D[i][j] of a column is over cutoff, from the bottom distance score = D[alen][j] and the
+vertical delta words of the column. The rows are walked up four at a time, with acc = D[alen][j] - D[i][j]
+and top its largest value, so the lowest distance of the column is score - top.
+*/
+static inline int
+column_over(const word_t *vps, const word_t *vns, int alen, int score, int cutoff)
+{
+    word_t p, n;
+    int b, e, nrows, acc, top;
+
+    acc = top = 0;
+    nrows = alen - (PEQ_BLOCKS(alen) - 1) * WORD_BITS;
+    for (b = PEQ_BLOCKS(alen) - 1; b >= 0; b--) {
+        // the highest row of the block to the top bit, rows shifted past the end are 0 deltas
+        p = vps[b] << (WORD_BITS - nrows);
+        n = vns[b] << (WORD_BITS - nrows);
+        for (; nrows > 0; nrows -= 4) {
+            e = (int)(((p >> (WORD_BITS - 4)) << 4) | (n >> (WORD_BITS - 4)));
+            top = MAX(top, acc + nibble_max[e]);
+            acc += nibble_sum[e];
+            p <<= 4;
+            n <<= 4;
+        }
+        nrows = WORD_BITS;
+    }
+    return (score - top > cutoff);
+}
+
+/*
+Return the edit distance D[alen][blen] of the pattern with match table peq (nblocks words per row)
+against b, rows maps the characters of b to rows of peq (NULL for the 256 character rows).
+vps and vns are nblocks words of scratch space, unused for a single block. When best is not NULL
+it is updated with each column j (1 based) whose distance D[alen][j] is <= best->dist, so it ends
+with the last column of lowest distance.
+With cutoff >= 0 the run stops at a column where every D[i][j] is over cutoff, as no later
+D[alen][j] can be lower, and returns cutoff + 1. Columns are checked every CUTOFF_INTERVAL columns.
+*/
+int
+myers_run(const word_t *peq, int nblocks, int alen, const char *b, int blen, const unsigned char *rows,
+          word_t *vps, word_t *vns, Tuple *best, int cutoff)
+{
+    word_t vp, vn, x, d0, hp, hn, hpcarry, hncarry, addcarry, sum, top;
+    int i, j, row, score;
+
+    score = alen;
+    if (alen == 0) {
+        // every column is one more insertion
+        for (j = 1; j <= blen; j++) {
+            score = j;
+            if (best != NULL && score <= best->dist) {
+                best->dist = score;
+                best->pos = j;
+            }
+        }
+        return (score);
+    }
+
+    top = (word_t)1 << ((alen - 1) % WORD_BITS);
+    if (nblocks == 1) {
+        vp = ~(word_t)0;
+        vn = 0;
+        for (j = 0; j < blen; j++) {
+            x = peq[rows ? rows[(unsigned char)b[j]] : (unsigned char)b[j]];
+            d0 = (((x & vp) + vp) ^ vp) | x | vn;
+            hp = vn | ~(d0 | vp);
+            hn = vp & d0;
+            if (hp & top)
+                score++;
+            if (hn & top)
+                score--;
+            hp = (hp << 1) | 1;
+            hn = hn << 1;
+            vp = hn | ~(d0 | hp);
+            vn = hp & d0;
+            if (best != NULL && score <= best->dist) {
+                best->dist = score;
+                best->pos = j + 1;
+            }
+            if (CHECK_CUTOFF(cutoff, j) && column_over(&vp, &vn, alen, score, cutoff))
+                return (cutoff + 1);
+        }
+        return (score);
+    }
+
+    // blocked version, bit i of the pattern is bit i % WORD_BITS of block i / WORD_BITS
+    for (i = 0; i < nblocks; i++) {
+        vps[i] = ~(word_t)0;
+        vns[i] = 0;
+    }
+    for (j = 0; j < blen; j++) {
+        row = rows ? rows[(unsigned char)b[j]] : (unsigned char)b[j];
+        hpcarry = 1;
+        hncarry = 0;
+        addcarry = 0;
+        for (i = 0; i < nblocks; i++) {
+            x = peq[row * nblocks + i];
+            vp = vps[i];
+            vn = vns[i];
+            // (x & vp) + vp over the whole pattern, carrying between blocks
+            sum = (x & vp) + vp;
+            d0 = sum + addcarry;
+            addcarry = (sum < vp || d0 < sum) ? 1 : 0;
+            d0 = (d0 ^ vp) | x | vn;
+            hp = vn | ~(d0 | vp);
+            hn = vp & d0;
+            if (i == nblocks - 1) {
+                if (hp & top)
+                    score++;
+                if (hn & top)
+                    score--;
+            }
+            x = hp >> (WORD_BITS - 1);
+            hp = (hp << 1) | hpcarry;
+            hpcarry = x;
+            x = hn >> (WORD_BITS - 1);
+            hn = (hn << 1) | hncarry;
+            hncarry = x;
+            vps[i] = hn | ~(d0 | hp);
+            vns[i] = hp & d0;
+        }
+        if (best != NULL && score <= best->dist) {
+            best->dist = score;
+            best->pos = j + 1;
+        }
+        if (CHECK_CUTOFF(cutoff, j) && column_over(vps, vns, alen, score, cutoff))
+            return (cutoff + 1);
+    }
+    return (score);
+}
+
+/*
+A new empty workspace, NULL when out of memory
+*/
+Workspace *
+workspace_new(void)
+{
+    Workspace *ws;
+
+    if ((ws = (Workspace *)calloc(1, sizeof(Workspace))) != NULL)
+        ws->plen = -1;
+    return (ws);
+}
+
+void
+workspace_free(Workspace *ws)
+{
+    if (ws == NULL)
+        return;
+    free(ws->words);
+    free(ws->pattern);
+    free(ws);
+}
+
+/*
+The match table of a (nblocks words a row) followed by the 2 * nblocks scratch words of myers_run,
+from ws. The table is only built when ws holds another pattern. Returns NULL when out of memory.
+*/
+static word_t *
+workspace_peq(Workspace *ws, const char *a, int alen, int iupac, int nblocks)
+{
+    int nwords;
+    void *p;
+
+    if (ws->plen == alen && ws->iupac == iupac && ws->pattern != NULL && memcmp(ws->pattern, a, alen) == 0)
+        return (ws->words);
+    ws->plen = -1;
+    nwords = (PEQ_ROWS(iupac) + 2) * nblocks;
+    if (nwords > ws->nwords) {
+        if ((p = realloc(ws->words, nwords * sizeof(word_t))) == NULL)
+            return (NULL);
+        ws->words = (word_t *)p;
+        ws->nwords = nwords;
+    }
+    if (alen + 1 > ws->pcap || ws->pattern == NULL) {
+        if ((p = realloc(ws->pattern, alen + 1)) == NULL)
+            return (NULL);
+        ws->pattern = (char *)p;
+        ws->pcap = alen + 1;
+    }
+    memcpy(ws->pattern, a, alen);
+    build_peq(a, alen, iupac, ws->words, nblocks);
+    ws->plen = alen;
+    ws->iupac = iupac;
+    return (ws->words);
+}
+
+/*
+Return the edit distance of a against b (D[alen][blen]), see myers_run for best and cutoff.
+The match table is kept in ws when not NULL. Returns -1 when out of memory.
+*/
+static int
+myers_distance(const char *a, int alen, const char *b, int blen, int iupac, Tuple *best, int cutoff,
+               Workspace *ws)
+{
+    word_t peq1[256];
+    word_t *peq;
+    int nblocks, r;
+
+    nblocks = MAX(1, PEQ_BLOCKS(alen));
+    if (ws != NULL) {
+        if ((peq = workspace_peq(ws, a, alen, iupac, nblocks)) == NULL)
+            return (-1);
+        return (myers_run(peq, nblocks, alen, b, blen, iupac ? iupac_read_row : NULL,
+                          peq + PEQ_ROWS(iupac) * nblocks, peq + (PEQ_ROWS(iupac) + 1) * nblocks, best, cutoff));
+    }
+    if (nblocks == 1) {
+        build_peq(a, alen, iupac, peq1, 1);
+        return (myers_run(peq1, 1, alen, b, blen, iupac ? iupac_read_row : NULL, NULL, NULL, best, cutoff));
+    }
+    if ((peq = (word_t *)malloc((PEQ_ROWS(iupac) + 2) * nblocks * sizeof(word_t))) == NULL)
+        return (-1);
+    build_peq(a, alen, iupac, peq, nblocks);
+    r = myers_run(peq, nblocks, alen, b, blen, iupac ? iupac_read_row : NULL,
+                  peq + PEQ_ROWS(iupac) * nblocks, peq + (PEQ_ROWS(iupac) + 1) * nblocks, best, cutoff);
+    free(peq);
+    return (r);
+}
+
 /* 
 compute the Levenstein distance between a (primer) and b (sequence read)
-pegged to the 5' end and bounded by edit distance k
+pegged to the 5' end and bounded by edit distance k. The alignment stops once every cell of a
+column is over k + 1. ws (NULL for none) keeps the match table of a for the next call.
 */
 Tuple
-bounded_editdist(const char *a, int alen, const char *b, int blen, int k, int m)
+bounded_editdist(const char *a, int alen, const char *b, int blen, int k, int m, int iupac, Workspace *ws)
 {
     // a is primer, b is seq, k is max error and m is end matches
-    int i, j;
-    int *current, *previous, *tmpl, add, del, chg;
+    int i, ncols;
     Tuple val = { k+1, alen };
+    Tuple best;
     /* a (primer) should always be < b (read) + k */
 //  if (alen > (blen-k)) {
     if (alen > (blen)) {
         return (val);
     }
 
-    if (alen == 0){
+    if (alen == 0 || m < 0 || m > alen){
         val.dist = -2;
         return (val);
     }
-    if ((previous = (int *)calloc(alen + 1, sizeof(int))) == NULL) {
-        free(previous);
-        val.dist = -1;
-        return (val);
-    }
-    if ((current = (int *)calloc(alen + 1, sizeof(int))) == NULL) {
-        free(current);
+
+    // align a less its last m bases to the first alen - m + k bases of b, stopping where the
+    // m end bases would run past the end of b
+    ncols = MIN(alen - m + k, blen - m);
+    best.dist = k + 1;
+    best.pos = 0;
+    if (myers_distance(a, alen - m, b, ncols, iupac, &best, k + 1, ws) == -1) {
         val.dist = -1;
         return (val);
     }
-
-    for (i = 0; i < alen - m + 1; i++)
-        previous[i] = i;
-
-    for (i = 1; i < alen - m + k + 1 ; i++) {
-        if (i > 1) {
-            memset(previous, 0, (alen - m + 1) * sizeof(*previous));
-            tmpl = previous;
-            previous = current;
-            current = tmpl;
-        }
-        current[0] = i;
-        for (j = 1; j < alen -m + 1; j++) {
-            add = previous[j] + 1;
-            del = current[j - 1] + 1;
-            chg = previous[j - 1];
-            if (a[j - 1] != b[i - 1])
-                chg++;
-            current[j] = MIN(add, del);
-            current[j] = MIN(current[j], chg);
-        }
-        if (current[alen - m] <= val.dist ){
-            val.dist = current[alen - m ]; // bottom right node, global alignment
-            val.pos = i+m;
-        }
+    if (best.pos > 0) {
+        val.dist = best.dist; // bottom right node, global alignment
+        val.pos = best.pos + m;
     }
 
     for (i = 1; i <= m; i++){
-        if (a[alen - i] != b[val.pos - i]){
+        if (BASES_DIFFER(iupac, a[alen - i], b[val.pos - i])){
             val.dist = val.dist+100; // penelty of 100 for not meeting end match criteria
             break;          
         }       
     }
-    free(previous);
-    free(current);
 
     return (val);
 }
 
 /*
-Compute the Levenstein distance between a and b 
+Compute the Levenstein distance between a and b, with iupac a is a pattern of IUPAC codes
 */
 int
-edit_distance(const char *a, int alen, const char *b, int blen)
+edit_distance(const char *a, int alen, const char *b, int blen, int iupac)
 {
-    int tmplen, i, j;
+    int tmplen;
     const char *tmp;
-    int *current, *previous, *tmpl, add, del, chg, r;
 
-    /* Swap to reduce worst-case memory requirement */
-    if (alen > blen) {
+    /* Swap so the shorter string is the pattern, an IUPAC pattern stays a */
+    if (alen > blen && !iupac) {
         tmp = a;
         a = b;
         b = tmp;
@@ -131,49 +473,14 @@ edit_distance(const char *a, int alen, const char *b, int blen)
         blen = tmplen;
     }
 
-    if (alen == 0)
-        return (blen);
-
-    if ((previous = (int *)calloc(alen + 1, sizeof(int))) == NULL) {
-        free(previous);
-        return (-1);
-    }
-    if ((current = (int *)calloc(alen + 1, sizeof(int))) == NULL) {
-        free(current);
-        return (-1);
-    }
-    for (i = 0; i < alen + 1; i++)
-        previous[i] = i;
-
-    for (i = 1; i < blen + 1; i++) {
-        if (i > 1) {
-            memset(previous, 0, (alen + 1) * sizeof(*previous));
-            tmpl = previous;
-            previous = current;
-            current = tmpl;
-        }
-        current[0] = i;
-        for (j = 1; j < alen + 1; j++) {
-            add = previous[j] + 1;
-            del = current[j - 1] + 1;
-            chg = previous[j - 1];
-            if (a[j - 1] != b[i - 1])
-                chg++;
-            current[j] = MIN(add, del);
-            current[j] = MIN(current[j], chg);
-        }
-    }
-    r = current[alen];
-    free(previous);
-    free(current);
-    return (r);
+    return (myers_distance(a, alen, b, blen, iupac, NULL, -1, NULL));
 }
 
 /*
-Compute the Levenstein distance between a and b 
+Compute the Hamming distance between a and b, with iupac a is a pattern of IUPAC codes
 */
 int
-hammingdist(const char *a, int alen, const char *b, int blen)
+hammingdist(const char *a, int alen, const char *b, int blen, int iupac)
 {
     int i, diff;
 
@@ -187,7 +494,7 @@ hammingdist(const char *a, int alen, const char *b, int blen)
 
     diff = 0;
     for (i = 0; i < alen; i++){
-        if (a[i] != b[i])
+        if (BASES_DIFFER(iupac, a[i], b[i]))
             diff++;
     }
     return (diff);
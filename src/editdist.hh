@@ -29,16 +29,62 @@ typedef unsigned __int8 u_int8_t;
 # define MIN(a, b) (((a) < (b)) ? (a) : (b))
 #endif
 
+#ifndef MAX
+# define MAX(a, b) (((a) > (b)) ? (a) : (b))
+#endif
+
+#include <stdint.h>
+
+typedef uint64_t word_t;
+#define WORD_BITS 64
+
 typedef struct _Tuple {
     int dist;
     int pos;
 } Tuple;
 
-Tuple bounded_editdist(const char *a, int alen, const char *b, int blen, int k, int m);
+extern const unsigned char iupac_pattern_mask[256];
+extern const unsigned char iupac_read_mask[256];
+
+/* pattern base x and read base y differ, with iupac x is an IUPAC code */
+#define BASES_DIFFER(iupac, x, y) ((iupac) ? \
+    !(iupac_pattern_mask[(unsigned char)(x)] & iupac_read_mask[(unsigned char)(y)]) : (x) != (y))
+
+/* match tables of the bit-parallel edit distance, see build_peq */
+#define IUPAC_PEQ_ROWS 5
+#define PEQ_ROWS(iupac) ((iupac) ? IUPAC_PEQ_ROWS : 256)
+#define PEQ_BLOCKS(alen) (((alen) + WORD_BITS - 1) / WORD_BITS)
+
+extern const unsigned char iupac_read_row[256];
+
+/* myers_run checks for its cutoff every CUTOFF_INTERVAL columns, from the first column j where D[0][j] > cutoff */
+#define CUTOFF_INTERVAL 4
+#define CHECK_CUTOFF(cutoff, j) ((cutoff) >= 0 && (j) >= (cutoff) && ((j) + 1) % CUTOFF_INTERVAL == 0)
+
+/* reusable memory of bounded_editdist, one per thread, holding the match table of the last pattern */
+typedef struct _Workspace {
+    word_t *words;      // match table, then the scratch words of myers_run
+    int nwords;
+    char *pattern;      // pattern of the match table
+    int plen;           // its length, -1 when no table is held
+    int pcap;
+    int iupac;
+} Workspace;
+
+Workspace *workspace_new(void);
+
+void workspace_free(Workspace *ws);
+
+void build_peq(const char *a, int alen, int iupac, word_t *peq, int nblocks);
+
+int myers_run(const word_t *peq, int nblocks, int alen, const char *b, int blen, const unsigned char *rows,
+              word_t *vps, word_t *vns, Tuple *best, int cutoff);
+
+Tuple bounded_editdist(const char *a, int alen, const char *b, int blen, int k, int m, int iupac, Workspace *ws);
 
-int edit_distance(const char *a, int alen, const char *b, int blen);
+int edit_distance(const char *a, int alen, const char *b, int blen, int iupac);
 
-int hammingdist(const char *a, int alen, const char *b, int blen);
+int hammingdist(const char *a, int alen, const char *b, int blen, int iupac);
 
 //EDITDIST_H
 #endif  
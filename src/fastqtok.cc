@@ -0,0 +1,130 @@
+/*
+# This file is part of grcScriptsPy, http://github.com/ibest/grcScriptsPy/
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License; see LICENSE.txt.
+# Contact: msettles@uidaho.edu
+*/
+
+/*
+Split a buffer of fastq text into records, checking the four line structure, and format records back into text
+*/
+
+#include "fastqtok.hh"
+
+#include <string.h>
+
+/*
+Find the line starting at pos, setting its length without the line ending and the start of the
+next line. Returns 0 when the line does not end before end, unless final (end is then its end).
+*/
+static inline int
+next_line(const char *buf, long pos, long end, int final, long *len, long *next)
+{
+    const char *newline;
+
+    if (pos >= end)
+        return (0);
+    newline = (const char *)memchr(buf + pos, '\n', end - pos);
+    if (newline == NULL) {
+        if (!final)
+            return (0);
+        *len = end - pos;
+        *next = end;
+    } else {
+        *len = (long)(newline - buf) - pos;
+        *next = *len + pos + 1;
+    }
+    // windows line endings
+    if (*len > 0 && buf[pos + *len - 1] == '\r')
+        (*len)--;
+    return (1);
+}
+
+/*
+Read the record starting at buf[start], using buf up to end. With final the buffer ends the file,
+so its last line needs no newline. Sets rec and the start of the next record (next) and returns
+FASTQ_RECORD, FASTQ_INCOMPLETE when the record runs past end, or one of the FASTQ_BAD errors
+with next the start of the bad line.
+*/
+int
+fastq_next(const char *buf, long start, long end, int final, FastqRecord *rec, long *next)
+{
+    long pos, len, plus;
+
+    pos = start;
+    rec->name = pos;
+    if (!next_line(buf, pos, end, final, &rec->name_len, &pos))
+        return (FASTQ_INCOMPLETE);
+    rec->seq = pos;
+    if (!next_line(buf, pos, end, final, &rec->seq_len, &pos))
+        return (FASTQ_INCOMPLETE);
+    plus = pos;
+    if (!next_line(buf, pos, end, final, &len, &pos))
+        return (FASTQ_INCOMPLETE);
+    rec->qual = pos;
+    if (!next_line(buf, pos, end, final, &rec->qual_len, &pos))
+        return (FASTQ_INCOMPLETE);
+    if (rec->name_len == 0 || buf[rec->name] != '@') {
+        *next = rec->name;
+        return (FASTQ_BAD_NAME);
+    }
+    if (len == 0 || buf[plus] != '+') {
+        *next = plus;
+        return (FASTQ_BAD_PLUS);
+    }
+    if (rec->seq_len != rec->qual_len) {
+        *next = rec->seq;
+        return (FASTQ_BAD_LENGTH);
+    }
+    *next = pos;
+    return (FASTQ_RECORD);
+}
+
+/*
+Whether buf[start:end] holds only empty lines
+*/
+int
+fastq_blank(const char *buf, long start, long end)
+{
+    for (; start < end; start++) {
+        if (buf[start] != '\n' && buf[start] != '\r')
+            return (0);
+    }
+    return (1);
+}
+
+/*
+Write one newline terminated record to out, a fastq record or a fasta record when qual is NULL.
+Returns the number of bytes written, fastq_record_len of the lengths.
+*/
+long
+fastq_format(char *out, const char *name, long name_len, const char *seq, long seq_len, const char *qual, long qual_len)
+{
+    char *p = out;
+
+    memcpy(p, name, name_len);
+    p += name_len;
+    *p++ = '\n';
+    memcpy(p, seq, seq_len);
+    p += seq_len;
+    *p++ = '\n';
+    if (qual != NULL) {
+        *p++ = '+';
+        *p++ = '\n';
+        memcpy(p, qual, qual_len);
+        p += qual_len;
+        *p++ = '\n';
+    }
+    return (long)(p - out);
+}
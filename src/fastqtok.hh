@@ -0,0 +1,47 @@
+/*
+# This file is part of grcScriptsPy, http://github.com/ibest/grcScriptsPy/
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License; see LICENSE.txt.
+# Contact: msettles@uidaho.edu
+*/
+
+#ifndef FASTQTOK_H
+#define FASTQTOK_H
+
+/* offsets and lengths of the lines of one fastq record in a buffer, without the line endings */
+typedef struct _FastqRecord {
+    long name, name_len;
+    long seq, seq_len;
+    long qual, qual_len;
+} FastqRecord;
+
+/* results of fastq_next */
+#define FASTQ_RECORD 1
+#define FASTQ_INCOMPLETE 0
+#define FASTQ_BAD_NAME -1
+#define FASTQ_BAD_PLUS -2
+#define FASTQ_BAD_LENGTH -3
+
+int fastq_next(const char *buf, long start, long end, int final, FastqRecord *rec, long *next);
+
+int fastq_blank(const char *buf, long start, long end);
+
+/* bytes written by fastq_format for a record, fasta without the quality */
+#define fastq_record_len(name_len, seq_len, qual_len, fasta) \
+    ((name_len) + (seq_len) + 2 + ((fasta) ? 0 : (qual_len) + 3))
+
+long fastq_format(char *out, const char *name, long name_len, const char *seq, long seq_len, const char *qual, long qual_len);
+
+//FASTQTOK_H
+#endif
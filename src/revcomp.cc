@@ -0,0 +1,84 @@
+/*
+# This file is part of grcScriptsPy, http://github.com/ibest/grcScriptsPy/
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the 'License');
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an 'AS IS' BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License; see LICENSE.txt.
+# Contact: msettles@uidaho.edu
+*/
+
+#include "revcomp.hh"
+
+#include <string.h>
+
+/*
+complement of each IUPAC code (upper and lower case, U as T), 0 for anything else
+*/
+static const char complement[256] = {
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 'T', 'V', 'G', 'H', 0, 0, 'C', 'D', 0, 0, 'M', 0, 'K', 'N', 0,
+    0, 0, 'Y', 'S', 'A', 'A', 'B', 'W', 'X', 'R', 0, 0, 0, 0, 0, 0,
+    0, 't', 'v', 'g', 'h', 0, 0, 'c', 'd', 0, 0, 'm', 0, 'k', 'n', 0,
+    0, 0, 'y', 's', 'a', 'a', 'b', 'w', 'x', 'r', 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0
+};
+
+/*
+Write the reverse complement of seq (len bases) to out, returns -2 on a base that is not an IUPAC code
+*/
+int
+reverse_complement(const char *seq, int len, char *out)
+{
+    int i;
+    char c;
+
+    for (i = 0; i < len; i++) {
+        c = complement[(unsigned char)seq[len - 1 - i]];
+        if (c == 0)
+            return (-2);
+        out[i] = c;
+    }
+    return (0);
+}
+
+/*
+Reverse complement each newline separated sequence of buf into the same place in out, the newlines
+are copied. Returns -2 on a base that is not an IUPAC code
+*/
+int
+reverse_complement_lines(const char *buf, int len, char *out)
+{
+    int start, end;
+    const char *newline;
+
+    start = 0;
+    while (start <= len) {
+        newline = (const char *)memchr(buf + start, '\n', len - start);
+        end = (newline == NULL) ? len : (int)(newline - buf);
+        if (reverse_complement(buf + start, end - start, out + start) == -2)
+            return (-2);
+        if (end < len)
+            out[end] = '\n';
+        start = end + 1;
+    }
+    return (0);
+}
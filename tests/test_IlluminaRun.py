@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+from nose.tools import assert_equal
+from nose.tools import assert_raises
+from grcScriptsPy import misc
+from grcScriptsPy import fastqIndex
+from grcScriptsPy import TwoReadIlluminaRun
+from grcScriptsPy import OneReadIlluminaRun
+from grcScriptsPy import IlluminaTwoReadOutput
+from grcScriptsPy import IlluminaOneReadOutput
+from grcScriptsPy import DemuxOutputPool
+from grcScriptsPy import open_read
+
+BARCODES = ['AACCGGTT', 'CCGGTTAA', 'GGTTAACC']
+PRIMERS = ['P1', 'P2', None]
+
+
+def write_run(prefix, n, codec='raw'):
+    """
+    Write n preprocessed read pairs to prefix_R1_001.fastq and prefix_R2_001.fastq (.gz for a gzip or BGZF
+    codec), returning the file names
+    """
+    ext = misc.CODEC_EXTENSIONS[misc.parse_codec(codec)[0]]
+    files = [prefix + '_R1_001.fastq' + ext, prefix + '_R2_001.fastq' + ext]
+    handles = [misc.open_write(f, codec) for f in files]
+    for i in xrange(n):
+        bc1 = BARCODES[i % 3]
+        bc2 = BARCODES[i % 2]
+        primer = PRIMERS[i % 3]
+        for r, handle in enumerate(handles):
+            if primer is None:
+                name = '@read%d %d:N:0:%s%s %s|0|%s|0' % (i, r + 1, bc1, bc2, bc1, bc2)
+            else:
+                name = '@read%d %d:N:0:%s%s:%s %s|0|%s|0 %s%d' % (i, r + 1, bc1, bc2, primer, bc1, bc2, primer, r)
+            seq = ('ACGTTGCAAC' * 20)[(i + r) % 10:(i + r) % 10 + 50 + i % 40]
+            handle.write('%s\n%s\n+\n%s\n' % (name, seq, 'I' * len(seq)))
+    for handle in handles:
+        handle.close()
+    return files
+
+
+def names(run, size=1000):
+    """
+    Return the read 1 names of a run, read with next in batches of size
+    """
+    result = []
+    while True:
+        batch = run.next(size)
+        if len(batch) == 0:
+            break
+        result.extend(read.name_1 for read in batch)
+    return result
+
+def read_files(files):
+    return [open(f).read() for f in files]
+
+
+class TestIlluminaOutput:
+    def setup(self):
+        self.tmp = tempfile.mkdtemp()
+        self.files = write_run(os.path.join(self.tmp, 'run'), 500)
+        self.reads = list(TwoReadIlluminaRun([self.files[0]], [self.files[1]]))
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+    def test_two_read_output(self):
+        """
+        addRead and addReads write the same files, flushing at flush_bytes
+        """
+        expected = [''.join(read.getFastq()[i] + '\n' for read in self.reads) for i in xrange(2)]
+        out = IlluminaTwoReadOutput(os.path.join(self.tmp, 'a'), True, flush_bytes=4096)
+        for read in self.reads:
+            out.addRead(read.getFastq())
+        out.writeReads()
+        out.close()
+        assert out.stats()['flushes'] > 1
+        assert_equal(out.count(), 500)
+        batched = IlluminaTwoReadOutput(os.path.join(self.tmp, 'b'), False, flush_bytes=4096)
+        for start in xrange(0, 500, 64):
+            batched.addReads(self.reads[start:start + 64])
+        batched.writeReads()
+        batched.close()
+        assert_equal(batched.count(), 500)
+        assert batched.stats()['peak_buffered'] >= 4096
+        assert_equal(read_files([os.path.join(self.tmp, 'a_R1.fastq'), os.path.join(self.tmp, 'a_R2.fastq')]), expected)
+        assert_equal([open_read(os.path.join(self.tmp, 'b_R%d.fastq.gz' % r)).read() for r in (1, 2)], expected)
+    def test_one_read_output(self):
+        reads = list(OneReadIlluminaRun([self.files[0]]))
+        expected = ''.join(read.getFastq()[0] + '\n' for read in reads)
+        out = IlluminaOneReadOutput(os.path.join(self.tmp, 'a'), True, flush_bytes=None)
+        for read in reads[:100]:
+            out.addRead(read.getFastq())
+        out.addReads(reads[100:])
+        out.writeReads()
+        out.close()
+        assert_equal(out.stats()['flushes'], 1)
+        assert_equal(read_files([os.path.join(self.tmp, 'a.fastq')]), [expected])
+    def test_demux(self):
+        """
+        DemuxOutputPool splits reads by key, whether added one at a time or in batches
+        """
+        for batched in (False, True):
+            prefix = os.path.join(self.tmp, 'batched' if batched else 'single')
+            pool = DemuxOutputPool(prefix, uncompressed=True, maxopen=2, buffer_bytes=2048)
+            groups = {}
+            for start in xrange(0, 500, 50):
+                chunk = {}
+                for read in self.reads[start:start + 50]:
+                    chunk.setdefault(read.barcode, []).append(read)
+                    groups.setdefault(read.barcode, []).append(read)
+                    if not batched:
+                        pool.addRead(read.barcode, read.getFastq())
+                if batched:
+                    for key, reads in sorted(chunk.items()):
+                        pool.addReads(key, reads)
+            pool.close()
+            assert_equal(pool.count(), 500)
+            assert pool.stats()['opens'] > len(groups)
+            for key, reads in groups.items():
+                assert_equal(pool.count(key), len(reads))
+                assert_equal(read_files(pool.filenames(key)),
+                             [''.join(read.getFastq()[i] + '\n' for read in reads) for i in xrange(2)])
+
+
+class TestIlluminaRun:
+    def setup(self):
+        self.tmp = tempfile.mkdtemp()
+        fastqIndex._indexes.clear()
+        self.parts = [write_run(os.path.join(self.tmp, 'b'), 300),
+                      write_run(os.path.join(self.tmp, 'a'), 21000, 'bgzf:1')]
+        self.read1 = [self.parts[1][0], self.parts[0][0]]
+        self.read2 = [self.parts[1][1], self.parts[0][1]]
+        self.full = names(TwoReadIlluminaRun(self.read1, self.read2))
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+    def test_full(self):
+        """
+        Batches of any size read every read once, across files, as one read runs
+        """
+        assert_equal(len(self.full), 21300)
+        assert_equal(len(set(self.full)), 21000)
+        run = TwoReadIlluminaRun(self.read1, self.read2)
+        assert_equal(names(run, 777), self.full)
+        assert_equal(run.count(), 21300)
+        batches = list(TwoReadIlluminaRun(self.read1, self.read2).iter_batches(4000))
+        assert_equal([len(batch) for batch in batches], [4000] * 5 + [1300])
+        assert_equal(sum([[read.name_1 for read in batch] for batch in batches], []), self.full)
+        assert_equal([read.name_1 for read in TwoReadIlluminaRun(self.read1, self.read2)], self.full)
+        assert_equal(len(names(OneReadIlluminaRun(self.read2), 777)), 21300)
+    def test_start_stop(self):
+        """
+        A run opened at start reads the same reads as the full run from start to stop
+        """
+        for start, stop in [(0, 10), (1, None), (9999, 10001), (10000, 20000), (15000, None), (20999, 21005),
+                            (21000, None), (21299, None), (21300, None), (25000, None), (500, 500)]:
+            run = TwoReadIlluminaRun(self.read1, self.read2, start=start, stop=stop)
+            assert_equal(names(run), self.full[start:stop], (start, stop))
+            run = OneReadIlluminaRun(self.read1, start=start, stop=stop)
+            assert_equal(names(run), self.full[start:stop], (start, stop))
+    def test_mismatched_files(self):
+        """
+        Read files of different lengths raise an error
+        """
+        run = TwoReadIlluminaRun([self.parts[1][0]], [self.parts[0][1]])
+        assert_raises(Exception, names, run)
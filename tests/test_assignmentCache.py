@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from nose.tools import assert_equal
+from nose.tools import assert_raises
+from grcScriptsPy import AssignmentCache
+from grcScriptsPy import TwoSequenceReadSet
+
+
+class CountingTable:
+    """
+    Samples table with only getSampleID and getProjectID, counting its calls
+    """
+    def __init__(self, samples):
+        self.samples = samples
+        self.calls = 0
+    def getSampleID(self, barcode, primer=None):
+        self.calls += 1
+        return self.samples.get(barcode, (None, None))[0]
+    def getProjectID(self, barcode, primer=None):
+        self.calls += 1
+        return self.samples.get(barcode, (None, None))[1]
+
+
+class CountingLookupTable:
+    """
+    Samples table with a lookup method, counting its lookups, getSampleID and getProjectID must not be called
+    """
+    def __init__(self, samples):
+        self.samples = samples
+        self.calls = 0
+    def lookup(self, barcode, primer=None):
+        self.calls += 1
+        return self.samples.get(barcode)
+    def getSampleID(self, barcode, primer=None):
+        raise AssertionError('getSampleID called')
+    getProjectID = getSampleID
+
+
+def make_read(barcode, primer=None):
+    if primer is None:
+        name = '@r1 %d:N:0:' + barcode + ' x|0|y|0'
+    else:
+        name = '@r1 %d:N:0:' + barcode + ':' + primer + ' x|0|y|0 p'
+    return TwoSequenceReadSet(name % 1, 'ACGT', 'IIII', name % 2, 'TTGG', 'IIII')
+
+
+class TestAssignmentCache:
+    def test_lookup_table_miss(self):
+        """
+        A miss calls lookup of a table once, None is cached as (None, None)
+        """
+        table = CountingLookupTable({'AAAA': ('S1', 'P1')})
+        cache = AssignmentCache(table)
+        assert_equal(cache.lookup('CCCC'), (None, None))
+        assert_equal(cache.lookup('CCCC'), (None, None))
+        assert_equal(cache.lookup('AAAA'), ('S1', 'P1'))
+        assert_equal(table.calls, 2)
+        assert_equal(cache.getSampleID('CCCC'), None)
+        assert_equal(cache.stats()['misses'], 2)
+        assert_equal(cache.stats()['hits'], 2)
+    def test_plain_table(self):
+        table = CountingTable({'AAAA': ('S1', 'P1')})
+        cache = AssignmentCache(table)
+        assert_equal(cache.lookup('AAAA', 'pr'), ('S1', 'P1'))
+        assert_equal(cache.lookup('GGGG'), (None, None))
+        assert_equal(cache.lookup('AAAA', 'pr'), ('S1', 'P1'))
+        assert_equal(table.calls, 4)
+    def test_lru(self):
+        table = CountingLookupTable(dict(('B%d' % i, ('S%d' % i, 'P')) for i in xrange(10)))
+        cache = AssignmentCache(table, maxsize=4)
+        for i in xrange(3):
+            cache.lookup('B%d' % i)
+        # B0 is used again, B1 is the least recently used
+        cache.lookup('B0')
+        cache.lookup('B3')
+        cache.lookup('B4')
+        assert len(cache) <= 4
+        calls = table.calls
+        cache.lookup('B0')
+        assert_equal(table.calls, calls)
+        cache.lookup('B1')
+        assert_equal(table.calls, calls + 1)
+        assert cache.stats()['evictions'] > 0
+    def test_clear_policy(self):
+        table = CountingLookupTable({})
+        cache = AssignmentCache(table, maxsize=2, policy='clear')
+        for i in xrange(5):
+            cache.lookup('B%d' % i)
+        assert len(cache) <= 2
+        assert_raises(ValueError, AssignmentCache, table, policy='fifo')
+    def test_assign_read(self):
+        """
+        assignRead uses lookup of a table that has it and getSampleID, getProjectID of other tables
+        """
+        samples = {'AAAA': ('S1', 'P1')}
+        for table in (CountingTable(samples), CountingLookupTable(samples), AssignmentCache(CountingTable(samples))):
+            read = make_read('AAAA', 'pr')
+            read.assignRead(table)
+            assert_equal((read.sample, read.project, read.goodRead), ('S1', 'P1', True))
+            read = make_read('CCCC')
+            read.assignRead(table)
+            assert_equal((read.sample, read.project, read.goodRead), (None, None, False))
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+from nose.tools import assert_equal
+from nose.tools import assert_raises
+from grcScriptsPy import BarcodeIndex
+
+
+class TestBarcodeIndex:
+    def setup(self):
+        self.tmp = tempfile.mkdtemp()
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+    def sheet(self, rows, header='Lane,Sample_ID,index,index2,Sample_Project'):
+        filename = os.path.join(self.tmp, 'SampleSheet.csv')
+        with open(filename, 'w') as f:
+            f.write('[Header]\nx\n[Data]\n%s\n' % header)
+            for row in rows:
+                f.write(','.join(row) + '\n')
+        return filename
+    def test_single_index(self):
+        index = BarcodeIndex(self.sheet([('1', 'S1', 'AAAAAAAA', '', 'P1'), ('1', 'S2', 'CCCCCCCC', '', 'P2')]))
+        assert_equal(index.lookup('AAAAAAAA'), ('S1', 'P1'))
+        assert_equal(index.lookup('AAAAGAAA'), ('S1', 'P1'))
+        assert_equal(index.lookup('AAGAGAAA'), None)
+        assert_equal(index.lookup(None), None)
+        assert_equal(index.getSampleID('CCCCCCCN'), 'S2')
+        assert_equal(index.getProjectID('GGGGGGGG'), None)
+        assert_equal(len(index), 2)
+    def test_dual_index(self):
+        index = BarcodeIndex(self.sheet([('1', 'S1', 'AAAAAAAA', 'GGGGGGGG', 'P1'),
+                                         ('1', 'S2', 'CCCCCCCC', 'TTTTTTTT', 'P2'),
+                                         ('2', 'S3', 'ACACACAC', 'GTGTGTGT', 'P3')]), lane=1)
+        assert_equal(index.lookup('AAAAAAAA-GGGGGGGG'), ('S1', 'P1'))
+        assert_equal(index.lookup('AAAAAAAT+GGGGGGGA'), ('S1', 'P1'))
+        assert_equal(index.lookup('AAAAAAAA-TTTTTTTT'), None)
+        assert_equal(index.lookup('AAAAAAAA'), None)
+        assert_equal(index.lookup('ACACACAC-GTGTGTGT'), None)
+    def test_collision(self):
+        """
+        A sequence one substitution from two barcodes is not assigned
+        """
+        index = BarcodeIndex(self.sheet([('1', 'S1', 'AAAAAAAA', '', 'P1'), ('1', 'S2', 'AAAAAACC', '', 'P2')]))
+        assert_equal(index.lookup('AAAAAAAC'), None)
+        assert 'AAAAAAAC' in index.collisions[0]
+        assert_equal(index.lookup('AAAAAAAG'), ('S1', 'P1'))
+    def test_missing_sheet(self):
+        assert_raises(IOError, BarcodeIndex, os.path.join(self.tmp, 'none.csv'))
+        assert_raises(ValueError, BarcodeIndex, self.sheet([('1', 'S1')], header='Lane,Sample_ID'))
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import zlib
+import struct
+import shutil
+import tempfile
+from nose.tools import assert_equal
+from grcScriptsPy import bgzf
+from grcScriptsPy import DemuxOutputPool
+
+
+def read_bgzf_blocks(filename):
+    """
+    Return the decompressed data of each BGZF block of filename up to and including the first empty
+    block, and the number of bytes left after it, reading the blocks as a BGZF reader does
+    """
+    with open(filename, 'rb') as f:
+        data = f.read()
+    blocks = []
+    pos = 0
+    while pos < len(data):
+        assert_equal(data[pos:pos + 4], '\x1f\x8b\x08\x04')
+        xlen, = struct.unpack('<H', data[pos + 10:pos + 12])
+        extra = data[pos + 12:pos + 12 + xlen]
+        assert_equal(extra[:4], 'BC\x02\x00')
+        bsize, = struct.unpack('<H', extra[4:6])
+        end = pos + bsize + 1
+        cdata = data[pos + 12 + xlen:end - 8]
+        crc, isize = struct.unpack('<II', data[end - 8:end])
+        block = zlib.decompress(cdata, -15)
+        assert_equal(len(block), isize)
+        assert_equal(zlib.crc32(block) & 0xffffffff, crc)
+        blocks.append(block)
+        pos = end
+        if isize == 0:
+            break
+    return blocks, len(data) - pos
+
+
+class TestBgzf:
+    def setup(self):
+        self.tmp = tempfile.mkdtemp()
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+    def test_writer(self):
+        filename = os.path.join(self.tmp, 'out.gz')
+        payload = ''.join('line %d\n' % i for i in xrange(20000))
+        out = bgzf.BgzfWriter(filename)
+        out.write(payload)
+        out.close()
+        blocks, left = read_bgzf_blocks(filename)
+        assert_equal(''.join(blocks), payload)
+        assert_equal(left, 0)
+        assert_equal(len(blocks[-1]), 0)
+    def test_demux_reopen(self):
+        """
+        Files evicted and reopened by DemuxOutputPool hold a single end of file block, at the end
+        """
+        self.check_demux(1)
+    def test_demux_threads(self):
+        """
+        DemuxOutputPool deflates every file on one shared ThreadPool
+        """
+        self.check_demux(2)
+    def check_demux(self, threads):
+        prefix = os.path.join(self.tmp, 'demux')
+        pool = DemuxOutputPool(prefix, paired=False, threads=threads, maxopen=1, buffer_bytes=1, codec='bgzf')
+        shared = pool.pool
+        expected = {'A': [], 'B': []}
+        for i in xrange(50):
+            for key in ('A', 'B'):
+                read = '@%s%d\nACGT\n+\nIIII' % (key, i)
+                pool.addRead(key, (read,))
+                expected[key].append(read + '\n')
+                if shared is not None:
+                    assert pool.handles[key][0].pool is shared
+        pool.close()
+        assert pool.opens > 2
+        if shared is not None:
+            assert pool.pool is None
+        for key in ('A', 'B'):
+            blocks, left = read_bgzf_blocks(pool.filenames(key)[0])
+            assert_equal(left, 0)
+            assert_equal([len(block) for block in blocks].count(0), 1)
+            assert_equal(len(blocks[-1]), 0)
+            assert_equal(''.join(blocks), ''.join(expected[key]))
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import gzip
+import shutil
+import tempfile
+from nose.tools import assert_equal
+from grcScriptsPy import fastqIndex
+from grcScriptsPy import bgzf
+
+
+def write_fastq(filename, n, codec='raw'):
+    """
+    Write n fastq records to filename, returning them as (names, sequences, qualities)
+    """
+    names = ['@read%d 1:N:0:ACGT' % i for i in xrange(n)]
+    seqs = ['ACGTTGCA'[i % 8:] + 'A' * (i % 7) for i in xrange(n)]
+    quals = ['I' * len(seq) for seq in seqs]
+    data = ''.join('%s\n%s\n+\n%s\n' % record for record in zip(names, seqs, quals))
+    if codec == 'gzip':
+        f = gzip.open(filename, 'wb')
+    elif codec == 'bgzf':
+        f = bgzf.BgzfWriter(filename)
+    else:
+        f = open(filename, 'wb')
+    f.write(data)
+    f.close()
+    return names, seqs, quals
+
+
+class TestFastqIndex:
+    def setup(self):
+        self.tmp = tempfile.mkdtemp()
+        self.cache = os.path.join(self.tmp, 'cache')
+        fastqIndex._indexes.clear()
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+    def check_open_at(self, codec):
+        filename = os.path.join(self.tmp, 'reads.fastq')
+        records = write_fastq(filename, 3000, codec)
+        index = fastqIndex.FastqIndex.build(filename, interval=100)
+        assert_equal(index.nrecords, 3000)
+        for start in (0, 1, 99, 100, 1234, 2999, 3000):
+            reader = index.open_at(start)
+            names, seqs, quals = reader.read(150)
+            reader.close()
+            assert_equal(names, records[0][start:start + 150])
+            assert_equal(seqs, records[1][start:start + 150])
+            assert_equal(quals, records[2][start:start + 150])
+    def test_open_at_plain(self):
+        self.check_open_at('raw')
+    def test_open_at_gzip(self):
+        self.check_open_at('gzip')
+    def test_open_at_bgzf(self):
+        self.check_open_at('bgzf')
+    def test_cache(self):
+        """
+        get_index saves the index in the cache directory, not next to the fastq file
+        """
+        filename = os.path.join(self.tmp, 'reads.fastq')
+        write_fastq(filename, 500)
+        index = fastqIndex.get_index(filename, cachedir=self.cache)
+        assert_equal(index.nrecords, 500)
+        assert_equal(sorted(os.listdir(self.tmp)), ['cache', 'reads.fastq'])
+        indexfile = fastqIndex.index_file(filename, self.cache)
+        assert_equal(os.listdir(self.cache), [os.path.basename(indexfile)])
+        loaded = fastqIndex.FastqIndex.load(filename, indexfile)
+        assert_equal(loaded.checkpoints, index.checkpoints)
+    def test_cache_unwritable(self):
+        """
+        The index is kept in memory when the cache directory cannot be made
+        """
+        filename = os.path.join(self.tmp, 'reads.fastq')
+        write_fastq(filename, 500)
+        cache = os.path.join(filename, 'cache')
+        index = fastqIndex.get_index(filename, cachedir=cache)
+        assert_equal(index.nrecords, 500)
+        assert fastqIndex.get_index(filename, cachedir=cache) is index
+        assert_equal(sorted(os.listdir(self.tmp)), ['reads.fastq'])
+    def test_no_cache(self):
+        filename = os.path.join(self.tmp, 'reads.fastq')
+        write_fastq(filename, 10)
+        assert_equal(fastqIndex.get_index(filename, cachedir=None).nrecords, 10)
+        assert_equal(sorted(os.listdir(self.tmp)), ['reads.fastq'])
+    def test_get_indexes(self):
+        """
+        get_indexes builds the missing indexes in worker processes and keeps them in this one
+        """
+        filenames = [os.path.join(self.tmp, 'reads%d.fastq' % i) for i in xrange(3)]
+        for i, filename in enumerate(filenames):
+            write_fastq(filename, 100 * (i + 1), 'bgzf' if i else 'raw')
+        cache = os.path.join(filenames[0], 'cache')
+        indexes = fastqIndex.get_indexes(filenames + filenames[:1], processes=2, interval=50, cachedir=cache)
+        assert_equal([index.nrecords for index in indexes], [100, 200, 300, 100])
+        assert indexes[3] is indexes[0]
+        assert_equal(len(fastqIndex._indexes), 3)
+        for filename, index in zip(filenames, indexes):
+            assert fastqIndex.get_index(filename, cachedir=cache) is index
+            assert_equal(index.checkpoints, fastqIndex.FastqIndex.build(filename, interval=50).checkpoints)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+from nose.tools import assert_equal
+from nose.tools import assert_raises
+from grcScriptsPy import FastqBlockReader
+
+
+def records(n):
+    names = ['@read%d 1:N:0:ACGT' % i for i in xrange(n)]
+    seqs = ['ACGT' * (i % 9) for i in xrange(n)]
+    quals = ['I' * len(seq) for seq in seqs]
+    return names, seqs, quals
+
+def fastq(names, seqs, quals):
+    return ''.join('%s\n%s\n+\n%s\n' % record for record in zip(names, seqs, quals))
+
+def read_all(reader, nrecords):
+    result = ([], [], [])
+    while True:
+        batch = reader.read(nrecords)
+        if len(batch[0]) == 0:
+            break
+        for values, column in zip(batch, result):
+            column.extend(values)
+    return result
+
+
+class TestFastqBlockReader:
+    def test_blocks(self):
+        """
+        Records split across blocks of any size are read once and in order
+        """
+        expected = records(500)
+        data = fastq(*expected)
+        for blocksize in (1, 7, 64, 1000, len(data), 1 << 20):
+            for nrecords in (1, 33, 1000):
+                reader = FastqBlockReader(io.BytesIO(data), blocksize)
+                assert_equal(read_all(reader, nrecords), tuple(expected))
+                reader.close()
+    def test_end_of_file(self):
+        """
+        The last line needs no newline, blank lines at the end are ignored
+        """
+        expected = records(3)
+        data = fastq(*expected)
+        for tail in (data[:-1], data + '\n\n'):
+            assert_equal(read_all(FastqBlockReader(io.BytesIO(tail), 16), 10), tuple(expected))
+        assert_equal(read_all(FastqBlockReader(io.BytesIO(''), 16), 10), ([], [], []))
+    def test_malformed(self):
+        for data in ('@r1\nACGT\n+\nIII\n', 'r1\nACGT\n+\nIIII\n', '@r1\nACGT\n+\nIIII\n@r2\nAC\n'):
+            reader = FastqBlockReader(io.BytesIO(data), 8)
+            assert_raises(ValueError, read_all, reader, 10)
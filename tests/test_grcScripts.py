@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+from nose.tools import assert_equal
+from nose.tools import assert_raises
+import _grcScripts
+from grcScriptsPy import misc
+
+IUPAC_CODES = ''.join(sorted(misc.iupacdict))
+
+
+def matches(a, b, iupac):
+    """
+    Whether base b matches a, a base or with iupac an IUPAC code
+    """
+    if iupac:
+        return b in misc.iupacdict[a]
+    return a == b
+
+def hamming_ref(a, b, iupac=False):
+    return sum(1 for x, y in zip(a, b) if not matches(x, y, iupac))
+
+def edit_ref(a, b, iupac=False):
+    """
+    Levenshtein's edit distance by the full dynamic programming table
+    """
+    previous = range(len(b) + 1)
+    for i in xrange(1, len(a) + 1):
+        current = [i]
+        for j in xrange(1, len(b) + 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1,
+                               previous[j - 1] + (0 if matches(a[i - 1], b[j - 1], iupac) else 1)))
+        previous = current
+    return previous[-1]
+
+def bounded_ref(a, b, k, m, iupac=False):
+    """
+    Bounded edit distance of primer a at the start of read b, with its last m bases exact, as
+    (dist, end): a global alignment of a[:-m] against each prefix of b up to len(a) - m + k long,
+    the last (longest) prefix of the lowest distance kept, plus 100 when the m end bases do not match
+    """
+    n = len(a) - m
+    dist, pos = k + 1, len(a)
+    for i in xrange(1, n + k + 1):
+        d = edit_ref(a[:n], b[:i], iupac)
+        if d <= dist:
+            dist, pos = d, i + m
+    for i in xrange(1, m + 1):
+        if not matches(a[len(a) - i], b[pos - i], iupac):
+            dist += 100
+            break
+    return dist, pos
+
+def mutate(rng, seq, nedits, alphabet='ACGT'):
+    """
+    Apply nedits random substitutions, insertions and deletions to seq
+    """
+    seq = list(seq)
+    for e in xrange(nedits):
+        op = rng.randint(0, 2)
+        i = rng.randint(0, len(seq) - 1) if seq else 0
+        if op == 0 and seq:
+            seq[i] = rng.choice(alphabet)
+        elif op == 1:
+            seq.insert(i, rng.choice(alphabet))
+        elif seq:
+            del seq[i]
+    return ''.join(seq)
+
+def random_seq(rng, n, alphabet='ACGT'):
+    return ''.join(rng.choice(alphabet) for i in xrange(n))
+
+
+class TestDistances:
+    def setup(self):
+        self.rng = random.Random(7)
+    def pairs(self, n, lengths, alphabet='ACGT'):
+        """
+        Random pairs of related sequences, over lengths crossing the 64 base word size
+        """
+        for i in xrange(n):
+            a = random_seq(self.rng, self.rng.choice(lengths), alphabet)
+            yield a, mutate(self.rng, a.replace('N', 'A'), self.rng.randint(0, 6))
+    def test_edit_distance(self):
+        for a, b in self.pairs(300, [0, 1, 5, 20, 63, 64, 65, 130]):
+            assert_equal(_grcScripts.edit_distance(a, b), edit_ref(a, b), (a, b))
+            assert_equal(_grcScripts.edit_distance(b, a), edit_ref(a, b), (b, a))
+    def test_edit_distance_iupac(self):
+        for a, b in self.pairs(200, [1, 8, 30, 70], IUPAC_CODES):
+            b = ''.join(self.rng.choice(misc.iupacdict[c]) if c in misc.iupacdict else c for c in b)
+            assert_equal(_grcScripts.edit_distance(a, b, True), edit_ref(a, b, True), (a, b))
+    def test_hamming_distance(self):
+        for n in (1, 8, 63, 64, 65, 150):
+            for i in xrange(30):
+                a = random_seq(self.rng, n)
+                b = ''.join(c if self.rng.random() < 0.8 else self.rng.choice('ACGTN') for c in a)
+                assert_equal(_grcScripts.hamming_distance(a, b), hamming_ref(a, b))
+                pattern = random_seq(self.rng, n, IUPAC_CODES)
+                assert_equal(_grcScripts.hamming_distance(pattern, b, True), hamming_ref(pattern, b, True))
+    def test_bounded_distance(self):
+        workspace = _grcScripts.Workspace()
+        for i in xrange(300):
+            k = self.rng.randint(0, 5)
+            m = self.rng.randint(0, 4)
+            primer = random_seq(self.rng, self.rng.randint(max(m, 1), 30), 'ACGTRYN' if i % 2 else 'ACGT')
+            read = mutate(self.rng, ''.join(self.rng.choice(misc.iupacdict[c]) for c in primer),
+                          self.rng.randint(0, 6)) + random_seq(self.rng, 40)
+            if len(primer) + k > len(read):
+                continue
+            iupac = bool(i % 2)
+            expected = bounded_ref(primer, read, k, m, iupac)
+            assert_equal(_grcScripts.bounded_distance(primer, read, k, m, iupac), expected, (primer, read, k, m))
+            assert_equal(_grcScripts.bounded_distance(primer, read, k, m, iupac, workspace), expected)
+    def test_arguments(self):
+        """
+        Buffers and unicode are read like strings, other types raise TypeError
+        """
+        assert_equal(_grcScripts.edit_distance(buffer(bytearray('ACGT')), 'AGT'), 1)
+        assert_equal(_grcScripts.hamming_distance(u'ACGT', 'ACGA'), 1)
+        assert_raises(TypeError, _grcScripts.edit_distance, 1, 'A')
+
+
+class TestBest:
+    def setup(self):
+        self.rng = random.Random(11)
+        self.barcodes = [random_seq(self.rng, 8) for i in xrange(40)]
+    def best_ref(self, query, distances, max_dist):
+        """
+        (index, dist, ambiguous) of the lowest of distances within max_dist
+        """
+        best = min(distances) if distances else None
+        if best is None or best > max_dist:
+            return (-1, -1, False)
+        return (distances.index(best), best, distances.count(best) > 1)
+    def test_hamming_best(self):
+        candidates = _grcScripts.CandidateSet(self.barcodes)
+        queries = [mutate(self.rng, b, 2)[:8].ljust(8, 'A') for b in self.barcodes]
+        for query in queries:
+            expected = self.best_ref(query, [hamming_ref(query, b) for b in self.barcodes], 2)
+            assert_equal(tuple(_grcScripts.hamming_best(query, candidates, 2)), expected)
+            assert_equal(tuple(_grcScripts.hamming_best(query, self.barcodes, 2)), expected)
+        assert_equal([tuple(r) for r in _grcScripts.hamming_best_batch(queries, candidates, 2, threads=2)],
+                     [tuple(_grcScripts.hamming_best(q, candidates, 2)) for q in queries])
+    def test_edit_best(self):
+        candidates = _grcScripts.CandidateSet(self.barcodes)
+        queries = [mutate(self.rng, b, 2) for b in self.barcodes]
+        for query in queries:
+            expected = self.best_ref(query, [edit_ref(query, b) for b in self.barcodes], 2)
+            assert_equal(tuple(_grcScripts.edit_best(query, candidates, 2)), expected)
+        assert_equal([tuple(r) for r in _grcScripts.edit_best_batch(queries, candidates, 2)],
+                     [tuple(_grcScripts.edit_best(q, candidates, 2)) for q in queries])
+    def test_bounded_best(self):
+        primers = [random_seq(self.rng, 20) for i in xrange(10)]
+        for i in xrange(50):
+            p = self.rng.randint(0, 9)
+            read = mutate(self.rng, primers[p][:-4], self.rng.randint(0, 3)) + primers[p][-4:] + random_seq(self.rng, 30)
+            index, dist, pos, ambiguous = _grcScripts.bounded_best(read, primers, 3, 4)
+            expected = [bounded_ref(primer, read, 3, 4) for primer in primers]
+            best = min(d for d, e in expected)
+            if best > 3:
+                assert_equal((index, dist, pos), (-1, -1, -1))
+            else:
+                assert_equal(expected[index], (dist, pos))
+                assert_equal(dist, best)
+                assert_equal(ambiguous, [d for d, e in expected].count(best) > 1)
+
+
+class TestFastq:
+    def test_tokenize(self):
+        data = '@r1\nACGT\n+\nIIII\n@r2 x\nAC\n+r2\nII\n@r3\nA'
+        names, seqs, quals, next = _grcScripts.fastq_tokenize(data)
+        assert_equal((names, seqs, quals), (['@r1', '@r2 x'], ['ACGT', 'AC'], ['IIII', 'II']))
+        assert_equal(data[next:], '@r3\nA')
+        names, seqs, quals, next = _grcScripts.fastq_tokenize(data + '\n+\nI', next, final=True)
+        assert_equal((names, seqs, quals), (['@r3'], ['A'], ['I']))
+        assert_equal(_grcScripts.fastq_tokenize(data, 0, 20)[:3], (['@r1'], ['ACGT'], ['IIII']))
+    def test_tokenize_errors(self):
+        assert_raises(ValueError, _grcScripts.fastq_tokenize, 'r1\nACGT\n+\nIIII\n')
+        assert_raises(ValueError, _grcScripts.fastq_tokenize, '@r1\nACGT\n-\nIIII\n')
+        assert_raises(ValueError, _grcScripts.fastq_tokenize, '@r1\nACGT\n+\nIII\n')
+        assert_raises(ValueError, _grcScripts.fastq_tokenize, '@r1\nACGT\n+\n', final=True)
+    def test_format(self):
+        names = ['@r1', '@r2 1:N:0:ACGT']
+        seqs = ['ACGT', '']
+        quals = ['IIII', '']
+        expected = '@r1\nACGT\n+\nIIII\n@r2 1:N:0:ACGT\n\n+\n\n'
+        assert_equal(_grcScripts.fastq_format(names, seqs, quals), expected)
+        assert_equal(_grcScripts.fastq_format(['>r1'], ['ACGT']), '>r1\nACGT\n')
+        out = bytearray('x')
+        assert_equal(_grcScripts.fastq_format(names, seqs, quals, out), None)
+        assert_equal(str(out), 'x' + expected)
+        assert_raises(ValueError, _grcScripts.fastq_format, ['@r1'], ['ACGT'], ['III'])
+        names, seqs, quals, next = _grcScripts.fastq_tokenize(expected)
+        assert_equal((names, seqs, quals), (['@r1', '@r2 1:N:0:ACGT'], seqs, quals))
+    def test_reverse_complement(self):
+        rng = random.Random(3)
+        seqs = [random_seq(rng, n, IUPAC_CODES + 'acgtn') for n in (0, 1, 7, 64, 151)]
+        expected = [misc.reverseComplement(seq) for seq in seqs]
+        assert_equal(_grcScripts.reverse_complement_batch(seqs), expected)
+        assert_equal(_grcScripts.reverse_complement_batch(tuple(seqs)), expected)
+        assert_equal(_grcScripts.reverse_complement_batch('\n'.join(seqs)), '\n'.join(expected))
+        assert_raises(TypeError, _grcScripts.reverse_complement_batch, 5)
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import gzip
+import shutil
+import tempfile
+from nose.tools import assert_equal
+from nose.tools import assert_raises
+from distutils.spawn import find_executable
+from grcScriptsPy import misc
+
+
+class FailingFile:
+    """
+    File object failing on its [fail]th write
+    """
+    def __init__(self, fail):
+        self.fail = fail
+        self.writes = 0
+        self.data = []
+        self.closed = False
+    def write(self, data):
+        self.writes += 1
+        if self.writes == self.fail:
+            raise IOError('disk full')
+        self.data.append(data)
+    def flush(self):
+        pass
+    def close(self):
+        self.closed = True
+
+
+class TestAsyncWriter:
+    def test_write(self):
+        f = FailingFile(0)
+        out = misc.AsyncWriter(f, depth=2)
+        for i in xrange(100):
+            out.write('%d\n' % i)
+        out.flush()
+        assert_equal(len(f.data), 100)
+        out.close()
+        assert f.closed
+        assert_raises(ValueError, out.write, 'x')
+    def test_error_sticky(self):
+        """
+        Nothing is written after a failed write, every later call raises the error
+        """
+        f = FailingFile(3)
+        out = misc.AsyncWriter(f, depth=1)
+        out.write('a')
+        out.write('b')
+        out.write('c')
+        assert_raises(IOError, out.flush)
+        assert_raises(IOError, out.write, 'd')
+        assert_raises(IOError, out.flush)
+        assert_equal(f.data, ['a', 'b'])
+        assert_raises(IOError, out.close)
+        assert f.closed
+        assert_raises(IOError, out.close)
+        assert_equal(f.data, ['a', 'b'])
+
+
+def read_all(handle, size=65536):
+    data = []
+    while True:
+        chunk = handle.read(size)
+        if not chunk:
+            break
+        data.append(chunk)
+    return ''.join(data)
+
+
+class TestGzipReaders:
+    def setup(self):
+        self.tmp = tempfile.mkdtemp()
+        self.data = ''.join('line %d\n' % i for i in xrange(50000))
+        self.filename = os.path.join(self.tmp, 'data.gz')
+        for mode in ('wb', 'ab'):
+            f = gzip.open(self.filename, mode)
+            f.write(self.data)
+            f.close()
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+    def truncate(self, cut):
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        truncated = os.path.join(self.tmp, 'truncated.gz')
+        with open(truncated, 'wb') as f:
+            f.write(data[:len(data) + cut])
+        return truncated
+    def test_readers(self):
+        for reader in misc.available_gzip_readers():
+            handle = misc.gzip_reader(self.filename, reader)
+            assert_equal(read_all(handle), self.data * 2)
+            handle.close()
+    def test_truncated(self):
+        """
+        A file ending within a gzip member raises an IOError with every reader
+        """
+        for cut in (-1, -8, -1000):
+            truncated = self.truncate(cut)
+            for reader in misc.available_gzip_readers():
+                handle = misc.gzip_reader(truncated, reader)
+                assert_raises(IOError, read_all, handle)
+                handle.close()
+    def test_early_close(self):
+        """
+        Closing a subprocess reader before the end of the output is not an error
+        """
+        for reader in misc.available_gzip_readers():
+            handle = misc.gzip_reader(self.filename, reader)
+            assert_equal(handle.read(10), self.data[:10])
+            handle.close()
+    def test_zlib_reader(self):
+        handle = misc.ZlibGzipReader(self.filename)
+        assert_equal(read_all(handle), self.data * 2)
+        handle.close()
+
+
+class TestCodecs:
+    def setup(self):
+        self.tmp = tempfile.mkdtemp()
+        self.data = ''.join('@read%d\nACGTTGCA\n+\nIIIIIIII\n' % i for i in xrange(30000))
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+    def codecs(self):
+        codecs = [('raw', 1), ('gzip', 1), ('gzip:1', 1), ('fast', 1), ('bgzf', 1), ('bgzf:1', 3)]
+        if find_executable('xz') is not None:
+            codecs += [('xz:0', 1), ('xz', 2)]
+        return codecs
+    def test_parse_codec(self):
+        assert_equal(misc.parse_codec('gzip'), ('gzip', misc.CODEC_LEVELS['gzip']))
+        assert_equal(misc.parse_codec('GZIP:4'), ('gzip', 4))
+        assert_equal(misc.parse_codec('fast'), ('gzip', 1))
+        assert_equal(misc.parse_codec('bgzf', 3), ('bgzf', 3))
+        assert_equal(misc.parse_codec('raw:5'), ('raw', None))
+        assert_equal(misc.parse_codec('uncompressed'), ('raw', None))
+        assert_raises(ValueError, misc.parse_codec, 'zip')
+        assert_raises(ValueError, misc.parse_codec, 'gzip:x')
+    def test_round_trip(self):
+        """
+        Each codec reads back through open_read, also after appending to the file
+        """
+        for codec, threads in self.codecs():
+            filename = os.path.join(self.tmp, codec.replace(':', '_'))
+            for mode in ('wb', 'ab'):
+                f = misc.open_write(filename, codec, threads=threads, mode=mode)
+                f.write(self.data[:100000])
+                f.write(self.data[100000:])
+                f.close()
+            name = misc.parse_codec(codec)[0]
+            assert_equal(misc.is_compressed(filename), name != 'raw', codec)
+            assert_equal(misc.is_gzip(filename), name in ('gzip', 'bgzf'), codec)
+            handle = misc.open_read(filename)
+            assert_equal(read_all(handle), self.data * 2, codec)
+            handle.close()
+
+
+class TestReverseComplement:
+    def test_reverse_complement(self):
+        assert_equal(misc.reverseComplement('ACGTRYNacgt'), 'acgtNRYACGT')
+        assert_equal(misc.reverseComplement(''), '')
+        assert_raises(KeyError, misc.reverseComplement, 'ACGZ')
+    def test_unicode(self):
+        """
+        unicode sequences are complemented like str, non ASCII characters raise KeyError
+        """
+        assert_equal(misc.reverseComplement(u'ACGTRYNacgt'), 'acgtNRYACGT')
+        assert_raises(KeyError, misc.reverseComplement, u'ACG\xe9')
+        assert_raises(KeyError, misc.reverseComplement, u'ACGZ')
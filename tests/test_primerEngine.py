@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import random
+from nose.tools import assert_equal
+from nose.tools import assert_raises
+import _grcScripts
+from grcScriptsPy import misc
+from grcScriptsPy import PrimerEngine
+from grcScriptsPy import TwoSequenceReadSet
+from test_grcScripts import mutate
+from test_grcScripts import random_seq
+
+PRIMERS = [('P5', 'pair0', 'F0', 'YAATGGCGGGMCCGTTGCCAACCC'),
+           ('P7', 'pair0', 'R0', 'AGTGATTGTTTCMKATGCGC'),
+           ('P5', 'pair1', 'F1', 'CGTGCACGATCTCTGGGGGCAGTG'),
+           ('P7', 'pair1', 'R1', 'GTAGAGCATAGTAATCGACAGAT'),
+           ('P5', 'pair2', 'F2', 'GTGCCAGCMGCCGCGGTAA'),
+           ('P7', 'pair2', 'R2', 'GGACTACHVGGGTWTCTAAT')]
+
+
+def primed_read(rng, primer, nedits):
+    """
+    A read starting with primer (IUPAC codes resolved) with nedits edits before its last 4 bases
+    """
+    seq = ''.join(rng.choice(misc.iupacdict[c]) for c in primer)
+    return mutate(rng, seq[:-4], nedits) + seq[-4:] + random_seq(rng, 60)
+
+
+class TestPrimerEngine:
+    def setup(self):
+        self.rng = random.Random(5)
+        self.engine = PrimerEngine(primers=PRIMERS, max_diff=2, end_match=4)
+    def match_ref(self, read, side):
+        """
+        Best primer of side by bounded_distance against every primer, the first in table order for ties
+        """
+        best = None
+        for p, seq in enumerate(side.seqs):
+            dist, end = _grcScripts.bounded_distance(seq, read, 2, 4, True)
+            if dist <= 2 and (best is None or dist < best[1]):
+                best = (p, dist, end)
+        return best
+    def test_match(self):
+        """
+        The seed filter finds every primer within max_diff when (max_diff + 1) * seed fits in the primers
+        """
+        for i in xrange(300):
+            primer = self.rng.choice(PRIMERS)
+            side = self.engine.forward if primer[0] == 'P5' else self.engine.reverse
+            read = primed_read(self.rng, primer[3], self.rng.randint(0, 3)) if i % 5 else random_seq(self.rng, 80)
+            assert_equal(self.engine.match(read, side), self.match_ref(read, side))
+    def test_assign(self):
+        read = TwoSequenceReadSet('@r1 1:N:0:ACGTACGT', primed_read(self.rng, PRIMERS[2][3], 0), 'I' * 84,
+                                  '@r1 2:N:0:ACGTACGT', primed_read(self.rng, PRIMERS[3][3], 1), 'I' * 83)
+        read.qual_2 = 'I' * len(read.read_2)
+        read_1 = read.read_1
+        assert_equal(self.engine.assignPrimers(read), 'pair1')
+        assert read.primer_string1.startswith('F1|0|')
+        assert read.primer_string2.startswith('R1|')
+        assert_equal(read.read_1, read_1[24:])
+        assert_equal(len(read.qual_1), len(read.read_1))
+        assert_equal(len(read.qual_2), len(read.read_2))
+    def test_unmatched(self):
+        read = TwoSequenceReadSet('@r1 1:N:0:ACGTACGT', primed_read(self.rng, PRIMERS[0][3], 0), 'I' * 84,
+                                  '@r1 2:N:0:ACGTACGT', random_seq(self.rng, 80), 'I' * 80)
+        assert_equal(self.engine.assignPrimers(read), None)
+        assert read.primer_string1.startswith('F0|')
+        assert_equal(read.primer_string2, None)
+        assert_equal(len(read.read_2), 80)
+    def test_bad_primers(self):
+        assert_raises(ValueError, PrimerEngine, primers=[])
+        assert_raises(ValueError, PrimerEngine, primers=[('P5', 'pair0', 'F0', 'ACGZ')])
+        assert_raises(ValueError, PrimerEngine, primers=[('P3', 'pair0', 'F0', 'ACGT')])
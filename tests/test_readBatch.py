@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from nose.tools import assert_equal
+from grcScriptsPy import ReadBatch
+from grcScriptsPy import TwoSequenceReadSet
+
+
+def make_batch(n):
+    """
+    Return a ReadBatch of n TwoSequenceReadSet and the columns it was made from
+    """
+    columns = [['@r%d 1:N:0:ACGT' % i for i in xrange(n)],
+               ['ACGT' * (i % 5 + 1) for i in xrange(n)],
+               ['I' * 4 * (i % 5 + 1) for i in xrange(n)],
+               ['@r%d 2:N:0:ACGT' % i for i in xrange(n)],
+               ['TTGCA'[:i % 5 + 1] for i in xrange(n)],
+               ['#' * (i % 5 + 1) for i in xrange(n)]]
+    return ReadBatch(TwoSequenceReadSet, columns), columns
+
+
+class TestReadBatch:
+    def test_records(self):
+        batch, columns = make_batch(10)
+        assert_equal(len(batch), 10)
+        for i, fieldname in enumerate(TwoSequenceReadSet.readFields):
+            assert_equal([getattr(batch[j], fieldname) for j in xrange(10)], columns[i])
+        assert_equal(batch[-1].read_1, columns[1][-1])
+        assert_equal([r.name_2 for r in batch[2:5]], columns[3][2:5])
+    def test_records_kept(self):
+        batch, columns = make_batch(5)
+        batch[3].sample = 'S1'
+        assert_equal([r.sample for r in batch if r is batch[3]], ['S1'])
+    def test_release_iter(self):
+        """
+        Buffers are freed once every record exists, fields are then taken from the records
+        """
+        batch, columns = make_batch(7)
+        before = batch.buffer('read_2')
+        records = list(batch)
+        assert batch.buffers is None and batch.offsets is None
+        assert_equal(list(batch), records)
+        assert_equal(batch.field('qual_1'), columns[2])
+        assert_equal(batch.buffer('read_2'), before)
+    def test_release_getitem(self):
+        batch, columns = make_batch(4)
+        for i in xrange(3):
+            batch[i]
+        assert batch.buffers is not None
+        assert_equal(batch.field('read_1'), columns[1])
+        batch[3]
+        assert batch.buffers is None
+        assert_equal(batch.field('read_1'), columns[1])
+    def test_empty(self):
+        batch, columns = make_batch(0)
+        assert_equal(list(batch), [])
+        assert_equal(batch.field('read_1'), [])
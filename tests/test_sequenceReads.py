@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import io
+import copy
+from nose.tools import assert_equal
+from grcScriptsPy import TwoSequenceReadSet
+from grcScriptsPy import OneSequenceReadSet
+from grcScriptsPy import ReadBatch
+from grcScriptsPy import write_fastq_batch
+from grcScriptsPy import write_fasta_batch
+from grcScriptsPy import write_joined_fasta_batch
+
+NAME = '@r1 %d:N:0:ACGTACGT:P1 AACC|0|GGTT|0 P1%d'
+
+
+def two_read():
+    return TwoSequenceReadSet(NAME % (1, 1), 'ACGT', 'IIII', NAME % (2, 2), 'TTGG', 'IIII')
+
+
+class TestLazyNames:
+    def test_parse(self):
+        read = two_read()
+        assert not read.parsed
+        assert_equal((read.name, read.barcode, read.sample, read.primer), ('@r1', 'ACGTACGT', 'ACGTACGT', 'P1'))
+        assert_equal((read.barcode_string, read.primer_string1, read.primer_string2), ('AACC|0|GGTT|0', 'P11', 'P12'))
+        assert read.parsed
+    def test_assigned_fields_kept(self):
+        """
+        Name fields assigned before the names are parsed are kept, the others are parsed
+        """
+        read = two_read()
+        read.primer = 'X'
+        read.barcode_string = 'AAAA|1|CCCC|0'
+        assert_equal(read.barcode, 'ACGTACGT')
+        assert_equal((read.primer, read.barcode_string), ('X', 'AAAA|1|CCCC|0'))
+        assert_equal((read.sample, read.primer_string1), ('ACGTACGT', 'P11'))
+        read = two_read()
+        read.sample = 'S1'
+        read.project = 'P'
+        assert_equal((read.sample, read.primer), ('S1', 'P1'))
+        read = OneSequenceReadSet(NAME % (1, 1), 'ACGT', 'IIII')
+        read.primer = None
+        assert_equal((read.name, read.sample, read.primer), ('@r1', 'ACGTACGT', None))
+    def test_copy(self):
+        read = two_read()
+        read.sample = 'S1'
+        other = copy.copy(read)
+        assert not other.parsed
+        assert_equal((other.sample, other.barcode), ('S1', 'ACGTACGT'))
+
+
+class TestBatchWriters:
+    def setup(self):
+        """
+        Read sets with and without primers, and IUPAC codes in read 2
+        """
+        self.reads = []
+        for i in xrange(20):
+            if i % 2:
+                names = ['@r%d %d:N:0:ACGT:P%d AACC|0|GGTT|0 P1%d' % (i, read, i % 3, read) for read in (1, 2)]
+            else:
+                names = ['@r%d %d:N:0:ACGT AACC|0|GGTT|0' % (i, read) for read in (1, 2)]
+            self.reads.append(TwoSequenceReadSet(names[0], 'ACGTN'[:i % 5 + 1], 'I' * (i % 5 + 1),
+                                                 names[1], 'TTRYG'[:i % 4 + 1], '#' * (i % 4 + 1)))
+    def check(self, writer, expected):
+        """
+        writer gives the expected output from a list and from a ReadBatch, to bytearrays and to files
+        """
+        batch = ReadBatch(TwoSequenceReadSet, [[getattr(r, field) for r in self.reads]
+                                               for field in TwoSequenceReadSet.readFields])
+        for reads in (self.reads, batch):
+            for output in (bytearray, io.BytesIO):
+                outputs = [output() for e in expected]
+                writer(reads, *outputs)
+                assert_equal([str(o) if isinstance(o, bytearray) else o.getvalue() for o in outputs], expected)
+    def test_fastq(self):
+        self.check(write_fastq_batch, [''.join(r.getFastq()[i] + '\n' for r in self.reads) for i in xrange(2)])
+    def test_fasta(self):
+        self.check(write_fasta_batch, [''.join(r.getFasta()[i] + '\n' for r in self.reads) for i in xrange(2)])
+    def test_joined_fasta(self):
+        self.check(write_joined_fasta_batch, [''.join(r.getJoinedFasta()[0] + '\n' for r in self.reads)])
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+
+# Copyright 2014, Institute for Bioninformatics and Evolutionary Studies
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import shutil
+import tempfile
+from nose.tools import assert_equal
+from grcScriptsPy import shardedRun
+from grcScriptsPy import fastqIndex
+from grcScriptsPy import OneReadIlluminaRun
+from test_fastqIndex import write_fastq
+
+
+def read_names(run, shard):
+    """
+    Shard function returning the names of the shard's reads
+    """
+    return [read.name_1 for read in run]
+
+
+class TestShardedRun:
+    def setup(self):
+        self.tmp = tempfile.mkdtemp()
+        fastqIndex._indexes.clear()
+    def teardown(self):
+        shutil.rmtree(self.tmp)
+    def test_shard_ranges(self):
+        assert_equal(shardedRun.shard_ranges(10, 3), [(0, 3), (3, 6), (6, 10)])
+        assert_equal(shardedRun.shard_ranges(2, 4), [(0, 1), (1, 2)])
+    def test_join_shards(self):
+        shards = [(0, 10), (10, 20), (20, 30), (30, 40)]
+        assert_equal(shardedRun.join_shards(shards, []), shards)
+        assert_equal(shardedRun.join_shards(shards, [(5, 25, 'a.gz')]), [(0, 30), (30, 40)])
+        assert_equal(shardedRun.join_shards(shards, [(10, 20, 'a.gz')]), shards)
+    def check_sharded(self, codec):
+        """
+        Every read is processed once and in order, single member gzip files are not split
+        """
+        files = []
+        names = []
+        for i, c in enumerate(['raw', codec]):
+            filename = os.path.join(self.tmp, 'part%d_R1_001.fastq%s' % (i, '.gz' if c != 'raw' else ''))
+            names = write_fastq(filename, 9000 + 3000 * i, c)[0] + names
+            files.append(filename)
+        results = shardedRun.run_sharded(read_names, files, single=True, nshards=4, processes=2)
+        assert_equal(sum(results, []), names)
+        return results
+    def test_sharded_bgzf(self):
+        assert_equal(len(self.check_sharded('bgzf')), 4)
+    def test_sharded_gzip(self):
+        results = self.check_sharded('gzip')
+        assert_equal(len(results), 2)
+        assert_equal(len(results[0]), 15750)